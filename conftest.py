@@ -0,0 +1,2 @@
+# Makes pytest put the repository root on sys.path, so tests import the
+# survey_* modules the way the pages do.
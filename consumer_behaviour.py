@@ -1,6 +1,18 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
+import plotly.graph_objects as go
+import numpy as np
+
+from survey_data import (
+    correlation_matrix, correlation_table, joint_counts, load_survey,
+    log_memory, page_section, score_density, show_chart, survey_aggregates,
+    trend_table,
+)
+from survey_likert import box_outliers, box_summary
+from survey_plot import count_frame, count_scatter, density_map
+from survey_schema import ACTIVE_ITEMS, FREQ_ITEMS
+from survey_trend import line_traces
 
 # ======================================================
 # PAGE CONFIG (LIKE REFERENCE)
@@ -37,12 +49,8 @@ st.markdown("To assess the level of activity and engagement of consumers on soci
 # ======================================================
 # LOAD DATA
 # ======================================================
-@st.cache_data
-def load_data():
-    url = "https://raw.githubusercontent.com/izzatimahrup/SVProject_A-Survey-of-Fashion-Habits/main/Cleaned_FashionHabitGF.csv"
-    return pd.read_csv(url)
-
-df = load_data()
+agg = survey_aggregates()
+df = load_survey(ACTIVE_ITEMS + FREQ_ITEMS)  # the page only uses the ordinal items
 
 if df.empty:
     st.stop()
@@ -66,11 +74,12 @@ platforms_to_compare = [
 
 most_used_counts = {}
 
-for col in platforms_to_compare:
-    if col in df.columns:
-        count = df[df[col].isin(most_used_levels)].shape[0]
-        platform_name = col.replace('Active_', '').replace('_Ordinal', '')
-        most_used_counts[platform_name] = count
+# Answers per activity level of every platform, from the maintained counts
+platform_counts = agg.likert_counts([col for col in platforms_to_compare if col in df.columns])
+
+for col, counts in platform_counts.iterrows():
+    platform_name = col.replace('Active_', '').replace('_Ordinal', '')
+    most_used_counts[platform_name] = counts[most_used_levels].sum()
 
 usage_df = pd.DataFrame({
     'Platform': list(most_used_counts.keys()),
@@ -88,7 +97,7 @@ fig1 = px.pie(
 fig1.update_traces(textposition='inside', textinfo='percent+label')
 fig1 = center_title(fig1)
 
-st.plotly_chart(fig1, use_container_width=True)
+show_chart(fig1, "consumer_behaviour: fig1", use_container_width=True)
 
 st.info("""
 **Interpretation:**
@@ -111,28 +120,38 @@ ordinal_cols = [
     if (col.startswith('Active_') or col.startswith('Freq_')) and col.endswith('_Ordinal')
 ]
 
-social_df = df[ordinal_cols].apply(pd.to_numeric, errors='coerce')
-corr_matrix = social_df.corr()
+# Depends on the correlation method only
+@page_section("consumer_behaviour: correlation heatmap")
+def correlation_section():
+    # Spearman and polychoric treat the codes as ranked answers rather than scores
+    corr_method = st.radio(
+        "Correlation method:", ["Pearson", "Spearman", "Polychoric"], horizontal=True, key="behaviour_corr_method"
+    )
+    corr_matrix = correlation_matrix(ordinal_cols, corr_method.lower())
+
+    fig2 = px.imshow(
+        corr_matrix,
+        text_auto=".2f",
+        aspect="auto",
+        color_continuous_scale='RdBu_r',
+        title=f"Correlation Heatmap of Social Media Engagement Metrics ({corr_method})"
+    )
 
-fig2 = px.imshow(
-    corr_matrix,
-    text_auto=".2f",
-    aspect="auto",
-    color_continuous_scale='RdBu_r',
-    title="Correlation Heatmap of Social Media Engagement Metrics"
-)
+    fig2.update_layout(xaxis_tickangle=-45)
+    fig2 = center_title(fig2)
 
-fig2.update_layout(xaxis_tickangle=-45)
-fig2 = center_title(fig2)
+    show_chart(fig2, "consumer_behaviour: fig2", use_container_width=True)
 
-st.plotly_chart(fig2, use_container_width=True)
+    st.info("""
+        **Key Observations:**
+        1. **Positive correlations** exist between activities on the same platforms such as higher activity on Instagram is correlated with higher engagement on Instagram-related tasks like reading posts.
+        2. **Some behaviors,** like frequent sharing or commenting, show a positive correlation with various platforms such as commenting on posts correlates strongly with sharing posts or uploading pictures/videos).
+        3. **Negative correlations** are observed between activities on different platforms, indicating that high activity on one platform might correlate with lower activity on others such as active Facebook usage negatively correlates with activity on other platforms like TikTok or Pinterest)
+        """)
+
+
+correlation_section()
 
-st.info("""
-    **Key Observations:**
-    1. **Positive correlations** exist between activities on the same platforms such as higher activity on Instagram is correlated with higher engagement on Instagram-related tasks like reading posts.
-    2. **Some behaviors,** like frequent sharing or commenting, show a positive correlation with various platforms such as commenting on posts correlates strongly with sharing posts or uploading pictures/videos).
-    3. **Negative correlations** are observed between activities on different platforms, indicating that high activity on one platform might correlate with lower activity on others such as active Facebook usage negatively correlates with activity on other platforms like TikTok or Pinterest)
-    """)
 
 # ======================================================
 # SECTION C: ACTIVITY LEVEL DISTRIBUTION
@@ -152,26 +171,25 @@ activity_labels = {
 # Identify the columns
 ordinal_activity_cols = [col for col in df.columns if col.startswith('Active_') and col.endswith('_Ordinal')]
 
-# Melt the dataframe from wide to long format
-df_melted_activity = df.melt(
-    value_vars=ordinal_activity_cols,
+# Respondents per platform and activity level, from the maintained answer
+# counts (one bar per cell, not one row per respondent and platform)
+activity_counts = count_frame(
+    agg.likert_counts(ordinal_activity_cols).rename(index=lambda col: col.replace('Active_', '').replace('_Ordinal', '')),
     var_name='Platform',
-    value_name='Activity_Ordinal'
+    value_name='Activity_Level',
+    labels=activity_labels
 )
 
-# Clean up Platform names and map labels
-df_melted_activity['Platform'] = df_melted_activity['Platform'].str.replace('Active_', '').str.replace('_Ordinal', '')
-df_melted_activity['Activity_Level'] = df_melted_activity['Activity_Ordinal'].map(activity_labels)
-
 # Define order for consistent visualization (matching your request)
 platform_order = ['Facebook', 'Threads', 'Instagram', 'Pinterest', 'Tiktok']
 activity_order = ['Very Active', 'Active', 'Sometimes Active', 'Inactive']
 
 # 3. Create the Plotly Grouped Bar Chart
 # This replaces the Seaborn sns.countplot logic
-fig_grouped = px.histogram(
-    df_melted_activity,
+fig_grouped = px.bar(
+    activity_counts,
     x='Platform',
+    y='Count',
     color='Activity_Level',
     barmode='group',
     category_orders={
@@ -192,7 +210,7 @@ fig_grouped.update_layout(
 fig_grouped = center_title(fig_grouped)
 
 # 4. Display the Chart
-st.plotly_chart(fig_grouped, use_container_width=True)
+show_chart(fig_grouped, "consumer_behaviour: fig_grouped", use_container_width=True)
 
 # 6. Final Key Findings
 st.info("""
@@ -211,8 +229,6 @@ st.header("Section D: Distribution of Frequency Levels")
 
 import streamlit as st
 import pandas as pd
-import seaborn as sns
-import matplotlib.pyplot as plt
 
 # --- 1. DATA PREPARATION ---
 # Identify the frequency columns (e.g., Freq_Read posts or articles_Ordinal)
@@ -221,15 +237,14 @@ frequency_cols = [
     if col.startswith('Freq_') and col.endswith('_Ordinal')
 ]
 
-# Create df_melted_frequency for the Box Plot
-df_melted_frequency = df.melt(
-    value_vars=frequency_cols,
-    var_name='Activity_Type',
-    value_name='Frequency_Level'
+# Box plot statistics of every activity, from the maintained answer
+# counts: no rows are melted or sent to the chart, only the five-number
+# summaries and the distinct outlying answers
+frequency_counts = agg.likert_counts(frequency_cols).rename(
+    index=lambda col: col.replace('Freq_', '').replace('_Ordinal', '').replace('_', ' ')
 )
-
-# Clean the Activity_Type strings for display
-df_melted_frequency['Activity_Type'] = df_melted_frequency['Activity_Type'].str.replace('Freq_', '').str.replace('_Ordinal', '').str.replace('_', ' ')
+frequency_boxes = box_summary(frequency_counts)
+frequency_outliers = box_outliers(frequency_counts, frequency_boxes)
 
 # --- 2. MAPPINGS ---
 frequency_labels = {
@@ -249,48 +264,59 @@ activity_list = [
     "Upload pictures or videos"
 ]
 
-# --- 3. IN-PAGE FILTERING ---
-st.subheader("Social Media Activity Frequency Analysis")
+# Depends on the activity multiselect only
+@page_section("consumer_behaviour: frequency box plot")
+def frequency_section():
+    # --- 3. IN-PAGE FILTERING ---
+    st.subheader("Social Media Activity Frequency Analysis")
+
+    # Filter selection directly on page
+    selected_activities = st.multiselect(
+        "Filter Activities:",
+        options=activity_list,
+        default=activity_list
+    )
 
-# Filter selection directly on page
-selected_activities = st.multiselect(
-    "Filter Activities:",
-    options=activity_list,
-    default=activity_list
-)
+    # Apply Filter
+    shown_activities = [a for a in activity_list if a in selected_activities]
+
+    # --- 4. MAIN BOX PLOT ---
+    if shown_activities:
+        palette = px.colors.sample_colorscale('Viridis', np.linspace(0, 1, len(shown_activities)))
+        fig_box = go.Figure()
+        for activity, color in zip(shown_activities, palette):
+            box = frequency_boxes.loc[activity]
+            fig_box.add_trace(go.Box(
+                x=[activity], q1=[box['q1']], median=[box['median']], q3=[box['q3']],
+                lowerfence=[box['lower']], upperfence=[box['upper']],
+                name=activity, marker_color=color, boxpoints=False, showlegend=False
+            ))
+        outliers = frequency_outliers[frequency_outliers['Item'].isin(shown_activities)]
+        # One marker per outlying answer, with how many respondents gave it
+        fig_box.add_trace(go.Scatter(
+            x=outliers['Item'], y=outliers['Code'], mode='markers',
+            marker=dict(color='#444', symbol='diamond-open', size=8),
+            customdata=outliers['Count'], showlegend=False, name='Outliers',
+            hovertemplate="%{x}<br>Level %{y}: %{customdata} respondents<extra>Outlier</extra>"
+        ))
+        fig_box.update_layout(
+            title='Distribution of Social Media Activity Frequencies (Box Plot)',
+            xaxis_title='Social Media Activity Type',
+            yaxis_title='Frequency Level',
+            xaxis=dict(categoryorder='array', categoryarray=shown_activities, tickangle=-45),
+            # Set Y-Axis labels to your custom frequency labels
+            yaxis=dict(tickvals=list(frequency_labels.keys()), ticktext=list(frequency_labels.values())),
+            template='plotly_white', height=450
+        )
+
+        # Render the plot
+        show_chart(fig_box, "consumer_behaviour: fig_box", use_container_width=True)
+    else:
+        st.warning("Please select at least one activity type.")
 
-# Apply Filter
-filtered_df = df_melted_frequency[df_melted_frequency['Activity_Type'].isin(selected_activities)]
 
-# --- 4. MAIN BOX PLOT ---
-if not filtered_df.empty:
-    sns.set_style("whitegrid")
-    fig, ax = plt.subplots(figsize=(8, 4))
-    
-    sns.boxplot(
-        data=filtered_df,
-        x='Activity_Type',
-        y='Frequency_Level',
-        hue='Activity_Type',
-        palette='viridis',
-        legend=False,
-        # Ensure the order respects the original list and selection
-        order=[a for a in activity_list if a in selected_activities]
-    )
+frequency_section()
 
-    # Set Y-Axis labels to your custom frequency labels
-    ax.set_yticks(list(frequency_labels.keys()))
-    ax.set_yticklabels(list(frequency_labels.values()))
-    
-    plt.title('Distribution of Social Media Activity Frequencies (Box Plot)', fontsize=16)
-    plt.xlabel('Social Media Activity Type', fontsize=12)
-    plt.ylabel('Frequency Level', fontsize=12)
-    plt.xticks(rotation=45, ha='right', fontsize=10)
-    
-    # Render the plot
-    st.pyplot(fig)
-else:
-    st.warning("Please select at least one activity type.")
 
 st.divider()
 
@@ -315,97 +341,140 @@ st.header("Section E: Cross Platform Connection")
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-from scipy.stats import pearsonr
 
 # --- 1. DATA PREPARATION ---
 # Automatically identify platform activity columns for X and frequency behaviors for Y
 activity_options = [col for col in df.columns if col.startswith('Active_') and col.endswith('_Ordinal')]
 frequency_options = [col for col in df.columns if col.startswith('Freq_') and col.endswith('_Ordinal')]
 
-# --- 2. MAIN LAYOUT (Selectors and Analysis on the Left) ---
-st.subheader("Relationship Scatters")
+# Correlation, p-value and n of every platform x behaviour pair at once.
+# Both scales are flipped (see below), which only changes signs
+pair_stats = correlation_table(activity_options, frequency_options, flipped=activity_options + frequency_options)
+# ...and the trendline of every pair, fitted in closed form on the flipped scales
+pair_trends = trend_table(activity_options, frequency_options, flipped=activity_options + frequency_options)
+
+# Depends on the two scatter selectboxes only
+@page_section("consumer_behaviour: relationship scatter")
+def scatter_section():
+    # --- 2. MAIN LAYOUT (Selectors and Analysis on the Left) ---
+    st.subheader("Relationship Scatters")
+
+    # Create a 1:2 ratio to keep selectors and analysis boxes tight on the left
+    col_left, col_right = st.columns([1, 2])
+
+    with col_left:
+        # Dropdown for Platform Activity (X-axis)
+        x_col = st.selectbox(
+            "Select Platform Activity (X-axis)", 
+            options=activity_options, 
+            index=0,
+            format_func=lambda x: x.replace('Active_', '').replace('_Ordinal', '').replace('_', ' ')
+        )
+
+        # Dropdown for Specific Frequency Behaviors (Y-axis)
+        y_col = st.selectbox(
+            "Select Frequency Behavior (Y-axis)", 
+            options=frequency_options, 
+            index=0,
+            format_func=lambda x: x.replace('Freq_', '').replace('_Ordinal', '').replace('_', ' ')
+        )
+
+        # --- FLIP LOGIC FOR POSITIVE TREND ---
+        # We flip the scale so that higher numbers = higher engagement
+        # This prevents "active" users (0) appearing at the bottom and causing negative correlation
+        # Respondents per pair of flipped answers (from the pair tables): one
+        # bubble per pair instead of one point per respondent
+        df_plot = joint_counts(x_col, y_col, flipped=(x_col, y_col))
+
+        # Look up the correlation of the flipped pair
+        corr_coef, p_value, n_pairs = pair_stats.loc[(x_col, y_col)]
+        if n_pairs >= 2:
+            st.markdown(f"**Correlation Coefficient:** {corr_coef:.2f}")
+            st.caption(f"p = {p_value:.3g}, n = {int(n_pairs)}")
+
+            # Dynamic Analysis Box
+            if abs(corr_coef) > 0.7:
+                st.success("**Analysis: Strong Relationship.** These behaviors are deeply linked in the consumer's mind.")
+            elif abs(corr_coef) > 0.4:
+                st.warning("**Analysis: Moderate Relationship.** There is a noticeable link between these activities.")
+            else:
+                st.info("**Analysis: Weak Relationship.** These factors do not strongly influence each other.")
+        else:
+            st.error("Not enough data to calculate correlation.")
+
+        st.download_button(
+            "Download all pairs (CSV)",
+            pair_stats.to_csv(),
+            file_name="platform_behaviour_correlations.csv",
+            mime="text/csv"
+        )
+
+    with col_right:
+        # --- 3. PLOTTING ---
+        # Clean display names for UI
+        x_label = x_col.replace('Active_', '').replace('_Ordinal', '').replace('_', ' ')
+        y_label = y_col.replace('Freq_', '').replace('_Ordinal', '').replace('_', ' ')
+
+        view = st.radio(
+            "Scatter view",
+            ["Selected pair", "Overall scores (density)"],
+            horizontal=True,
+            help="Overall scores: each respondent's mean activity across all platforms against their mean frequency across all behaviours, binned into a grid."
+        )
+
+        if view == "Selected pair":
+            # One bubble per answer pair, sized and coloured by respondents
+            fig3 = count_scatter(
+                df_plot, 
+                x=x_col, 
+                y=y_col, 
+                opacity=0.6, 
+                title=f'Relationship: {x_label} vs {y_label}',
+                labels={
+                    x_col: f'{x_label} (Higher = More Active)',
+                    y_col: f'{y_label} (Higher = More Frequent)',
+                    'Count': 'Respondents'
+                },
+                template="plotly_white" 
+            )
+            trend = pair_trends.loc[(x_col, y_col)]
+            grid_color = 'LightGray'
+        else:
+            # Mean scores are near-continuous, so draw respondents per grid
+            # cell: the figure stays the same size however many respond
+            density, trend = score_density(activity_options, frequency_options, flipped=activity_options + frequency_options)
+            fig3 = density_map(
+                density,
+                title='Relationship: Overall Activity vs Overall Frequency',
+                labels=dict(
+                    x='Mean Platform Activity (Higher = More Active)',
+                    y='Mean Frequency Behavior (Higher = More Frequent)',
+                    color='Respondents'
+                ),
+                template="plotly_white"
+            )
+            grid_color = None
+            st.caption(f"Trend: R² = {trend['r2']:.2f}, n = {int(trend['n'])}")
 
-# Create a 1:2 ratio to keep selectors and analysis boxes tight on the left
-col_left, col_right = st.columns([1, 2])
+        # Add the regression line (with its confidence band) and style the grid
+        fig3.add_traces(line_traces(trend, color='red'))
 
-with col_left:
-    # Dropdown for Platform Activity (X-axis)
-    x_col = st.selectbox(
-        "Select Platform Activity (X-axis)", 
-        options=activity_options, 
-        index=0,
-        format_func=lambda x: x.replace('Active_', '').replace('_Ordinal', '').replace('_', ' ')
-    )
-    
-    # Dropdown for Specific Frequency Behaviors (Y-axis)
-    y_col = st.selectbox(
-        "Select Frequency Behavior (Y-axis)", 
-        options=frequency_options, 
-        index=0,
-        format_func=lambda x: x.replace('Freq_', '').replace('_Ordinal', '').replace('_', ' ')
-    )
+        fig3.update_layout(
+            xaxis=dict(dtick=1, showgrid=grid_color is not None, gridcolor=grid_color),
+            yaxis=dict(dtick=1, showgrid=grid_color is not None, gridcolor=grid_color),
+            title_x=0.5, # Center the title
+            margin=dict(l=20, r=20, t=50, b=20)
+        )
 
-    # --- FLIP LOGIC FOR POSITIVE TREND ---
-    # We flip the scale so that higher numbers = higher engagement
-    # This prevents "active" users (0) appearing at the bottom and causing negative correlation
-    df_plot = df.copy()
-    df_plot[x_col] = 3 - df_plot[x_col]  # Flip Activity (Assuming 0-3 scale)
-    df_plot[y_col] = 4 - df_plot[y_col]  # Flip Frequency (Assuming 0-4 scale)
-
-    # Calculate correlation based on flipped data
-    valid_df = df_plot[[x_col, y_col]].dropna()
-    if not valid_df.empty:
-        corr_coef, _ = pearsonr(valid_df[x_col], valid_df[y_col])
-        st.markdown(f"**Correlation Coefficient:** {corr_coef:.2f}")
-
-        # Dynamic Analysis Box
-        if abs(corr_coef) > 0.7:
-            st.success("**Analysis: Strong Relationship.** These behaviors are deeply linked in the consumer's mind.")
-        elif abs(corr_coef) > 0.4:
-            st.warning("**Analysis: Moderate Relationship.** There is a noticeable link between these activities.")
-        else:
-            st.info("**Analysis: Weak Relationship.** These factors do not strongly influence each other.")
-    else:
-        st.error("Not enough data to calculate correlation.")
-
-with col_right:
-    # --- 3. PLOTTING ---
-    try:
-        import statsmodels
-        t_line = "ols"
-    except ImportError:
-        t_line = None
-
-    # Clean display names for UI
-    x_label = x_col.replace('Active_', '').replace('_Ordinal', '').replace('_', ' ')
-    y_label = y_col.replace('Freq_', '').replace('_Ordinal', '').replace('_', ' ')
-
-    fig3 = px.scatter(
-        df_plot, 
-        x=x_col, 
-        y=y_col, 
-        trendline=t_line, 
-        opacity=0.6, 
-        title=f'Relationship: {x_label} vs {y_label}',
-        labels={
-            x_col: f'{x_label} (Higher = More Active)',
-            y_col: f'{y_label} (Higher = More Frequent)'
-        },
-        template="plotly_white" 
-    )
+        # Display the Plotly chart
+        show_chart(fig3, "consumer_behaviour: fig3", use_container_width=True)
 
-    # Style the regression line and grid
-    if t_line == "ols":
-        fig3.data[1].line.color = 'red' 
+    log_memory("consumer_behaviour: relationship scatter", df_plot)
 
-    fig3.update_layout(
-        xaxis=dict(dtick=1, showgrid=True, gridcolor='LightGray'),
-        yaxis=dict(dtick=1, showgrid=True, gridcolor='LightGray'),
-        title_x=0.5, # Center the title
-        margin=dict(l=20, r=20, t=50, b=20)
-    )
 
-    # Display the Plotly chart
-    st.plotly_chart(fig3, use_container_width=True)
+scatter_section()
+
 
 st.divider()
+
+log_memory("consumer_behaviour", df, activity_counts)
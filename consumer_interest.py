@@ -2,6 +2,12 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 
+from survey_data import (
+    cached_figure, interest_tables, log_memory, show_chart,
+    survey_aggregates, survey_metadata,
+)
+from survey_metadata import category_values
+
 # --- CONFIGURATION ---
 st.set_page_config(page_title="Section C: Consumer Interests", layout="wide")
 
@@ -33,61 +39,14 @@ div[data-testid="stVerticalBlock"] > div {
 """, unsafe_allow_html=True)
 
 # --- 1. DATA LOADING & CLEANING ---
-@st.cache_data
+# Every chart here is a count, answered from the count cube for the
+# current filter (see interest_tables in survey_data.py)
 def load_data():
-    file_path = "Cleaned_FashionHabitGF.csv"
     try:
-        df = pd.read_csv(file_path)
+        return survey_aggregates().cube
     except FileNotFoundError:
         st.error("Error: 'Cleaned_FashionHabitGF.csv' not found.")
-        return pd.DataFrame()
-
-    df = df.rename(columns={
-        'Average Monthly Expenses (RM)': 'Budget',
-        'Influence on Shopping': 'Influence',
-        'Awareness of Fashion Trends': 'Awareness',
-        'Employment Status': 'Job',
-        '  How often do you buy fashion products (clothes, shoes, accessories)?  ': 'Frequency', 
-        'Gender': 'Gender',
-        'Age': 'Age',
-        'Region': 'Region'
-    })
-    
-    def clean_influence(val):
-        val = str(val)
-        if "Online community" in val: return "Online Community"
-        if "Celebrities" in val: return "Influencers"
-        if "Brand advertisements" in val: return "Ads"
-        if "Family" in val: return "Family"
-        if "Friends" in val: return "Friends"
-        if "rely" in val: return "Self-Decision"
-        return val
-    df['Influence'] = df['Influence'].apply(clean_influence)
-    
-    # Ordering
-    budget_order_logic = ["<500", "500-1000", "1000-3000", ">3000"]
-    found_budget = [x for x in budget_order_logic if x in df['Budget'].unique()]
-    other_budget = [x for x in df['Budget'].unique() if x not in found_budget]
-    final_budget = found_budget + other_budget
-    df['Budget'] = pd.Categorical(df['Budget'], categories=final_budget, ordered=True)
-    
-    freq_order_logic = [
-        "Daily", "Every day", "Everyday", "Weekly", "Once a week", "Every week",
-        "Monthly", "Once a month", "Every month", "Every 2-3 months", "Quarterly",
-        "Every 6 months", "Twice a year", "Annually", "Once a year", "Yearly",
-        "Rarely", "Never"
-    ]
-    found_freq = [x for x in freq_order_logic if x in df['Frequency'].unique()]
-    other_freq = [x for x in df['Frequency'].unique() if x not in found_freq]
-    final_freq = found_freq + other_freq
-    if not final_freq: final_freq = sorted(df['Frequency'].dropna().unique().tolist())
-    df['Frequency'] = pd.Categorical(df['Frequency'], categories=final_freq, ordered=True)
-
-    df['Awareness_Str'] = df['Awareness'].astype(str)
-    awareness_order = sorted(df['Awareness_Str'].unique().tolist())
-    df['Awareness_Str'] = pd.Categorical(df['Awareness_Str'], categories=awareness_order, ordered=True)
-    
-    return df
+        return None
 
 # --- COLORS ---
 CONSISTENT_COLORS = ["#003f5c", "#d62728", "#2ca02c", "#bcbd22", "#9467bd", "#17becf"]
@@ -95,17 +54,16 @@ CONSISTENT_SCALE = 'Blues'
 
 # --- 2. PLOTLY CHART FUNCTIONS (Compact Height: 320px) ---
 
-def chart_pie_budget(df):
-    data = df['Budget'].value_counts().reset_index()
-    data.columns = ['Budget', 'Count']
+def chart_pie_budget(budget):
+    data = budget.sort_values('Count', ascending=False, kind='stable')
     fig = px.pie(data, values='Count', names='Budget', title="Distribution of Monthly Budget",
                  color_discrete_sequence=CONSISTENT_COLORS, hole=0, height=320)
     fig.update_traces(textposition='inside', textinfo='percent+label', textfont_size=14)
     fig.update_layout(margin=dict(t=40, b=10, l=10, r=10)) 
     return fig
 
-def chart_bar_awareness(df):
-    data = df['Awareness_Str'].value_counts().sort_index().reset_index()
+def chart_bar_awareness(awareness):
+    data = awareness.sort_values('Awareness_Str')
     data.columns = ['Awareness', 'Count']
     fig = px.bar(data, x='Awareness', y='Count', title="Self-Perceived Fashion Awareness Level",
                  labels={'Awareness': 'Awareness Level (1-5)', 'Count': 'Number of Respondents'},
@@ -113,24 +71,25 @@ def chart_bar_awareness(df):
     fig.update_layout(margin=dict(t=40, b=10, l=10, r=10))
     return fig
 
-def chart_bar_influence(df):
-    data = df['Influence'].value_counts().reset_index()
-    data.columns = ['Influence', 'Count']
+def chart_bar_influence(influence):
+    data = influence.sort_values('Count', ascending=False, kind='stable')
     fig = px.bar(data, x='Influence', y='Count', title="Top Influencing Factors Ranking",
                  labels={'Influence': 'Source of Influence', 'Count': 'Number of Respondents'},
                  color='Influence', color_discrete_sequence=CONSISTENT_COLORS, height=320)
     fig.update_layout(showlegend=False, margin=dict(t=40, b=10, l=10, r=10))
     return fig
 
-def chart_heatmap_freq_budget(df):
-    fig = px.density_heatmap(df, x='Frequency', y='Budget', title="Matrix: Frequency vs. Budget",
+def chart_heatmap_freq_budget(freq_budget):
+    data = freq_budget[freq_budget['Count'] > 0]
+    fig = px.density_heatmap(data, x='Frequency', y='Budget', z='Count', histfunc='sum',
+                             title="Matrix: Frequency vs. Budget",
                              labels={'Frequency': 'Shopping Frequency', 'Budget': 'Monthly Budget'},
                              color_continuous_scale=CONSISTENT_SCALE, height=320)
-    fig.update_layout(margin=dict(t=40, b=10, l=10, r=10))
+    fig.update_layout(margin=dict(t=40, b=10, l=10, r=10), coloraxis_colorbar_title_text='count')
     return fig
 
-def chart_bubble_awareness_budget(df):
-    df_grouped = df.groupby(['Awareness_Str', 'Budget']).size().reset_index(name='Count')
+def chart_bubble_awareness_budget(awareness_budget):
+    df_grouped = awareness_budget[awareness_budget['Count'] > 0]
     fig = px.scatter(df_grouped, x='Awareness_Str', y='Budget', size='Count', color='Count',
                      title="Correlation: Awareness vs. Budget",
                      labels={'Awareness_Str': 'Fashion Awareness (1-5)', 'Budget': 'Budget Range'},
@@ -138,8 +97,8 @@ def chart_bubble_awareness_budget(df):
     fig.update_layout(margin=dict(t=40, b=10, l=10, r=10))
     return fig
 
-def chart_stacked_influence_freq(df):
-    df_grouped = df.groupby(['Influence', 'Frequency']).size().reset_index(name='Count')
+def chart_stacked_influence_freq(influence_freq):
+    df_grouped = influence_freq[influence_freq['Count'] > 0]
     fig = px.bar(df_grouped, x='Influence', y='Count', color='Frequency',
                  title="Impact of Influences on Shopping Frequency",
                  labels={'Influence': 'Influence Source', 'Count': 'Count', 'Frequency': 'Frequency'},
@@ -161,37 +120,44 @@ def app():
     </div>
     """, unsafe_allow_html=True)
     
-    df = load_data()
-    if df.empty: return
+    cube = load_data()
+    if cube is None: return
 
     # --- FILTERS ---
     st.subheader("🔍 Filter Data Scope")
     f1, f2 = st.columns(2)
+    meta = survey_metadata()
     with f1:
-        region_options = df['Region'].unique().tolist()
+        region_options = category_values(meta, 'Region')
         selected_regions = st.multiselect("Select Region (Scope):", region_options, default=region_options)
     with f2:
-        gender_options = df['Gender'].unique().tolist()
+        gender_options = category_values(meta, 'Gender')
         selected_genders = st.multiselect("Select Gender (Scope):", gender_options, default=gender_options)
     
-    df_filtered = df[(df['Region'].isin(selected_regions)) & (df['Gender'].isin(selected_genders))]
-    st.caption(f"Showing analysis for **{len(df_filtered)}** respondents.")
+    where = {'Region': selected_regions, 'Gender': selected_genders}
+    total_respondents = cube.total(where)
+    st.caption(f"Showing analysis for **{total_respondents}** respondents.")
     st.markdown("---")
     
-    if df_filtered.empty:
+    if total_respondents == 0:
         st.warning("⚠️ No data available.")
         return
 
     # --- SCORECARD ---
     st.subheader("📊 Key Consumer Interest Summary")
-    total_respondents = len(df_filtered)
-    if not df_filtered.empty:
-        top_budget = df_filtered['Budget'].mode()[0]
-        top_influence = df_filtered['Influence'].mode()[0]
-        avg_awareness_val = pd.to_numeric(df_filtered['Awareness'], errors='coerce').mean()
-        avg_awareness = f"{avg_awareness_val:.1f} / 5.0" if not pd.isna(avg_awareness_val) else "N/A"
+    # Every table on the page, from a single slice of the count cube
+    budget, influence, awareness, awareness_str, freq_budget, awareness_budget, influence_freq = interest_tables([
+        ['Budget'], ['Influence'], ['Awareness'], ['Awareness_Str'],
+        ['Frequency', 'Budget'], ['Awareness_Str', 'Budget'], ['Influence', 'Frequency'],
+    ], where, observed=False)
+    # Ties go to the first answer in form order, as with mode()
+    top_budget = budget.loc[budget['Count'].idxmax(), 'Budget'] if not budget.empty else "N/A"
+    top_influence = influence.loc[influence['Count'].idxmax(), 'Influence'] if not influence.empty else "N/A"
+    if not awareness.empty:
+        avg_awareness_val = (awareness['Awareness'] * awareness['Count']).sum() / awareness['Count'].sum()
+        avg_awareness = f"{avg_awareness_val:.1f} / 5.0"
     else:
-        top_budget, top_influence, avg_awareness = "N/A", "N/A", "N/A"
+        avg_awareness = "N/A"
 
     m1, m2, m3, m4 = st.columns(4)
     m1.metric("Total Respondents", f"{total_respondents}")
@@ -202,10 +168,12 @@ def app():
     st.markdown("---")
 
     # --- VISUALIZATIONS (COMPACT MODE) ---
+    # Figures are shared between sessions with the same filter (see
+    # cached_figure in survey_data.py); the builders only run on a miss
     
     # 1. DISTRIBUTION (PIE)
     st.header("1. Spending Preferences")
-    st.plotly_chart(chart_pie_budget(df_filtered), use_container_width=True)
+    show_chart(cached_figure('interest/pie_budget', where, chart_pie_budget, budget), "consumer_interest: pie_budget", use_container_width=True)
     st.info("""
     **📝 Analysis:**
     * Most respondents have a budget under RM500, confirming high price sensitivity.
@@ -215,7 +183,7 @@ def app():
     
     # 2. AWARENESS LEVEL (BAR)
     st.header("2. Fashion Knowledge Level")
-    st.plotly_chart(chart_bar_awareness(df_filtered), use_container_width=True)
+    show_chart(cached_figure('interest/bar_awareness', where, chart_bar_awareness, awareness_str), "consumer_interest: bar_awareness", use_container_width=True)
     st.info("""
     **📝 Analysis:**
     * Most respondents (Level 3-4) are educated consumers who understand trends well.
@@ -225,7 +193,7 @@ def app():
     
     # 3. RANKING (BAR)
     st.header("3. Key Interest Drivers")
-    st.plotly_chart(chart_bar_influence(df_filtered), use_container_width=True)
+    show_chart(cached_figure('interest/bar_influence', where, chart_bar_influence, influence), "consumer_interest: bar_influence", use_container_width=True)
     st.info("""
     **📝 Analysis:**
     * Online Communities and Influencers are far more trusted than traditional Brand Ads.
@@ -235,7 +203,7 @@ def app():
     
     # 4. FREQUENCY vs BUDGET (HEATMAP)
     st.header("4. Interest Intensity Matrix")
-    st.plotly_chart(chart_heatmap_freq_budget(df_filtered), use_container_width=True)
+    show_chart(cached_figure('interest/heatmap_freq_budget', where, chart_heatmap_freq_budget, freq_budget), "consumer_interest: heatmap_freq_budget", use_container_width=True)
     st.info("""
     **📝 Analysis:**
     * A "High Frequency, Low Budget" pattern indicates strong Fast Fashion behavior.
@@ -245,7 +213,7 @@ def app():
 
     # 5. AWARENESS vs BUDGET (BUBBLE)
     st.header("5. Awareness vs. Spending Interest")
-    st.plotly_chart(chart_bubble_awareness_budget(df_filtered), use_container_width=True)
+    show_chart(cached_figure('interest/bubble_awareness_budget', where, chart_bubble_awareness_budget, awareness_budget), "consumer_interest: bubble_awareness_budget", use_container_width=True)
     st.info("""
     **📝 Analysis:**
     * High awareness often links to low budgets, revealing the "Smart Shopper" effect.
@@ -255,7 +223,7 @@ def app():
 
     # 6. INFLUENCE vs FREQUENCY (STACKED BAR)
     st.header("6. Impact of Drivers on Intensity (Frequency)")
-    st.plotly_chart(chart_stacked_influence_freq(df_filtered), use_container_width=True)
+    show_chart(cached_figure('interest/stacked_influence_freq', where, chart_stacked_influence_freq, influence_freq), "consumer_interest: stacked_influence_freq", use_container_width=True)
     st.info("""
     **📝 Analysis:**
     * Influencers drive the highest shopping frequency (Daily/Weekly) among all groups.
@@ -264,6 +232,7 @@ def app():
     
     st.markdown("---")
     st.success("✅ **Consumer Interest Analysis Complete**")
+    log_memory("consumer_interest", budget, influence, awareness)
 
 if __name__ == "__main__":
     app()
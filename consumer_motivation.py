@@ -3,6 +3,17 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 import numpy as np
+
+from survey_bootstrap import interval
+from survey_data import (
+    MOTIVATION_COLUMNS, bootstrap_items, correlation_matrix,
+    correlation_table, grouped_summary, joint_counts, log_memory,
+    motivation_view, page_section, segment_tests, show_chart,
+    survey_aggregates, trend_table,
+)
+from survey_likert import likert_summary
+from survey_plot import count_scatter
+from survey_trend import line_traces
 # ======================================================
 # PAGE CONFIG
 # ======================================================
@@ -18,31 +29,23 @@ def center_title(fig):
 # ======================================================
 # LOAD & MAP DATA
 # ======================================================
-@st.cache_data
-def load_motivation_data():
-    url = "https://raw.githubusercontent.com/izzatimahrup/SVProject_A-Survey-of-Fashion-Habits/main/Cleaned_FashionHabitGF.csv"
-    data = pd.read_csv(url)
-    data.columns = data.columns.str.strip()
-    
-    column_mapping = {
-        "I follow fashion brands on social media to get updates on new collections or promotions": "Updates & Promotions",
-        "I follow fashion brands on social media because  I like their products and style": "Product & Style",
-        "I follow fashion brands on social media because it is entertaining.": "Entertainment",
-        "I follow fashion brands on social media because I want to receive discounts or participate in contests.": "Discounts & Contests",
-        "I follow fashion brands on social media because it helps me express my personality": "Express Personality",
-        "I follow fashion brands on social media because I want to feel part of an online community.": "Online Community",
-        "I follow fashion brands on social media because I want to support or show loyalty to the brand.": "Brand Loyalty"
-    }
-    
-    data = data.rename(columns=column_mapping)
-    valid_cols = [v for v in column_mapping.values() if v in data.columns]
-    
-    if 'Gender' in data.columns:
-        data['Gender'] = data['Gender'].astype(str).str.strip()
-        
-    return data, valid_cols
-
-df, motivation_cols = load_motivation_data()
+# Only the motivation items are loaded here; the Gender split below comes from
+# grouped_summary(), which reads the items and the Gender column on its own
+df, motivation_cols = motivation_view(list(MOTIVATION_COLUMNS))
+
+# Whole-sample figures come from the maintained aggregates (no row scans):
+# the response distribution of the item bank, and everything derived from it
+agg = survey_aggregates()
+item_names = [k for k, v in MOTIVATION_COLUMNS.items() if v in motivation_cols]
+item_counts = agg.likert_counts(item_names).set_axis(motivation_cols)
+item_summary = likert_summary(item_counts)
+item_means = item_summary['mean']
+
+# Bootstrap resamples of the item means and agreement shares (the same
+# resamples for both), for the uncertainty of the figures below
+mean_samples = bootstrap_items(item_names)
+agree_samples = bootstrap_items(item_names, 'top2')
+mean_low, mean_high = interval(mean_samples)
 
 # ======================================================
 # HEADER
@@ -54,7 +57,7 @@ st.subheader("Key Performance Indicators")
 col_kpi1, col_kpi2, col_kpi3 = st.columns(3)
 
 # Calculations for KPIs
-motivation_means = df[motivation_cols].mean().sort_values(ascending=True).reset_index()
+motivation_means = item_means.sort_values(ascending=True).reset_index()
 motivation_means.columns = ['Motivation', 'Average Score']
 
 # KPI 1: Top Motivation
@@ -62,21 +65,29 @@ top_val = motivation_means.iloc[-1]['Average Score']
 top_name = motivation_means.iloc[-1]['Motivation']
 
 # KPI 2: Overall Agreement Rate (% of 4s and 5s across all motivation questions)
-total_responses = df[motivation_cols].size
-positive_responses = (df[motivation_cols] >= 4).sum().sum()
+total_responses = agg.n * len(motivation_cols)
+positive_responses = (item_summary['top2'] * item_summary['n']).sum()
 agreement_rate = (positive_responses / total_responses) * 100
 
 # KPI 3: Diversity of Interest (Count of motivations with mean > 3.5)
-strong_drivers_count = (df[motivation_cols].mean() > 3.5).sum()
+strong_drivers_count = (item_means > 3.5).sum()
+
+# 95% bootstrap intervals of the three KPIs
+top_low, top_high = interval(mean_samples.max(axis=1))
+rate_low, rate_high = interval(agree_samples.mean(axis=1) * 100)
+drivers_low, drivers_high = interval((mean_samples > 3.5).sum(axis=1))
 
 with col_kpi1:
-    st.metric("Highest Mean Score", f"{top_val:.2f}", help=f"Top Driver: {top_name}")
+    st.metric("Highest Mean Score", f"{top_val:.2f}",
+              help=f"Top Driver: {top_name} (95% CI {top_low:.2f}–{top_high:.2f})")
 
 with col_kpi2:
-    st.metric("Global Agreement Rate", f"{agreement_rate:.1f}%", help="Percentage of responses that are 'Agree' or 'Strongly Agree'")
+    st.metric("Global Agreement Rate", f"{agreement_rate:.1f}%",
+              help=f"Percentage of responses that are 'Agree' or 'Strongly Agree' (95% CI {rate_low:.1f}–{rate_high:.1f}%)")
 
 with col_kpi3:
-    st.metric("Strong Drivers", f"{strong_drivers_count} / {len(motivation_cols)}", help="Number of motivation categories scoring above 3.5 (Neutral)")
+    st.metric("Strong Drivers", f"{strong_drivers_count} / {len(motivation_cols)}",
+              help=f"Number of motivation categories scoring above 3.5 (Neutral) (95% CI {drivers_low:.0f}–{drivers_high:.0f})")
 
 st.markdown("---")
 
@@ -91,17 +102,22 @@ st.markdown(
 st.header("Section A: Motivation Ranking & Gender Comparison")
 
 # --- 1. Overall Ranking (Full Width) ---
-motivation_means = df[motivation_cols].mean().sort_values(ascending=True).reset_index()
+motivation_means = item_means.sort_values(ascending=True).reset_index()
 motivation_means.columns = ['Motivation', 'Average Score']
+# Error bars: 95% bootstrap interval of each mean
+ci = pd.DataFrame({'low': mean_low, 'high': mean_high}, index=motivation_cols).loc[motivation_means['Motivation']]
+motivation_means['CI Above'] = ci['high'].to_numpy() - motivation_means['Average Score']
+motivation_means['CI Below'] = motivation_means['Average Score'] - ci['low'].to_numpy()
 
 fig_ranking = px.bar(
     motivation_means, x='Average Score', y='Motivation',
+    error_x='CI Above', error_x_minus='CI Below',
     orientation='h', text_auto='.2f',
     color='Average Score', color_continuous_scale='Viridis',
     title="Overall Ranking: Average Agreement Score (Likert 1-5)"
 )
 fig_ranking.update_layout(xaxis_range=[1, 5], height=450)
-st.plotly_chart(center_title(fig_ranking), use_container_width=True)
+show_chart(center_title(fig_ranking), "consumer_motivation: fig_ranking", use_container_width=True)
 
 # --- 2. Summary Metrics (Intermediary insight) ---
 top_m = motivation_means.iloc[-1]['Motivation']
@@ -111,35 +127,38 @@ st.info(f"💡 **Key Insight:** '{top_m}' is the strongest driver across all res
 st.subheader("Gender Gap Analysis")
 
 # Processing Gender Means
-gender_mean_list = []
-for gender in df['Gender'].unique():
-    g_df = df[df['Gender'] == gender]
-    g_means = g_df[motivation_cols].mean()
-    for motivation, score in g_means.items():
-        gender_mean_list.append({'Motivation': motivation, 'Gender': gender, 'Mean Score': score})
-
-df_melted_means = pd.DataFrame(gender_mean_list)
+# Mean, n and confidence interval of every motivation for every gender,
+# from one grouped pass over the items
+gender_summary = grouped_summary(item_names, 'Gender').reset_index()
+gender_summary = gender_summary[gender_summary['n'] > 0]
+gender_summary['Motivation'] = gender_summary['Item'].map(MOTIVATION_COLUMNS)
+df_melted_means = gender_summary[['Motivation', 'Gender', 'mean']].rename(columns={'mean': 'Mean Score'})
 
 # Build the Dumbbell Chart
 fig_dumbbell = go.Figure()
 
-# Add the "bars" (lines between dots)
-for motivation in motivation_cols:
-    m_data = df_melted_means[df_melted_means['Motivation'] == motivation]
-    if len(m_data) >= 2:
-        fig_dumbbell.add_trace(go.Scatter(
-            x=m_data['Mean Score'], y=[motivation]*len(m_data),
-            mode='lines', line=dict(color='rgba(100,100,100,0.3)', width=3),
-            showlegend=False, hoverinfo='skip'
-        ))
+# Add the "bars" (lines between dots): one trace, one segment per
+# motivation, broken by a gap after each
+wide = df_melted_means.pivot(index='Motivation', columns='Gender', values='Mean Score').reindex(motivation_cols)
+wide = wide[wide.notna().sum(axis=1) >= 2]
+if not wide.empty:
+    gaps = np.full((len(wide), 1), np.nan)
+    fig_dumbbell.add_trace(go.Scatter(
+        x=np.hstack([wide.to_numpy(), gaps]).ravel(),
+        y=np.repeat(wide.index.to_numpy(dtype=object), wide.shape[1] + 1),
+        mode='lines', line=dict(color='rgba(100,100,100,0.3)', width=3),
+        showlegend=False, hoverinfo='skip'
+    ))
 
 # Add the Gender Points
 colors = {'Female': '#FF4B4B', 'Male': '#1C83E1', 'Other': '#9A9A9A'}
-for gender in df['Gender'].unique():
-    gender_data = df_melted_means[df_melted_means['Gender'] == gender]
+for gender, gender_data in gender_summary.groupby('Gender', observed=True, sort=True):
     fig_dumbbell.add_trace(go.Scatter(
-        x=gender_data['Mean Score'], y=gender_data['Motivation'],
+        x=gender_data['mean'], y=gender_data['Motivation'],
         mode='markers', name=gender,
+        customdata=gender_data[['n', 'ci_low', 'ci_high']],
+        hovertemplate="%{y}<br>Mean: %{x:.2f} (95% CI %{customdata[1]:.2f}–%{customdata[2]:.2f})"
+                      "<br>n = %{customdata[0]}<extra>" + str(gender) + "</extra>",
         marker=dict(color=colors.get(gender, '#333'), size=14, line=dict(width=1, color='white'))
     ))
 
@@ -152,12 +171,38 @@ fig_dumbbell.update_layout(
     margin=dict(l=20, r=20, t=60, b=40)
 )
 
-st.plotly_chart(center_title(fig_dumbbell), use_container_width=True)
+show_chart(center_title(fig_dumbbell), "consumer_motivation: fig_dumbbell", use_container_width=True)
+
+# Widest gap between the first two genders, with its 95% bootstrap interval
+gender_labels = list(grouped_summary(item_names, 'Gender').index.levels[0])
+if len(wide.columns) >= 2:
+    first, second = wide.columns[:2]
+    gaps = wide[first] - wide[second]
+    widest = gaps.abs().idxmax()
+    gap_samples = bootstrap_items(item_names, by='Gender')
+    gap_samples = gap_samples[:, gender_labels.index(first)] - gap_samples[:, gender_labels.index(second)]
+    gap_low, gap_high = interval(gap_samples[:, motivation_cols.index(widest)])
+    # Mann-Whitney test of every motivation between the two genders, Holm-adjusted
+    gap_tests = segment_tests(item_names, 'Gender', (first, second)).set_axis(motivation_cols)
+    significant = gap_tests.index[gap_tests['p_adj'] < 0.05]
+    st.caption(
+        f"Widest gap: **{widest}** ({first} − {second} = {gaps[widest]:+.2f}, "
+        f"95% CI {gap_low:+.2f} to {gap_high:+.2f}; Mann–Whitney p = {gap_tests.loc[widest, 'p']:.3f}, "
+        f"Holm-adjusted {gap_tests.loc[widest, 'p_adj']:.3f})"
+    )
+    gap_note = (
+        f"{len(significant)} of {len(gap_tests)} motivations differ significantly between {first} and {second} "
+        f"(Mann–Whitney, Holm-adjusted p < 0.05)"
+        + (f": {', '.join(significant)}. Strategies for these categories should be segmented by gender for maximum ROI."
+           if len(significant) else "; the gaps are directional only.")
+    )
+else:
+    gap_note = "Fewer than two genders answered, so no gap can be tested."
 
 st.info(f"""
 **📝 Strategic Interpretation: Section A**
 * **Primary Driver:** Respondents consistently prioritize **{top_name}**, indicating brand identity and product style are the strongest anchors.
-* **Gender Dynamics:** Long horizontal lines in the chart above signify a high 'Demographic Gap.' Strategies for these categories should be segmented by gender for maximum ROI.
+* **Gender Dynamics:** Long horizontal lines in the chart above signify a high 'Demographic Gap.' {gap_note}
 """)
     
 # ======================================================
@@ -175,14 +220,11 @@ plot_columns = ['Strongly Disagree', 'Disagree', 'Neutral', 'Agree', 'Strongly A
 # We sample at 0, 0.25, 0.5, 0.75, and 1.0 to get the full range
 plasma_colors = px.colors.sample_colorscale("Plasma", [0, 0.25, 0.5, 0.75, 1.0])
 
-pct_list = []
-for col in motivation_cols:
-    # Get normalized counts (percentages)
-    counts = df[col].value_counts(normalize=True).mul(100).reindex([1, 2, 3, 4, 5], fill_value=0)
-    pct_list.append(counts.values)
+# Normalized counts (percentages) of every item at once
+pct = item_counts.div(item_summary['n'], axis=0).mul(100).reindex(columns=[1, 2, 3, 4, 5], fill_value=0)
 
 # Create a DataFrame for Plotly
-df_pct = pd.DataFrame(pct_list, index=motivation_cols, columns=plot_columns).reset_index()
+df_pct = pd.DataFrame(pct.to_numpy(), index=motivation_cols, columns=plot_columns).reset_index()
 df_pct = df_pct.rename(columns={'index': 'Motivation'})
 
 # --- 2. Create Plotly Stacked Bar Chart with Plasma Colors ---
@@ -206,7 +248,7 @@ fig_stacked.update_layout(
     legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
 )
 
-st.plotly_chart(center_title(fig_stacked), use_container_width=True)
+show_chart(center_title(fig_stacked), "consumer_motivation: fig_stacked", use_container_width=True)
 
 
 
@@ -244,59 +286,94 @@ with col_right:
 st.divider()
 st.header("Section C: Engagement Relationships")
 
-tab_corr, tab_rel = st.tabs(["Correlation Heatmap", "Relationship Scatters"])
-
-with tab_corr:
-    st.write("### How motivations move together")
-    corr_matrix = df[motivation_cols].corr()
-    fig_heatmap = px.imshow(
-        corr_matrix, text_auto=".2f",
-        color_continuous_scale='RdBu_r',
-        title="Correlation Heatmap"
-    )
-    st.plotly_chart(center_title(fig_heatmap), use_container_width=True)
-    
-# Heatmap-specific interpretation (Only shows in this tab)
-    st.info(f"""
-    **📝 Key Observations: Relationship Analysis**
-
-    * **Positive Correlations:** Strong positive relationships (dark blue) exist between similar psychological drivers. For example, users who follow for **'{motivation_cols[4]}'** (Express Personality) often show high engagement with **'{motivation_cols[5]}'** (Online Community).
-      
-    * **Cluster Behaviors:** Certain behaviors, like seeking **Discounts** or **Updates**, show positive correlations across multiple categories, suggesting a "Reward-Driven" follower segment.
-
-    * **Negative or Weak Correlations:** Observed between contrasting motivations (red/white areas). A lower correlation indicates that high interest in **{motivation_cols[0]}** does not necessarily translate to activity in other areas, suggesting distinct targeting is needed.
-    """)
-
-with tab_rel:
+# Depends on the axis selections (and the pairs of the chosen method)
+@page_section("consumer_motivation: relationship scatter")
+def relationship_scatter(pair_stats, short_names):
     c1, c2 = st.columns([1, 2])
     with c1:
         x_var = st.selectbox("Select X-axis", motivation_cols, index=0)
         y_var = st.selectbox("Select Y-axis", motivation_cols, index=min(1, len(motivation_cols)-1))
-        
-        current_corr = df[x_var].corr(df[y_var])
+
+        # Every pair is precomputed; the selection is a lookup
+        current_corr, p_value, n_pairs = pair_stats.loc[(x_var, y_var)]
         st.write(f"**Correlation Coefficient:** {current_corr:.2f}")
-        
+        if not np.isnan(p_value):
+            st.caption(f"p = {p_value:.3g}, n = {int(n_pairs)}")
+
         if current_corr > 0.6:
             st.success("Analysis: **Strong Relationship**. These two factors are deeply linked in the consumer's mind.")
         elif current_corr > 0.3:
             st.warning("Analysis: **Moderate Relationship**. There is a visible trend, but other factors are also at play.")
         else:
             st.error("Analysis: **Weak Relationship**. These factors operate independently of one another.")
-    
+
     with c2:
-        try:
-            import statsmodels
-            t_line = "ols"
-        except ImportError:
-            t_line = None
-            
-        fig_scatter = px.scatter(
-            df, x=x_var, y=y_var, 
-            trendline=t_line, 
+        # Trendlines of every motivation pair, fitted in closed form
+        pair_trends = trend_table(item_names, item_names).rename(index=short_names)
+
+        # One bubble per pair of answers, sized by its respondents
+        items = {short: item for item, short in short_names.items()}
+        pair_counts = joint_counts(items[x_var], items[y_var]).rename(columns=short_names)
+        fig_scatter = count_scatter(
+            pair_counts, x=x_var, y=y_var, 
             opacity=0.4,
-            title=f"Relationship: {x_var} vs {y_var}"
+            title=f"Relationship: {x_var} vs {y_var}",
+            labels={"Count": "Respondents"}
+        )
+        fig_scatter.add_traces(line_traces(pair_trends.loc[(x_var, y_var)], color=px.colors.qualitative.Plotly[0]))
+        show_chart(center_title(fig_scatter), "consumer_motivation: fig_scatter", use_container_width=True)
+
+    st.download_button(
+        "Download all pairs (CSV)",
+        pair_stats.to_csv(),
+        file_name="motivation_correlations.csv",
+        mime="text/csv"
+    )
+
+
+# Both tabs depend on the correlation method; the scatter tab also on its
+# own axis selections, which rerun only that tab (relationship_scatter)
+@page_section("consumer_motivation: relationships")
+def relationships_section():
+    tab_corr, tab_rel = st.tabs(["Correlation Heatmap", "Relationship Scatters"])
+
+    with tab_corr:
+        st.write("### How motivations move together")
+        # Spearman and polychoric treat the Likert codes as ranked answers rather than scores
+        corr_method = st.radio(
+            "Correlation method:", ["Pearson", "Spearman", "Polychoric"], horizontal=True, key="motivation_corr_method"
+        )
+        corr_matrix = correlation_matrix(item_names, corr_method.lower())
+        corr_matrix = corr_matrix.set_axis(motivation_cols).set_axis(motivation_cols, axis=1)
+        # Coefficient, p-value and n of every motivation pair for the scatters tab
+        short_names = dict(zip(item_names, motivation_cols))
+        pair_stats = correlation_table(item_names, item_names, corr_method.lower()).rename(index=short_names)
+        fig_heatmap = px.imshow(
+            corr_matrix, text_auto=".2f",
+            color_continuous_scale='RdBu_r',
+            title=f"Correlation Heatmap ({corr_method})"
         )
-        st.plotly_chart(center_title(fig_scatter), use_container_width=True)
+        show_chart(center_title(fig_heatmap), "consumer_motivation: fig_heatmap", use_container_width=True)
+
+    # Heatmap-specific interpretation (Only shows in this tab)
+        st.info(f"""
+        **📝 Key Observations: Relationship Analysis**
+
+        * **Positive Correlations:** Strong positive relationships (dark blue) exist between similar psychological drivers. For example, users who follow for **'{motivation_cols[4]}'** (Express Personality) often show high engagement with **'{motivation_cols[5]}'** (Online Community).
+
+        * **Cluster Behaviors:** Certain behaviors, like seeking **Discounts** or **Updates**, show positive correlations across multiple categories, suggesting a "Reward-Driven" follower segment.
+
+        * **Negative or Weak Correlations:** Observed between contrasting motivations (red/white areas). A lower correlation indicates that high interest in **{motivation_cols[0]}** does not necessarily translate to activity in other areas, suggesting distinct targeting is needed.
+        """)
+
+    with tab_rel:
+        relationship_scatter(pair_stats, short_names)
+
+
+relationships_section()
+
 
 st.divider()
 st.markdown("✔ **Consumer Motivation Analysis Complete**")
+
+log_memory("consumer_motivation", df, df_pct, df_melted_means)
@@ -2,10 +2,21 @@
 # DEMOGRAPHIC INFORMATION SECTION - IZZATI 
 # =========================================================
 
+import textwrap
+
 import streamlit as st
 import pandas as pd
 import plotly.express as px
 
+from survey_bootstrap import interval
+from survey_data import (
+    answer_tests, bootstrap_answer_shares, contingency_tests, log_memory,
+    page_section, show_chart, survey_aggregates, survey_metadata,
+)
+from survey_metadata import category_values
+from survey_labels import relabel
+from survey_schema import AGE_ORDER, EDUCATION_ORDER, EXPENSE_ORDER
+
 # ---------------------------------------------------------
 # Page Configuration
 # ---------------------------------------------------------
@@ -17,33 +28,17 @@ st.set_page_config(
 # ---------------------------------------------------------
 # DATA LOADING
 # ---------------------------------------------------------
-@st.cache_data
-def load_data():
-    url = "https://raw.githubusercontent.com/izzatimahrup/SVProject_A-Survey-of-Fashion-Habits/refs/heads/main/Cleaned_FashionHabitGF.csv"
-    return pd.read_csv(url)
-
-df = load_data()
-
+# Every chart on this page is a count: whole-sample counts come from the
+# maintained aggregates and filtered ones from slicing the count cube
+# (survey_cube.py), so no respondent rows are loaded here
+agg = survey_aggregates()
+cube = agg.cube
 
-# Updated Sort Orders to match Google Form standards
-age_order = [
-    "<25 years old",
-    "26-34 years old",
-    "35-45 years old",
-    "46-55 years old",
-    ">55 years old"
-]
 
-education_order = [
-    "Lower secondary education",
-    "Secondary education",
-    "Post-secondary education",
-    "Bachelor’s degree",  
-    "Master’s degree",
-    "Doctoral degree"
-]
-
-expense_order = ["<500", "500-1000", "1000-3000", ">3000"]
+# Sort orders follow the Google Form (declared in survey_schema.py)
+age_order = AGE_ORDER
+education_order = EDUCATION_ORDER
+expense_order = EXPENSE_ORDER
 
 
 # ---------------------------------------------------------
@@ -69,29 +64,36 @@ st.subheader("👥 Key Demographic Summary")
 
 col1, col2, col3 = st.columns(3)
 
-total_respondents = len(df)
+total_respondents = agg.n
 col1.metric(
     label="Total Respondents",
     value=f"{total_respondents}",
     help="Total number of valid survey responses collected"
 )
 
-gender_counts = df["Gender"].value_counts()
+gender_counts = agg.value_counts("Gender")
 top_gender = gender_counts.idxmax()
 top_gender_pct = (gender_counts.max() / total_respondents) * 100
+# 95% bootstrap interval of the share
+gender_low, gender_high = interval(
+    bootstrap_answer_shares("Gender")[:, list(agg.category_counts["Gender"].index).index(top_gender)] * 100
+)
 col2.metric(
     label="Majority Gender",
     value=top_gender,
-    help=f"{top_gender_pct:.1f}% of respondents"
+    help=f"{top_gender_pct:.1f}% of respondents (95% CI {gender_low:.1f}–{gender_high:.1f}%)"
 )
 
-region_counts = df["Region"].value_counts()
+region_counts = agg.value_counts("Region")
 top_region = region_counts.idxmax()
 top_region_pct = (region_counts.max() / total_respondents) * 100
+region_low, region_high = interval(
+    bootstrap_answer_shares("Region")[:, list(agg.category_counts["Region"].index).index(top_region)] * 100
+)
 col3.metric(
     label="Majority Region",
     value=top_region,
-    help=f"{top_region_pct:.1f}% of respondents"
+    help=f"{top_region_pct:.1f}% of respondents (95% CI {region_low:.1f}–{region_high:.1f}%)"
 )
 
 
@@ -104,77 +106,88 @@ st.markdown(
     "background information on the sample characteristics."
 )
 
-# Gender and Age Distribution 
-st.subheader("1. Gender and Age Composition ")
-st.markdown(" 💡 Use the filters below to refine the demographic breakdown.")
-# 2 columns for the filters
-col_filter1, col_filter2 = st.columns(2)
-
-with col_filter1:
-    selected_gender = st.multiselect(
-        "Select Gender:",
-        options=df["Gender"].unique(),
-        default=df["Gender"].unique()
+# Only this section depends on the Gender and Age multiselects, so
+# changing them reruns it alone
+@page_section("demographic: gender and age")
+def gender_age_section():
+    # Gender and Age Distribution 
+    st.subheader("1. Gender and Age Composition ")
+    st.markdown(" 💡 Use the filters below to refine the demographic breakdown.")
+    # 2 columns for the filters
+    col_filter1, col_filter2 = st.columns(2)
+
+    # Answer lists come from the metadata sidecar
+    gender_options = category_values(survey_metadata(), "Gender")
+
+    with col_filter1:
+        selected_gender = st.multiselect(
+            "Select Gender:",
+            options=gender_options,
+            default=gender_options
+        )
+
+    with col_filter2:
+        selected_age = st.multiselect(
+            "Select Age Groups:",
+            options=age_order, 
+            default=age_order
+        )
+
+    # Apply filter by slicing the count cube (no row scan)
+    df_filtered = cube.count(
+        ["Gender", "Age"], where={"Gender": selected_gender, "Age": selected_age}
+    ).reset_index()
+
+    # Bold Formating
+    # To makes 'Female' and 'Male' bold for chart labels 
+    df_filtered["Gender"] = relabel(df_filtered["Gender"], "<b>{}</b>".format)
+
+    # Sunburst Chart for Gender and Age
+    fig1 = px.sunburst(
+        df_filtered,
+        path=["Gender", "Age"], 
+        values="Count",           
+        color="Gender",
+        color_discrete_map={'<b>Female</b>': '#FFB6C1', '<b>Male</b>': '#ADD8E6'},
+        title="Demographic Proportions: Gender and Age"
     )
 
-with col_filter2:
-    selected_age = st.multiselect(
-        "Select Age Groups:",
-        options=age_order, 
-        default=age_order
+    # hover and tooltip
+    fig1.update_traces(
+        textinfo="label+percent entry", 
+        marker=dict(line=dict(color='#FFFFFF', width=2)), # Appealing white border
+        hovertemplate="""
+        <b>Category:</b> %{label}<br>
+        <b>Total Count:</b> %{value}<br>
+        <b>Share of Parent:</b> %{percentParent:.1f}%<br>
+        <extra></extra>
+        """
     )
 
-# Apply filter
-df_filtered = df[
-    (df["Gender"].isin(selected_gender)) & 
-    (df["Age"].isin(selected_age))
-].copy() # to avoid SettingWithCopyWarning
-
-# Bold Formating
-# To makes 'Female' and 'Male' bold for chart labels 
-df_filtered["Gender"] = df_filtered["Gender"].apply(lambda x: f"<b>{x}</b>")
-
-# Sunburst Chart for Gender and Age
-fig1 = px.sunburst(
-    df_filtered,
-    path=["Gender", "Age"], 
-    values=None,           
-    color="Gender",
-    color_discrete_map={'<b>Female</b>': '#FFB6C1', '<b>Male</b>': '#ADD8E6'},
-    title="Demographic Proportions: Gender and Age"
-)
+    fig1.update_layout(
+        margin=dict(t=40, l=0, r=0, b=0),
+        height=400,
+        paper_bgcolor='rgba(0,0,0,0)', 
+    )
 
-# hover and tooltip
-fig1.update_traces(
-    textinfo="label+percent entry", 
-    marker=dict(line=dict(color='#FFFFFF', width=2)), # Appealing white border
-    hovertemplate="""
-    <b>Category:</b> %{label}<br>
-    <b>Total Count:</b> %{value}<br>
-    <b>Share of Parent:</b> %{percentParent:.1f}%<br>
-    <extra></extra>
-    """
-)
+    show_chart(fig1, "demographic: fig1", use_container_width=True)
+    st.info("""
+    📝 Interpretation:
+    - The sunburst reveals a sample dominated by younger female respondents, particularly in the under-25 and 26-34 age brackets.
+    - This indicates that the fashion insights captured are most representative of Gen Z and Millennial female consumers
+    """) 
+    st.markdown("---") 
+    log_memory("demographic: gender and age", df_filtered)
 
-fig1.update_layout(
-    margin=dict(t=40, l=0, r=0, b=0),
-    height=400,
-    paper_bgcolor='rgba(0,0,0,0)', 
-)
 
-st.plotly_chart(fig1, use_container_width=True)
-st.info("""
-📝 Interpretation:
-- The sunburst reveals a sample dominated by younger female respondents, particularly in the under-25 and 26-34 age brackets.
-- This indicates that the fashion insights captured are most representative of Gen Z and Millennial female consumers
-""") 
-st.markdown("---") 
+gender_age_section()
+
 
 # 2. Region Distribution
 st.subheader("2. Regional Distribution of Respondents")
 
 
-region_counts = df["Region"].value_counts().reset_index()
+region_counts = agg.value_counts("Region").rename_axis("Region").reset_index()
 region_counts.columns = ["Region", "Count"]
 
 # Calculate percentages for the tooltip
@@ -217,7 +230,7 @@ fig2.update_layout(
     font=dict(size=14)
 )
 
-st.plotly_chart(fig2, use_container_width=True)
+show_chart(fig2, "demographic: fig2", use_container_width=True)
 
 st.info("""
 📝 Interpretation:
@@ -230,8 +243,8 @@ st.markdown("---")
 st.subheader("3. Education Level Distribution")
 
 edu_counts = (
-    df["Education Level"]
-    .value_counts()
+    agg.value_counts("Education Level")
+    .rename_axis("Education Level")
     .reindex(education_order, fill_value=0)
     .reset_index(name="count")
     .rename(columns={"index": "Education Level"})
@@ -270,7 +283,7 @@ fig3.update_layout(
     plot_bgcolor='rgba(0,0,0,0)'
 )
 
-st.plotly_chart(fig3, use_container_width=True)
+show_chart(fig3, "demographic: fig3", use_container_width=True)
 
 st.info("""
 📝 Interpretation:
@@ -282,7 +295,7 @@ st.markdown("---")
 # 4. Employment Status Distribution
 st.subheader("4. Employment Status Distribution")
 
-employment_counts = df["Employment Status"].value_counts().reset_index()
+employment_counts = agg.value_counts("Employment Status").reset_index()
 employment_counts.columns = ["Status", "Count"]
 
 fig4 = px.pie(
@@ -307,7 +320,7 @@ fig4.update_layout(
     margin=dict(t=80, b=20, l=20, r=20)
 )
 
-st.plotly_chart(fig4, use_container_width=True)
+show_chart(fig4, "demographic: fig4", use_container_width=True)
 
 st.info("""
 📝 Interpretation:
@@ -320,7 +333,7 @@ st.markdown("---")
 st.subheader("5. Monthly Fashion Expenditure Distribution")
 
 
-expense_counts = df["Average Monthly Expenses (RM)"].value_counts().reindex(expense_order).reset_index()
+expense_counts = agg.value_counts("Average Monthly Expenses (RM)").reindex(expense_order).reset_index()
 expense_counts.columns = ["Expense", "Count"]
 expense_counts['pct'] = (expense_counts['Count'] / expense_counts['Count'].sum()) * 100
 
@@ -363,7 +376,7 @@ fig5.update_layout(
     plot_bgcolor='rgba(0,0,0,0)'
 )
 
-st.plotly_chart(fig5, use_container_width=True)
+show_chart(fig5, "demographic: fig5", use_container_width=True)
 st.info("""
 📝 Interpretation:
 - Most respondents fall into lower-to-middle spending tiers, which is a standout trend likely driven by the high volume of student participants.
@@ -374,7 +387,8 @@ st.markdown("---")
 # 6. Awareness of Fashion Trends
 st.subheader("6. Awareness of Fashion Trends")
 
-awareness_counts = df["Awareness of Fashion Trends"].value_counts().sort_index().reset_index()
+awareness_counts = agg.distribution("Awareness of Fashion Trends")
+awareness_counts = awareness_counts[awareness_counts > 0].reset_index()
 awareness_counts.columns = ["Level", "Count"]
 
 # Create the labels 
@@ -415,7 +429,7 @@ fig6.update_layout(
     plot_bgcolor='rgba(0,0,0,0)'
 )
 
-st.plotly_chart(fig6, use_container_width=True)
+show_chart(fig6, "demographic: fig6", use_container_width=True)
 
 st.info("""
 📝 Interpretation:
@@ -427,7 +441,7 @@ st.markdown("---")
 # 7. Factors Influencing Fashion Shopping Decisions
 st.subheader("7. Factors Influencing Fashion Shopping Decisions")
 
-influence_counts = df["Influence on Shopping"].value_counts().reset_index()
+influence_counts = agg.value_counts("Influence on Shopping").reset_index()
 influence_counts.columns = ["Factor", "Count"]
 
 fig7 = px.bar(
@@ -461,7 +475,7 @@ fig7.update_layout(
     plot_bgcolor='rgba(0,0,0,0)'
 )
 
-st.plotly_chart(fig7, use_container_width=True)
+show_chart(fig7, "demographic: fig7", use_container_width=True)
 
 st.info("""
 📝 Interpretation:
@@ -480,215 +494,255 @@ st.markdown(
     "spending behaviour, and shopping influences on social media."
 )
 
-# SECTION A: GENDER PERSPECTIVE
-st.subheader("📍 Section A: Gender-Based Trends")
-st.markdown("""
-    This section examines how fashion awareness and external influences differ between Male and Female respondents.
-""")
+# Depends on gender_choice only
+@page_section("demographic: gender trends")
+def gender_section():
+    # SECTION A: GENDER PERSPECTIVE
+    st.subheader("📍 Section A: Gender-Based Trends")
+    st.markdown("""
+        This section examines how fashion awareness and external influences differ between Male and Female respondents.
+    """)
 
-st.markdown("💡 Use the filter below to refine Gender:")
-gender_choice = st.selectbox("Select Gender:", ["All", "Female", "Male"], key="gender_filter_top")
+    st.markdown("💡 Use the filter below to refine Gender:")
+    gender_choice = st.selectbox("Select Gender:", ["All", "Female", "Male"], key="gender_filter_top")
 
-df_gender = df.copy()
-if gender_choice != "All":
-    df_gender = df_gender[df_gender["Gender"] == gender_choice]
+    gender_where = {} if gender_choice == "All" else {"Gender": [gender_choice]}
 
-# 8. Fashion Awareness - Gender
-st.subheader("1. Fashion Awareness by Gender")
+    # Both Section A tables from one slice of the count cube
+    gender_awareness, gender_influence = cube.crosstabs(
+        [["Gender", "Awareness of Fashion Trends"], ["Gender", "Influence on Shopping"]], where=gender_where
+    )
 
-# 1. Define the descriptive labels
-awareness_labels = {
-    5: "5 - Extremely aware",
-    4: "4 - Very aware",
-    3: "3 - Moderately aware",
-    2: "2 - Slightly aware",
-    1: "1 - Not aware at all"
-}
+    # 8. Fashion Awareness - Gender
+    st.subheader("1. Fashion Awareness by Gender")
 
-# 2. Map labels to data
-fig8_df = df_gender.copy()
-fig8_df["Awareness Label"] = fig8_df["Awareness of Fashion Trends"].map(awareness_labels)
-fig8_data = fig8_df.groupby(["Gender", "Awareness Label"]).size().reset_index(name="Count")
-
-if gender_choice == "All":
-    color_mapping = {
-        "5 - Extremely aware": "#1B5E20", 
-        "4 - Very aware": "#2E7D32",
-        "3 - Moderately aware": "#4CAF50",
-        "2 - Slightly aware": "#A5D6A7",
-        "1 - Not aware at all": "#E8F5E9"
-    }
-    color_col = "Awareness Label"
-else:
-    color_mapping = {
-        ("Female", "5 - Extremely aware"): "#880E4F", ("Female", "4 - Very aware"): "#E91E63",
-        ("Female", "3 - Moderately aware"): "#F06292", ("Female", "2 - Slightly aware"): "#F8BBD0",
-        ("Female", "1 - Not aware at all"): "#FCE4EC",
-        ("Male", "5 - Extremely aware"): "#0D47A1", ("Male", "4 - Very aware"): "#2196F3",
-        ("Male", "3 - Moderately aware"): "#64B5F6", ("Male", "2 - Slightly aware"): "#BBDEFB",
-        ("Male", "1 - Not aware at all"): "#E3F2FD"
+    # 1. Define the descriptive labels
+    awareness_labels = {
+        5: "5 - Extremely aware",
+        4: "4 - Very aware",
+        3: "3 - Moderately aware",
+        2: "2 - Slightly aware",
+        1: "1 - Not aware at all"
     }
-    fig8_data["Color_Key"] = fig8_data.apply(lambda x: (x["Gender"], x["Awareness Label"]), axis=1)
-    color_col = "Color_Key"
-
-fig8 = px.bar(
-    fig8_data, 
-    x="Gender", 
-    y="Count", 
-    color=color_col if gender_choice != "All" else "Awareness Label",
-    color_discrete_map=color_mapping,
-    # This keeps the levels in the right order (High to Low)
-    category_orders={"Awareness Label": [
-        "5 - Extremely aware", "4 - Very aware", "3 - Moderately aware", "2 - Slightly aware", "1 - Not aware at all"
-    ]},
-    barmode="stack",
-    title=f"Awareness Levels: {gender_choice} Participants"
-)
-
-fig8.update_layout(height=500, bargap=0.4, legend_title="Scale (Dark = High Awareness)")
-st.plotly_chart(fig8, use_container_width=True)
-st.info("""
-📝 Interpretation:
-- The comparison highlights a standout trend where female participants often report higher "Extremely aware" scores than their male counterparts.
-- These insights allow for more effective gender-targeted marketing that aligns with the specific awareness levels of each group
-""")
-st.markdown("---")
-
-# 9. Shopping Influence by Gender
-st.subheader("2. Shopping Influence Factors")
-
-fig9_data = df_gender.groupby(["Gender", "Influence on Shopping"]).size().reset_index(name="Count")
-
-fig9_data["Wrapped Label"] = fig9_data["Influence on Shopping"].str.wrap(15).apply(lambda x: x.replace('\n', '<br>'))
-
-color_map = {'Female': '#FFB6C1', 'Male': '#ADD8E6'}
-
-fig9 = px.bar(
-    fig9_data, 
-    x="Wrapped Label",
-    y="Count", 
-    color="Gender",            
-    barmode='group',           
-    color_discrete_map=color_map,
-    title=f"Influence Factors: Comparison for {gender_choice}",
-    text_auto=True
-)
-
-fig9.update_layout(
-    height=600, 
-    xaxis_title="Influence Factor",
-    yaxis_title="Count of Respondents",
-    xaxis={
-        'categoryorder': 'total descending',
-        'tickangle': 0,  
-        'tickfont': {'size': 11},
-        'automargin': True     
-    },
-    legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
-)
-fig9.update_traces(textposition='outside')
-st.plotly_chart(fig9, use_container_width=True)
-st.info("""
-📝 Interpretation:
-- The chart reveals that social media stands out as a significantly stronger influence for females compared to other traditional factors.
-- This standout result enables brands to focus their communication strategies on the primary trust sources for each gender demographic
-""")
-st.markdown("---")
-st.divider()
 
+    # 2. Map labels to data
+    fig8_data = gender_awareness.reset_index()
+    fig8_data["Awareness Label"] = fig8_data["Awareness of Fashion Trends"].map(awareness_labels)
+    fig8_data = fig8_data[["Gender", "Awareness Label", "Count"]]
+
+    if gender_choice == "All":
+        color_mapping = {
+            "5 - Extremely aware": "#1B5E20", 
+            "4 - Very aware": "#2E7D32",
+            "3 - Moderately aware": "#4CAF50",
+            "2 - Slightly aware": "#A5D6A7",
+            "1 - Not aware at all": "#E8F5E9"
+        }
+        color_col = "Awareness Label"
+    else:
+        color_mapping = {
+            ("Female", "5 - Extremely aware"): "#880E4F", ("Female", "4 - Very aware"): "#E91E63",
+            ("Female", "3 - Moderately aware"): "#F06292", ("Female", "2 - Slightly aware"): "#F8BBD0",
+            ("Female", "1 - Not aware at all"): "#FCE4EC",
+            ("Male", "5 - Extremely aware"): "#0D47A1", ("Male", "4 - Very aware"): "#2196F3",
+            ("Male", "3 - Moderately aware"): "#64B5F6", ("Male", "2 - Slightly aware"): "#BBDEFB",
+            ("Male", "1 - Not aware at all"): "#E3F2FD"
+        }
+        fig8_data["Color_Key"] = list(zip(fig8_data["Gender"], fig8_data["Awareness Label"]))
+        color_col = "Color_Key"
+
+    fig8 = px.bar(
+        fig8_data, 
+        x="Gender", 
+        y="Count", 
+        color=color_col if gender_choice != "All" else "Awareness Label",
+        color_discrete_map=color_mapping,
+        # This keeps the levels in the right order (High to Low)
+        category_orders={"Awareness Label": [
+            "5 - Extremely aware", "4 - Very aware", "3 - Moderately aware", "2 - Slightly aware", "1 - Not aware at all"
+        ]},
+        barmode="stack",
+        title=f"Awareness Levels: {gender_choice} Participants"
+    )
 
-# SECTION B: Monthly Expenses Focus
-st.subheader("📍 Section B: Expenditure & Employment Trends")
-st.markdown("""
-    This section investigates the link between professional status and monthly fashion spending, 
-    and how high-spending groups are influenced differently.
-""")
-
-st.markdown("💡 Use the filter below to refine Monthly Expenditure (RM):")
-
-#Define Color
-exp_palette = ['#FFF3E0', '#FFCC80', '#FFB74D', '#F57C00', '#E65100']
-solid_orange = ["#F57C00"]
-
-rm_expense_order = [f"RM {item}" if "RM" not in str(item) else item for item in expense_order]
-expense_choice = st.selectbox("Select Monthly Expenditure:", ["All"] + rm_expense_order, key="exp_filter_final_clean")
-
-df_expense = df.copy()
-if expense_choice != "All":
-    actual_val = expense_choice.replace("RM ", "")
-    df_expense = df_expense[df_expense["Average Monthly Expenses (RM)"] == actual_val]
-
-# 10. Treemap - Spending Power
-st.subheader("1. Spending Power by Employment")
-fig10_data = df_expense.groupby(["Employment Status", "Average Monthly Expenses (RM)"]).size().reset_index(name="Count")
+    fig8.update_layout(height=500, bargap=0.4, legend_title="Scale (Dark = High Awareness)")
+    show_chart(fig8, "demographic: fig8", use_container_width=True)
+    st.info("""
+    📝 Interpretation:
+    - The comparison highlights a standout trend where female participants often report higher "Extremely aware" scores than their male counterparts.
+    - These insights allow for more effective gender-targeted marketing that aligns with the specific awareness levels of each group
+    """)
+    st.markdown("---")
+
+    # 9. Shopping Influence by Gender
+    st.subheader("2. Shopping Influence Factors")
+
+    fig9_data = gender_influence.reset_index()
+
+    fig9_data["Wrapped Label"] = relabel(fig9_data["Influence on Shopping"], lambda x: "<br>".join(textwrap.wrap(x, 15)))
+
+    color_map = {'Female': '#FFB6C1', 'Male': '#ADD8E6'}
+
+    fig9 = px.bar(
+        fig9_data, 
+        x="Wrapped Label",
+        y="Count", 
+        color="Gender",            
+        barmode='group',           
+        color_discrete_map=color_map,
+        title=f"Influence Factors: Comparison for {gender_choice}",
+        text_auto=True
+    )
 
-# Sort numerically for color intensity
-fig10_data = fig10_data.sort_values("Average Monthly Expenses (RM)")
-fig10_data["Display RM"] = fig10_data["Average Monthly Expenses (RM)"].apply(lambda x: f"RM {x}")
+    fig9.update_layout(
+        height=600, 
+        xaxis_title="Influence Factor",
+        yaxis_title="Count of Respondents",
+        xaxis={
+            'categoryorder': 'total descending',
+            'tickangle': 0,  
+            'tickfont': {'size': 11},
+            'automargin': True     
+        },
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
+    )
+    fig9.update_traces(textposition='outside')
+    show_chart(fig9, "demographic: fig9", use_container_width=True)
+
+    # Does each factor's share differ between Female and Male respondents?
+    # One chi-square test per factor (that factor against the rest), Holm-adjusted
+    influence_tests = answer_tests("Gender", "Influence on Shopping")
+    influence_overall = contingency_tests([["Gender", "Influence on Shopping"]]).iloc[0]
+    female_lead = (influence_tests["Female"] - influence_tests["Male"]).idxmax()
+    lead_test = influence_tests.loc[female_lead]
+    lead_verdict = (
+        "a significantly stronger influence" if lead_test["p_adj"] < 0.05
+        else "a stronger influence (though not significant once all factors are compared)"
+    )
+    st.caption(
+        f"Gender × influence: χ² = {influence_overall['chi2']:.1f} (df {influence_overall['dof']:.0f}), "
+        f"p = {influence_overall['p']:.3f}, Cramér's V = {influence_overall['cramers_v']:.2f}. "
+        f"{female_lead}: {lead_test['Female']:.0%} of females vs {lead_test['Male']:.0%} of males, "
+        f"p = {lead_test['p']:.3f} (Holm-adjusted {lead_test['p_adj']:.3f})."
+    )
+    st.info(f"""
+    📝 Interpretation:
+    - The chart reveals that {female_lead.lower()} stands out as {lead_verdict} for females compared to other traditional factors.
+    - This standout result enables brands to focus their communication strategies on the primary trust sources for each gender demographic
+    """)
+    st.markdown("---")
+    st.divider()
+    log_memory("demographic: gender trends", fig8_data, fig9_data)
+
+
+gender_section()
+
+
+# Depends on expense_choice only
+@page_section("demographic: expenditure trends")
+def expense_section():
+    # SECTION B: Monthly Expenses Focus
+    st.subheader("📍 Section B: Expenditure & Employment Trends")
+    st.markdown("""
+        This section investigates the link between professional status and monthly fashion spending, 
+        and how high-spending groups are influenced differently.
+    """)
+
+    st.markdown("💡 Use the filter below to refine Monthly Expenditure (RM):")
+
+    #Define Color
+    exp_palette = ['#FFF3E0', '#FFCC80', '#FFB74D', '#F57C00', '#E65100']
+    solid_orange = ["#F57C00"]
+
+    rm_expense_order = [f"RM {item}" if "RM" not in str(item) else item for item in expense_order]
+    expense_choice = st.selectbox("Select Monthly Expenditure:", ["All"] + rm_expense_order, key="exp_filter_final_clean")
+
+    expense_where = {}
+    if expense_choice != "All":
+        actual_val = expense_choice.replace("RM ", "")
+        expense_where = {"Average Monthly Expenses (RM)": [actual_val]}
+
+    # Both Section B tables from one slice of the count cube
+    employment_expense, expense_influence = cube.crosstabs(
+        [["Employment Status", "Average Monthly Expenses (RM)"], ["Average Monthly Expenses (RM)", "Influence on Shopping"]],
+        where=expense_where
+    )
 
-if not fig10_data.empty:
-    path_logic = ["Employment Status", "Display RM"] if expense_choice == "All" else ["Employment Status"]
-    fig10 = px.treemap(
-        fig10_data,
-        path=path_logic,
-        values="Count",
+    # 10. Treemap - Spending Power
+    st.subheader("1. Spending Power by Employment")
+    fig10_data = employment_expense.reset_index()
+
+    # Sort numerically for color intensity
+    fig10_data = fig10_data.sort_values("Average Monthly Expenses (RM)")
+    fig10_data["Display RM"] = relabel(fig10_data["Average Monthly Expenses (RM)"], "RM {}".format).astype(str)
+    # Treemap paths need plain strings rather than categoricals
+    fig10_data["Employment Status"] = fig10_data["Employment Status"].astype(str)
+
+    if not fig10_data.empty:
+        path_logic = ["Employment Status", "Display RM"] if expense_choice == "All" else ["Employment Status"]
+        fig10 = px.treemap(
+            fig10_data,
+            path=path_logic,
+            values="Count",
+            color="Display RM" if expense_choice == "All" else None,
+            color_discrete_sequence=exp_palette if expense_choice == "All" else solid_orange,
+            title=f"Spending Power Distribution: {expense_choice}"
+        )
+        fig10.update_traces(hovertemplate="<b>%{label}</b><br>Count: %{value}<extra></extra>")
+        show_chart(fig10, "demographic: fig10", use_container_width=True)
+
+    st.info("""
+    📝 Interpretation:
+    - The treemap highlights that students make up the largest block of consumers, even though their spending ranges are more concentrated in lower tiers.
+    - This confirms that the student demographic is the most active and engaged participant in the fashion market surveyed
+    """)
+    st.markdown("---")
+
+    # 11. Influence by Spending Level
+    st.subheader("2. Influence by Spending Level")
+    fig11_data = expense_influence.reset_index()
+    # Ensure sorting for color logic
+    fig11_data = fig11_data.sort_values("Average Monthly Expenses (RM)")
+    fig11_data["Display RM"] = relabel(fig11_data["Average Monthly Expenses (RM)"], "RM {}".format)
+
+    fig11 = px.bar(
+        fig11_data, 
+        x="Count", 
+        y="Influence on Shopping", 
         color="Display RM" if expense_choice == "All" else None,
+        orientation='h', 
+        barmode='stack',
         color_discrete_sequence=exp_palette if expense_choice == "All" else solid_orange,
-        title=f"Spending Power Distribution: {expense_choice}"
+        title=f"Influence Factors for {expense_choice}"
     )
-    fig10.update_traces(hovertemplate="<b>%{label}</b><br>Count: %{value}<extra></extra>")
-    st.plotly_chart(fig10, use_container_width=True)
-    
-st.info("""
-📝 Interpretation:
-- The treemap highlights that students make up the largest block of consumers, even though their spending ranges are more concentrated in lower tiers.
-- This confirms that the student demographic is the most active and engaged participant in the fashion market surveyed
-""")
-st.markdown("---")
-
-# 11. Influence by Spending Level
-st.subheader("2. Influence by Spending Level")
-fig11_data = df_expense.groupby(["Average Monthly Expenses (RM)", "Influence on Shopping"]).size().reset_index(name="Count")
-# Ensure sorting for color logic
-fig11_data = fig11_data.sort_values("Average Monthly Expenses (RM)")
-fig11_data["Display RM"] = fig11_data["Average Monthly Expenses (RM)"].apply(lambda x: f"RM {x}")
-
-fig11 = px.bar(
-    fig11_data, 
-    x="Count", 
-    y="Influence on Shopping", 
-    color="Display RM" if expense_choice == "All" else None,
-    orientation='h', 
-    barmode='stack',
-    color_discrete_sequence=exp_palette if expense_choice == "All" else solid_orange,
-    title=f"Influence Factors for {expense_choice}"
-)
 
-totals = fig11_data.groupby("Influence on Shopping")["Count"].sum().reset_index()
-fig11.add_scatter(
-    x=totals["Count"],
-    y=totals["Influence on Shopping"],
-    mode='text',
-    text=totals["Count"],
-    textposition='middle right',
-    showlegend=False,
-    hoverinfo='skip' 
-)
+    totals = fig11_data.groupby("Influence on Shopping", observed=True)["Count"].sum().reset_index()
+    fig11.add_scatter(
+        x=totals["Count"],
+        y=totals["Influence on Shopping"],
+        mode='text',
+        text=totals["Count"],
+        textposition='middle right',
+        showlegend=False,
+        hoverinfo='skip' 
+    )
 
-fig11.update_layout(
-    yaxis={'categoryorder':'total ascending'}, 
-    legend={'traceorder': 'normal'},
-    xaxis={'range': [0, totals["Count"].max() * 1.15]} # Space for labels
-)
+    fig11.update_layout(
+        yaxis={'categoryorder':'total ascending'}, 
+        legend={'traceorder': 'normal'},
+        xaxis={'range': [0, totals["Count"].max() * 1.15]} # Space for labels
+    )
 
-fig11.update_traces(hovertemplate="Factor: %{y}<br>Count in Category: %{x}<extra></extra>")
-st.plotly_chart(fig11, use_container_width=True)
+    fig11.update_traces(hovertemplate="Factor: %{y}<br>Count in Category: %{x}<extra></extra>")
+    show_chart(fig11, "demographic: fig11", use_container_width=True)
 
-st.info("""
-📝 Interpretation:
-- The analysis identifies that top-tier spenders are motivated by distinct influence factors that differ from the majority student group.
-- This standout result clarifies the specific drivers for high-value consumers compared to the lifestyle-based choices of the broader student respondent pool
-""")
-st.divider()
+    st.info("""
+    📝 Interpretation:
+    - The analysis identifies that top-tier spenders are motivated by distinct influence factors that differ from the majority student group.
+    - This standout result clarifies the specific drivers for high-value consumers compared to the lifestyle-based choices of the broader student respondent pool
+    """)
+    st.divider()
+    log_memory("demographic: expenditure trends", fig10_data, fig11_data)
 
 
+expense_section()
@@ -1,5 +1,6 @@
 import streamlit as st
-import pandas as pd
+
+from survey_data import survey_metadata
 
 # Set page to wide mode for a more professional look
 st.set_page_config(page_title="Fashion Habits Dashboard", layout="wide")
@@ -7,12 +8,8 @@ st.set_page_config(page_title="Fashion Habits Dashboard", layout="wide")
 # ---------------------------------------------------------
 # LOAD DATA 
 # ---------------------------------------------------------
-@st.cache_data
-def load_data():
-    url = "https://raw.githubusercontent.com/izzatimahrup/SVProject_A-Survey-of-Fashion-Habits/refs/heads/main/Cleaned_FashionHabitGF.csv"
-    return pd.read_csv(url)
-
-df = load_data()
+# Only the metadata sidecar is read here, not the survey itself
+meta = survey_metadata()
 
 # =========================================================
 # HOMEPAGE HEADER
@@ -57,7 +54,7 @@ col1, col2 = st.columns([1, 2])
 with col1:
     # A big, bold stat for impact
     st.markdown(f"""
-        ### **{len(df)}**
+        ### **{meta['rows']}**
         **Valid Respondents**
     """)
     st.write("---")
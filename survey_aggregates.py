@@ -0,0 +1,128 @@
+# =========================================================
+# MAINTAINED SURVEY AGGREGATES
+# =========================================================
+# Running totals that the dashboard pages read instead of rescanning the
+# rows: answer counts per demographic category, a count cube over the
+# demographic answers (survey_cube.py), response counts per
+# Likert / ordinal code, and the joint answer counts of every pair of
+# coded items that the correlations are derived from (survey_corr.py).
+# Everything here is additive, so new responses (or chunks of a large
+# export) are folded in with updated() at a cost proportional to the new
+# rows only.
+#
+# Column names are used without their surrounding spaces, matching the
+# item lists in survey_schema.py.
+
+import numpy as np
+import pandas as pd
+
+from survey_corr import correlation, item_codes, pair_counts
+from survey_cube import CountCube
+from survey_schema import CATEGORICAL_COLUMNS, CODED_COLUMNS
+
+# Rows folded in per step by from_frame(): bounds the temporary arrays
+CHUNK_ROWS = 50_000
+
+
+class SurveyAggregates:
+    """Additive summary of a typed survey frame (see survey_schema.py)."""
+
+    def __init__(self):
+        self.n = 0
+        self.category_counts = {}   # column -> Series of counts by category
+        self.code_counts = {}       # column -> Series of counts by code
+        self.cube = CountCube()     # counts per combination of answers
+        self.items = []             # coded columns, in table order
+        self.pair_counts = None     # [i, j, a, b]: rows answering a to i and b to j
+
+    @classmethod
+    def from_frame(cls, df, chunk_rows=CHUNK_ROWS):
+        aggregates = cls()
+        for start in range(0, max(len(df), 1), chunk_rows):
+            aggregates = aggregates.updated(df.iloc[start:start + chunk_rows])
+        return aggregates
+
+    # ---------------------------------------------------------
+    # Updating
+    # ---------------------------------------------------------
+    def updated(self, df):
+        """New aggregates with the rows of df added (self is unchanged, so
+        pages reading the current aggregates never see a half update).
+        Raises ValueError when df does not have the coded items of the rows
+        already added, whose pair tables could not be carried forward."""
+        columns = {col.strip(): col for col in df.columns}
+        items = [name for name in CODED_COLUMNS if name in columns]
+        if self.pair_counts is not None and items != self.items:
+            raise ValueError(f"new rows have coded items {items}, expected {self.items}")
+        new = SurveyAggregates()
+        new.n = self.n + len(df)
+
+        for name in CATEGORICAL_COLUMNS:
+            if name not in columns:
+                continue
+            delta = df[columns[name]].value_counts(sort=False)
+            new.category_counts[name] = _add_counts(self.category_counts.get(name), delta)
+
+        new.cube = self.cube.updated(df)
+
+        for name in items:
+            delta = df[columns[name]].value_counts(sort=False)
+            scale = pd.Index(list(CODED_COLUMNS[name]))
+            delta = delta.reindex(scale, fill_value=0)
+            new.code_counts[name] = _add_counts(self.code_counts.get(name), delta)
+
+        new.items = items
+        new.pair_counts = pair_counts(df, items)
+        if self.pair_counts is not None:
+            new.pair_counts += self.pair_counts
+        return new
+
+    # ---------------------------------------------------------
+    # Reading
+    # ---------------------------------------------------------
+    def value_counts(self, column):
+        """Like df[column].value_counts() for a categorical column."""
+        return self.category_counts[column].sort_values(ascending=False, kind="stable")
+
+    def distribution(self, column, normalize=False):
+        """Response counts (or shares) for each code of a coded column."""
+        counts = self.code_counts[column]
+        if normalize:
+            return counts / counts.sum()
+        return counts
+
+    def likert_counts(self, columns):
+        """Response counts of an item bank, one row per item and a column
+        per code, in the layout of survey_likert.likert_counts()."""
+        counts = pd.DataFrame([self.code_counts[col] for col in columns], dtype="int64")
+        return counts.set_axis(pd.Index(list(columns), name="Item"))
+
+    def means(self, columns):
+        """Mean code of each coded column, ignoring missing answers."""
+        result = {}
+        for col in columns:
+            counts = self.code_counts[col]
+            result[col] = (counts.index.to_numpy() * counts.to_numpy()).sum() / counts.sum()
+        return pd.Series(result, dtype="float64")
+
+    def pair_tables(self, columns):
+        """Joint answer counts of every pair of the coded columns, in the
+        layout of survey_corr.pair_counts()."""
+        idx = [self.items.index(col) for col in columns]
+        return self.pair_counts[np.ix_(idx, idx)]
+
+    def corr(self, columns, method="pearson"):
+        """Pairwise-complete correlation matrix, like df.corr(method=...);
+        method is one of survey_corr.METHODS."""
+        r = correlation(self.pair_tables(columns), item_codes(columns), method)
+        return pd.DataFrame(r, index=columns, columns=columns)
+
+
+def _add_counts(total, delta):
+    """Add two count Series, keeping the categories of both."""
+    delta = delta.astype("int64")
+    delta.index = pd.Index(list(delta.index))
+    if total is None:
+        return delta
+    index = total.index.append(delta.index.difference(total.index, sort=False))
+    return total.reindex(index, fill_value=0) + delta.reindex(index, fill_value=0)
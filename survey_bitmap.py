@@ -0,0 +1,99 @@
+# =========================================================
+# BITMAP INDEX FOR DEMOGRAPHIC FILTERS
+# =========================================================
+# One packed bitset (a bit per respondent) for every answer of every
+# demographic column. A filter is evaluated on the bitsets alone: OR over
+# the selected answers of a column, AND across columns, eight respondents
+# per byte. Filters that cover a column's whole domain (the default
+# "everything selected" state of a multiselect) are skipped outright.
+#
+# The result is a row selection (a boolean mask, or slice(None) when no
+# filter applies) that any aggregation can index its numpy arrays with,
+# so the shared frame is never filtered or copied.
+#
+# Rows appended to the frame are indexed with extended(), which packs the
+# new rows only and joins their bits onto the existing bitsets.
+
+import numpy as np
+import pandas as pd
+
+from survey_schema import CATEGORICAL_COLUMNS
+
+
+class BitmapIndex:
+    """Per-answer bitsets over the rows of a typed survey frame."""
+
+    def __init__(self, n_rows):
+        self.n_rows = n_rows
+        self.bitmaps = {}   # column (stripped) -> {answer: packed uint8 bitset}
+        self.missing = {}   # column -> number of rows without an answer
+
+    @classmethod
+    def from_frame(cls, df, columns=None):
+        """Index the categorical columns of df (all of them by default)."""
+        index = cls(len(df))
+        for col in df.columns:
+            name = col.strip()
+            if columns is not None and name not in columns:
+                continue
+            if name not in CATEGORICAL_COLUMNS or not isinstance(df[col].dtype, pd.CategoricalDtype):
+                continue
+            codes = df[col].cat.codes.to_numpy()
+            index.bitmaps[name] = {
+                answer: np.packbits(codes == i)
+                for i, answer in enumerate(df[col].cat.categories)
+            }
+            index.missing[name] = int((codes < 0).sum())
+        return index
+
+    def extended(self, df):
+        """New index with the rows of df added after the indexed ones (self
+        is unchanged). An answer first given in df has no bits set over the
+        earlier rows; a column df lacks counts its rows as unanswered."""
+        added = BitmapIndex.from_frame(df, self.bitmaps.keys())
+        index = BitmapIndex(self.n_rows + added.n_rows)
+        old_empty = np.zeros((self.n_rows + 7) // 8, dtype="uint8")
+        new_empty = np.zeros((added.n_rows + 7) // 8, dtype="uint8")
+        for col, column in self.bitmaps.items():
+            new = added.bitmaps.get(col, {})
+            answers = list(column) + [answer for answer in new if answer not in column]
+            index.bitmaps[col] = {
+                answer: _join_bits(
+                    column.get(answer, old_empty), self.n_rows, new.get(answer, new_empty), added.n_rows
+                )
+                for answer in answers
+            }
+            index.missing[col] = self.missing[col] + added.missing.get(col, added.n_rows)
+        return index
+
+    def select(self, where):
+        """Packed bitset of the rows whose answers are in where (column ->
+        allowed answers), or None when every row matches."""
+        result = None
+        for col, allowed in where.items():
+            column = self.bitmaps[col]
+            allowed = set(allowed)
+            if not self.missing[col] and allowed.issuperset(column):
+                continue   # whole domain: the filter removes nothing
+            bits = np.zeros((self.n_rows + 7) // 8, dtype="uint8")
+            for answer in allowed & column.keys():
+                np.bitwise_or(bits, column[answer], out=bits)
+            result = bits if result is None else np.bitwise_and(result, bits, out=result)
+        return result
+
+    def selection(self, where):
+        """Row selection for where: a boolean mask to index arrays with, or
+        slice(None) (a view, no copy) when every row matches."""
+        bits = self.select(where)
+        if bits is None:
+            return slice(None)
+        return np.unpackbits(bits, count=self.n_rows).view(bool)
+
+def _join_bits(first, n_first, second, n_second):
+    """Packed bitset of the n_first bits of first followed by the n_second
+    bits of second. Only the last partial byte of first is unpacked."""
+    whole, tail = divmod(n_first, 8)
+    if not tail:
+        return np.concatenate([first[:whole], second])
+    bits = np.concatenate([np.unpackbits(first[whole:], count=tail), np.unpackbits(second, count=n_second)])
+    return np.concatenate([first[:whole], np.packbits(bits)])
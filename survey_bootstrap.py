@@ -0,0 +1,96 @@
+# =========================================================
+# BOOTSTRAP CONFIDENCE INTERVALS
+# =========================================================
+# Percentile bootstrap for the figures the pages report from ~100
+# respondents: item means, answer shares and differences between groups.
+#
+# Resamples are drawn as index matrices (one row of respondent indices
+# per resample) and turned into weight matrices, so the means of a whole
+# item bank for a batch of resamples are one matrix product. Batches are
+# sized to bound memory; very large jobs (many resamples of a large
+# export) are split across a process pool. The share of one categorical
+# answer only depends on the answer counts, so those resamples are drawn
+# from a multinomial without touching the rows.
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import numpy as np
+
+RESAMPLES = 10_000
+
+# Weight matrix cells (resamples x respondents) per batch
+BATCH_CELLS = 1 << 22
+
+# Jobs of at least this many cells go to a process pool
+PARALLEL_CELLS = 1 << 27
+
+
+def bootstrap_means(values, groups=None, n_groups=None, resamples=RESAMPLES, seed=0, workers=None):
+    """Resampled means of every column of values (respondents x items,
+    NaN where not answered): an array [resample, item], or
+    [resample, group, item] when groups gives each respondent's group
+    code (-1 for none; n_groups codes in all). Differences between groups
+    are differences of the group slices, taken within the same resamples.
+    The same seed and data always give the same resamples."""
+    values = np.asarray(values, dtype="float64")
+    return draw_in_parts(_bootstrap_part, (values, groups, n_groups), resamples, len(values), seed, workers)
+
+
+def draw_in_parts(part, args, draws, rows, seed=0, workers=None):
+    """Run part(*args, size, seed_sequence), which returns an array of
+    size draws (resamples, permutations...) over rows respondents. Jobs of
+    PARALLEL_CELLS or more are split across a process pool, each worker
+    with its own seed stream; smaller ones run here."""
+    workers = workers or os.cpu_count() or 1
+    if workers > 1 and draws * rows >= PARALLEL_CELLS:
+        seeds = np.random.SeedSequence(seed).spawn(workers)
+        sizes = [len(chunk) for chunk in np.array_split(np.arange(draws), workers)]
+        columns = [[arg] * workers for arg in args]
+        with ProcessPoolExecutor(workers, mp_context=get_context("spawn")) as pool:
+            return np.concatenate(list(pool.map(part, *columns, sizes, seeds)))
+    return part(*args, draws, np.random.SeedSequence(seed))
+
+
+def bootstrap_shares(counts, resamples=RESAMPLES, seed=0):
+    """Resampled shares of the answers of one question, from its answer
+    counts: an array [resample, answer]."""
+    counts = np.asarray(counts, dtype="int64")
+    n = counts.sum()
+    rng = np.random.default_rng(seed)
+    return rng.multinomial(n, counts / n, size=resamples) / n
+
+
+def interval(samples, confidence=0.95):
+    """Percentile interval of resampled statistics (along the first axis):
+    a (low, high) pair of arrays."""
+    tail = (1 - confidence) / 2 * 100
+    with np.errstate(invalid="ignore"):
+        low, high = np.nanpercentile(samples, [tail, 100 - tail], axis=0)
+    return low, high
+
+
+def _bootstrap_part(values, groups, n_groups, resamples, seed_sequence):
+    rng = np.random.default_rng(seed_sequence)
+    n = len(values)
+    answered = (~np.isnan(values)).astype("float64")
+    filled = np.nan_to_num(values)
+    if groups is None:
+        members = [slice(None)]
+    else:
+        if n_groups is None:
+            n_groups = int(groups.max()) + 1
+        members = [np.flatnonzero(groups == g) for g in range(n_groups)]
+
+    result = np.empty((resamples, len(members), values.shape[1]))
+    batch = max(1, BATCH_CELLS // max(n, 1))
+    for start in range(0, resamples, batch):
+        size = min(batch, resamples - start)
+        # Resampled respondent indices -> how often each respondent was drawn
+        draws = rng.integers(0, n, size=(size, n)) + (np.arange(size) * n)[:, None]
+        weights = np.bincount(draws.ravel(), minlength=size * n).reshape(size, n).astype("float64")
+        for g, rows in enumerate(members):
+            with np.errstate(divide="ignore", invalid="ignore"):
+                result[start:start + size, g] = (weights[:, rows] @ filled[rows]) / (weights[:, rows] @ answered[rows])
+    return result[:, 0] if groups is None else result
@@ -0,0 +1,215 @@
+# =========================================================
+# CORRELATIONS BETWEEN CODED ITEMS
+# =========================================================
+# Every coded item has at most a handful of answers, so the joint answers
+# of two items form a small table, and the tables of all item pairs are
+# sufficient statistics for every correlation the dashboard shows:
+#   * pearson    - on the codes, like df.corr()
+#   * spearman   - on the (mid)ranks, like df.corr(method="spearman")
+#   * polychoric - of the latent normal variables behind two ordinal
+#                  answers, estimated by maximum likelihood for all pairs
+#                  in one search over stacked tables
+# A pair's table only counts the rows where both items were answered, so
+# every method is pairwise-complete, the way pandas handles gaps.
+#
+# pair_statistics() adds p-values and pair counts, so a table of every
+# pair of an item set is one vectorised step; reversing an item's scale
+# only flips the sign of its correlations.
+#
+# pair_counts() builds all tables in one matrix product of the one-hot
+# answer codes. The tables are additive: the aggregates maintain them for
+# the whole dataset (survey_aggregates.py) and survey_data.py rebuilds them
+# from a row selection when a filter applies.
+
+import numpy as np
+from scipy import stats
+
+from survey_schema import CODED_COLUMNS, labels_for
+
+METHODS = ("pearson", "spearman", "polychoric")
+
+# Answers per item, the widest scale (shorter scales leave trailing zeros)
+WIDTH = max(len(labels) for labels in CODED_COLUMNS.values())
+
+# Rows per matrix product: float32 counts are exact below 2**24
+PRODUCT_ROWS = 1 << 20
+
+# Thresholds standing in for -inf / +inf in the bivariate normal CDF
+_EDGE = 8.0
+
+# Polychoric search: correlations within +-_BOUND, a shared grid of
+# _GRID_POINTS, then _REFINE_STEPS golden-section steps around the best
+_BOUND = 0.999
+_GRID_POINTS = 21
+_REFINE_STEPS = 30
+_GOLDEN = (np.sqrt(5) - 1) / 2
+
+# Gauss-Legendre rule of the bivariate normal CDF (error below 1e-10)
+_NODES, _WEIGHTS = np.polynomial.legendre.leggauss(30)
+
+
+def item_codes(columns, scales=None, flipped=()):
+    """Answer codes of each coded column, padded to WIDTH: the code value of
+    every slot of the tables. scales overrides those of renamed columns;
+    columns in flipped are scored in reverse (lowest + highest - code)."""
+    scales = scales or [list(labels_for(col)) for col in columns]
+    codes = np.zeros((len(columns), WIDTH))
+    for i, (col, scale) in enumerate(zip(columns, scales)):
+        scale = np.asarray(list(scale), dtype="float64")
+        codes[i, :len(scale)] = scale.min() + scale.max() - scale if col in flipped else scale
+    return codes
+
+
+def pair_counts(df, columns, scales=None, rows=slice(None)):
+    """Joint answer counts of every pair of columns (names stripped): an
+    int64 array [i, j, a, b] counting rows that gave answer a (a position
+    on the scale of column i) to i and answer b to j. scales overrides the
+    answer codes of renamed columns. Only the rows selected by rows (a
+    boolean mask or slice(None), see survey_bitmap.py) are counted; the
+    mask is applied to each column's codes, df is not filtered."""
+    names = {col.strip(): col for col in df.columns}
+    scales = scales or [list(labels_for(col)) for col in columns]
+    k = len(columns)
+    positions = []
+    for col, scale in zip(columns, scales):
+        lookup = np.full(257, -1, dtype="intp")   # -1 (missing) stays -1
+        lookup[list(scale)] = np.arange(len(scale))
+        positions.append(lookup[df[names.get(col, col)].to_numpy(dtype="int16", na_value=-1)[rows]])
+
+    n = len(positions[0]) if positions else 0
+    joint = np.zeros((k * WIDTH, k * WIDTH), dtype="int64")
+    for start in range(0, n, PRODUCT_ROWS):
+        stop = min(start + PRODUCT_ROWS, n)
+        onehot = np.zeros((stop - start, k * WIDTH), dtype="float32")
+        for i, pos in enumerate(positions):
+            rows = np.flatnonzero(pos[start:stop] >= 0)
+            onehot[rows, i * WIDTH + pos[start:stop][rows]] = 1
+        joint += (onehot.T @ onehot).astype("int64")
+    return joint.reshape(k, WIDTH, k, WIDTH).transpose(0, 2, 1, 3)
+
+
+def correlation(tables, codes, method="pearson"):
+    """Correlation matrix of the items behind pair tables (see pair_counts)
+    whose slots hold the given codes (see item_codes)."""
+    if method == "pearson":
+        return _pearson(tables, codes[:, None, :], codes[None, :, :])
+    if method == "spearman":
+        return _pearson(tables, _midranks(tables.sum(axis=3)), _midranks(tables.sum(axis=2)))
+    if method == "polychoric":
+        return _polychoric(tables)
+    raise ValueError(f"unknown correlation method {method!r}, expected one of {METHODS}")
+
+
+def pair_statistics(tables, codes, method="pearson"):
+    """Correlation, two-sided p-value and number of rows answering both
+    items, for every pair. The p-value tests for no correlation with the
+    t statistic on n - 2 degrees of freedom, as scipy.stats.pearsonr and
+    spearmanr do; it is NaN for polychoric correlations."""
+    r = correlation(tables, codes, method)
+    n = tables.sum(axis=(2, 3))
+    if method == "polychoric":
+        return r, np.full_like(r, np.nan), n
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = r * np.sqrt((n - 2) / (1 - r ** 2))
+        p = 2 * stats.t.sf(np.abs(t), n - 2)
+    return r, p, n
+
+
+def pair_moments(tables, x, y):
+    """n, sum x, sum y, sum x², sum y² and sum xy of every pair (arrays
+    [i, j]), with x[i, j] / y[i, j] the values of the slots of item i /
+    item j in their pair (broadcastable, e.g. codes[:, None, :] and
+    codes[None, :, :])."""
+    tables = tables.astype("float64")
+    x = np.broadcast_to(x, tables.shape[:3])
+    y = np.broadcast_to(y, tables.shape[:2] + tables.shape[3:])
+    row = tables.sum(axis=3)
+    col = tables.sum(axis=2)
+    return (
+        tables.sum(axis=(2, 3)),
+        (row * x).sum(axis=2),
+        (col * y).sum(axis=2),
+        (row * x ** 2).sum(axis=2),
+        (col * y ** 2).sum(axis=2),
+        np.einsum("ijab,ija,ijb->ij", tables, x, y),
+    )
+
+
+def _pearson(tables, x, y):
+    """Pearson correlation of every pair (see pair_moments for x and y)."""
+    n, sx, sy, sxx, syy, sxy = pair_moments(tables, x, y)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        r = (n * sxy - sx * sy) / np.sqrt((n * sxx - sx ** 2) * (n * syy - sy ** 2))
+    return np.clip(r, -1, 1)
+
+
+def _midranks(margins):
+    """Average rank of each answer slot given its counts (ties share the
+    mean of their ranks), along the last axis."""
+    below = np.cumsum(margins, axis=-1) - margins
+    return below + (margins + 1) / 2
+
+
+def _polychoric(tables):
+    """Two-step estimate for every pair at once: thresholds from the
+    margins, then the correlation maximising the likelihood of the table
+    under a bivariate normal. The likelihood of all pair tables is taken
+    on a shared grid of correlations, then the best grid point of each
+    pair is refined by golden-section search, all pairs in step."""
+    k = tables.shape[0]
+    i, j = np.triu_indices(k, 1)
+    pairs = tables[i, j].astype("float64")
+    rows = pairs.sum(axis=2)
+    cols = pairs.sum(axis=1)
+    # Empty answers give zero-width cells that hold no counts, so the tables
+    # keep their padded shape; a pair needs two answers on both sides
+    usable = ((rows > 0).sum(axis=1) > 1) & ((cols > 0).sum(axis=1) > 1)
+    n = np.maximum(pairs.sum(axis=(1, 2)), 1)[:, None]
+    tx = _thresholds(rows / n)
+    ty = _thresholds(cols / n)
+
+    grid = np.linspace(-_BOUND, _BOUND, _GRID_POINTS)
+    loglik = _loglik(pairs, tx, ty, np.broadcast_to(grid, (len(pairs), len(grid))))
+    best = grid[np.argmax(loglik, axis=1)]
+    step = grid[1] - grid[0]
+    low = np.maximum(best - step, -_BOUND)
+    high = np.minimum(best + step, _BOUND)
+    for _ in range(_REFINE_STEPS):
+        inner = np.stack([high - _GOLDEN * (high - low), low + _GOLDEN * (high - low)], axis=1)
+        loglik = _loglik(pairs, tx, ty, inner)
+        left = loglik[:, 0] > loglik[:, 1]
+        high = np.where(left, inner[:, 1], high)
+        low = np.where(left, low, inner[:, 0])
+
+    r = np.eye(k)
+    r[i, j] = r[j, i] = np.where(usable, (low + high) / 2, np.nan)
+    return r
+
+
+def _loglik(tables, tx, ty, rho):
+    """Log-likelihood of every table [pair, a, b] with thresholds tx / ty
+    [pair, slot] at each of its correlations rho [pair, candidate]."""
+    cdf = _bvn_cdf(tx[:, None, :, None], ty[:, None, None, :], rho[:, :, None, None])
+    cells = cdf[..., 1:, 1:] - cdf[..., :-1, 1:] - cdf[..., 1:, :-1] + cdf[..., :-1, :-1]
+    return (tables[:, None] * np.log(np.maximum(cells, 1e-300))).sum(axis=(2, 3))
+
+
+def _bvn_cdf(h, k, rho):
+    """P(X <= h, Y <= k) for standard bivariate normals with correlation
+    rho, elementwise over broadcast arrays: Phi(h) Phi(k) plus the density
+    integrated over the correlation from 0 to rho, by Gauss-Legendre in
+    theta = arcsin(r), where the integrand is smooth (Drezner and
+    Wesolowsky, 1990)."""
+    h, k, rho = np.broadcast_arrays(h, k, rho)
+    half = np.arcsin(rho) / 2
+    theta = half[..., None] * (_NODES + 1)
+    h, k = h[..., None], k[..., None]
+    density = np.exp(-(h * h - 2 * h * k * np.sin(theta) + k * k) / (2 * np.cos(theta) ** 2))
+    return stats.norm.cdf(h[..., 0]) * stats.norm.cdf(k[..., 0]) + (density @ _WEIGHTS) * half / (2 * np.pi)
+
+
+def _thresholds(shares):
+    """Normal thresholds of the cumulative shares along the last axis."""
+    inner = stats.norm.ppf(np.clip(np.cumsum(shares, axis=-1)[..., :-1], 1e-12, 1 - 1e-12))
+    edge = np.full(shares.shape[:-1] + (1,), _EDGE)
+    return np.concatenate([-edge, np.clip(inner, -_EDGE, _EDGE), edge], axis=-1)
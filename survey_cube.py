@@ -0,0 +1,187 @@
+# =========================================================
+# DEMOGRAPHIC COUNT CUBE
+# =========================================================
+# Number of respondents for every combination of the answers in
+# CUBE_DIMENSIONS, as one dense integer array with an axis per question.
+# Every count chart on the demographic and interest pages is a marginal
+# of this space, so a filter change is answered by slicing the filtered
+# axes and summing out the others: the cost depends on the number of
+# answer combinations, never on the number of respondents. crosstabs()
+# answers all the tables of a page section from one slice.
+#
+# The last slot of every axis counts rows where that question was not
+# answered. Marginals over other questions include those rows, the same
+# way a groupby on one column ignores gaps in the others.
+#
+# Like the other aggregates the cube is additive: updated() folds in new
+# rows (or chunks of a large export) and returns a new cube.
+
+import numpy as np
+import pandas as pd
+
+from survey_schema import CATEGORICAL_COLUMNS, CODED_COLUMNS
+
+CUBE_DIMENSIONS = [
+    "Gender",
+    "Age",
+    "Region",
+    "Education Level",
+    "Employment Status",
+    "Average Monthly Expenses (RM)",
+    "Influence on Shopping",
+    "Awareness of Fashion Trends",
+    "How often do you buy fashion products (clothes, shoes, accessories)?",
+]
+
+
+class CountCube:
+    """Respondent counts over the answers to CUBE_DIMENSIONS."""
+
+    def __init__(self):
+        self.dimensions = []   # column names (stripped), one axis each
+        self.labels = {}       # dimension -> answers along its axis (+ missing)
+        self.counts = None     # int64 array, one axis per dimension
+        self.missing = {}      # dimension -> rows without an answer to it
+
+    # ---------------------------------------------------------
+    # Updating
+    # ---------------------------------------------------------
+    def updated(self, df):
+        """New cube with the rows of df added (self is unchanged)."""
+        columns = {col.strip(): col for col in df.columns}
+        new = CountCube()
+        new.dimensions = self.dimensions or [dim for dim in CUBE_DIMENSIONS if dim in columns]
+        counts = self.counts
+
+        codes = []
+        for axis, dim in enumerate(new.dimensions):
+            labels = list(self.labels.get(dim, _scale(dim)))
+            dim_codes = _axis_codes(df[columns[dim]], dim, labels)
+            if counts is not None and len(labels) > len(self.labels[dim]):
+                # New answers go before the missing slot of the old counts
+                grow = len(labels) - len(self.labels[dim])
+                counts = np.insert(counts, [len(self.labels[dim])] * grow, 0, axis=axis)
+            new.labels[dim] = labels
+            new.missing[dim] = self.missing.get(dim, 0) + int((dim_codes == len(labels)).sum())
+            codes.append(dim_codes)
+
+        shape = tuple(len(new.labels[dim]) + 1 for dim in new.dimensions)
+        flat = np.ravel_multi_index(codes, shape) if codes else np.zeros(len(df), dtype="intp")
+        # The counts are copied once so self is left unchanged; only the
+        # cells the new rows fall in are then added to, so a small delta
+        # does not also pay for a dense bincount over the whole cube
+        total = np.zeros(int(np.prod(shape)), dtype="int64") if counts is None else counts.ravel().copy()
+        cells, added = np.unique(flat, return_counts=True)
+        total[cells] += added
+        new.counts = total.reshape(shape)
+        return new
+
+    # ---------------------------------------------------------
+    # Reading
+    # ---------------------------------------------------------
+    def count(self, by, where=None, observed=True):
+        """Respondents per combination of the answers to the questions in
+        by, among those whose answers are in where (dimension -> allowed
+        answers). Like df[mask].groupby(by, observed=observed).size(): with
+        observed=True only combinations with respondents are returned, and
+        a dimension in by leaves out the respondents who did not answer it."""
+        return self.crosstabs([by], where, observed)[0]
+
+    def crosstabs(self, tables, where=None, observed=True):
+        """count() for several groupings (each a list of dimensions, two or
+        three for a contingency table) under the same filter. The cube is
+        sliced once for all of them; each table is then summed out of that
+        slice, which only holds the dimensions the tables involve."""
+        tables = [list(by) for by in tables]
+        involved = [dim for dim in self.dimensions if any(dim in by for by in tables)]
+        counts, labels = self._sliced(involved, where)
+        return [self._marginal(counts, labels, by, observed) for by in tables]
+
+    def total(self, where=None):
+        """Number of respondents whose answers are in where."""
+        return int(self._sliced([], where)[0].sum())
+
+    def effective(self, where):
+        """The filters of where that remove respondents, as dimension ->
+        set of the allowed answers it has: a filter left at every answer
+        of a question that was always answered is the same as no filter."""
+        return {
+            dim: set(allowed).intersection(self.labels[dim]) for dim, allowed in (where or {}).items()
+            # A filter over the whole domain (e.g. a multiselect left at
+            # "all") removes nobody when the question was always answered
+            if self.missing[dim] or not set(allowed).issuperset(self.labels[dim])
+        }
+
+    def _marginal(self, counts, labels, by, observed):
+        """Counts per combination of the answers in by, from a slice."""
+        axes = [self.dimensions.index(dim) for dim in by]
+        others = tuple(axis for axis in range(len(self.dimensions)) if axis not in axes)
+        counts = _sum_out(counts, others).reshape([counts.shape[axis] for axis in sorted(axes)])
+        # Remaining axes are in dimension order; put them in the order of by
+        counts = np.transpose(counts, np.argsort(np.argsort(axes)))
+        # Leave out the missing slots of the grouped dimensions
+        counts = counts[tuple(slice(0, len(labels[dim])) for dim in by)]
+
+        levels = [self._index(dim, labels[dim]) for dim in by]
+        if len(by) == 1:
+            index = levels[0].rename(by[0])
+        else:
+            index = pd.MultiIndex.from_product(levels, names=by)
+        result = pd.Series(counts.ravel(), index=index, name="Count")
+        return result[result > 0] if observed else result
+
+    def _sliced(self, by, where):
+        """Counts restricted to where. Dimensions in neither by nor where
+        are summed out first (kept as length-1 axes), so the slicing only
+        touches the combinations that matter; filters that let every
+        respondent through are skipped."""
+        where = self.effective(where)
+        others = tuple(
+            axis for axis, dim in enumerate(self.dimensions) if dim not in by and dim not in where
+        )
+        counts, labels = _sum_out(self.counts, others), dict(self.labels)
+        for dim, allowed in where.items():
+            axis = self.dimensions.index(dim)
+            keep = [i for i, label in enumerate(labels[dim]) if label in allowed]
+            counts = np.take(counts, keep + [len(labels[dim])], axis=axis)
+            # The missing slot stays last, empty: isin() never matches a gap
+            counts[(slice(None),) * axis + (-1,)] = 0
+            labels[dim] = [labels[dim][i] for i in keep]
+        return counts, labels
+
+    def _index(self, dim, labels):
+        if dim in CATEGORICAL_COLUMNS:
+            ordered = bool(CATEGORICAL_COLUMNS[dim])
+            return pd.CategoricalIndex(labels, categories=self.labels[dim], ordered=ordered)
+        return pd.Index(labels)
+
+
+def _sum_out(counts, axes):
+    """counts summed over axes, keeping them as length-1 axes. One axis at a
+    time from the front: each step then adds up contiguous blocks, which is
+    several times faster than a single sum over scattered axes."""
+    for axis in sorted(axes):
+        counts = counts.sum(axis=axis, keepdims=True)
+    return counts
+
+
+def _scale(dim):
+    """Initial answers along an axis: the declared order or code scale."""
+    if dim in CATEGORICAL_COLUMNS:
+        return CATEGORICAL_COLUMNS[dim]
+    return list(CODED_COLUMNS[dim])
+
+
+def _axis_codes(values, dim, labels):
+    """Position of every row's answer along the axis, extending labels with
+    answers not seen before; missing answers get the last slot."""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        categories = list(values.cat.categories)
+        labels.extend(c for c in categories if c not in labels)
+        lookup = pd.Index(labels).get_indexer(categories)
+        raw = values.cat.codes.to_numpy()
+    else:
+        lookup = np.arange(len(labels))
+        raw = pd.Index(labels).get_indexer(values.to_numpy(dtype="float64", na_value=np.nan))
+    positions = np.where(raw >= 0, lookup[np.maximum(raw, 0)], len(labels))
+    return positions.astype("intp")
@@ -0,0 +1,549 @@
+# =========================================================
+# SHARED SURVEY DATA LAYER
+# =========================================================
+# Every page imports its data from here instead of defining its own
+# load_data(). The CSV is parsed once per server process and the same
+# frame is handed to every page and every session. Page-specific renames
+# are derived views of that frame, not full copies.
+#
+# Where the CSV comes from is decided by survey_source.py (local file
+# first, remote refresh in the background); survey_store.py turns it into
+# a typed frame, reusing the Arrow snapshot when the CSV has not changed,
+# and survey_ingest.py only parses the new rows when the CSV has grown.
+# Row counts and answer lists come from a metadata sidecar
+# (survey_metadata.py) and need no data load at all.
+
+import functools
+import logging
+import time
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from streamlit.logger import get_logger
+
+from survey_schema import HOW_OFTEN_LABELS, MOTIVATION_ITEMS, decode, labels_for
+from survey_source import source_from_env
+from survey_bootstrap import bootstrap_means, bootstrap_shares
+from survey_figures import FigureCache
+from survey_corr import correlation, item_codes, pair_counts, pair_statistics
+from survey_ingest import ingest_from_env
+from survey_labels import relabel
+from survey_likert import likert_counts, likert_summary
+from survey_metadata import read_metadata
+from survey_plot import density_grid, payload_bytes
+from survey_significance import adjust_pvalues, chi_square, mann_whitney, one_vs_rest, permutation_test
+from survey_store import memory_report, select_columns
+from survey_trend import fit_frame, linear_fit, linear_fits
+
+logger = get_logger(__name__)
+
+# Copy-on-write makes renames and column selections share memory with the
+# parent frame, and guarantees that a page modifying its view can never
+# change the shared frame underneath the other pages (default in pandas 3).
+if int(pd.__version__.split(".")[0]) < 3:
+    pd.set_option("mode.copy_on_write", True)
+
+# ---------------------------------------------------------
+# Page Renames
+# ---------------------------------------------------------
+# Section C short names of the count cube dimensions it charts
+INTEREST_DIMENSIONS = {
+    'Average Monthly Expenses (RM)': 'Budget',
+    'Influence on Shopping': 'Influence',
+    'Awareness of Fashion Trends': 'Awareness',
+    'How often do you buy fashion products (clothes, shoes, accessories)?': 'Frequency',
+}
+
+MOTIVATION_COLUMNS = dict(zip(MOTIVATION_ITEMS, [
+    "Updates & Promotions",
+    "Product & Style",
+    "Entertainment",
+    "Discounts & Contests",
+    "Express Personality",
+    "Online Community",
+    "Brand Loyalty"
+]))
+
+# Short display names for the "Influence on Shopping" answers (Section C)
+INFLUENCE_SHORT_NAMES = {
+    "Online community": "Online Community",
+    "Celebrities": "Influencers",
+    "Brand advertisements": "Ads",
+    "Family": "Family",
+    "Friends": "Friends",
+    "rely": "Self-Decision",
+}
+
+
+def influence_label(answer):
+    """Short display name of an "Influence on Shopping" answer."""
+    return next((short for key, short in INFLUENCE_SHORT_NAMES.items() if key in answer), answer)
+
+
+# ---------------------------------------------------------
+# Core Dataset (one copy per process)
+# ---------------------------------------------------------
+@st.cache_resource
+def survey_source():
+    """The process-wide data source, with its background refresh started."""
+    source = source_from_env()
+    source.start_background_refresh()
+    return source
+
+
+def data_version():
+    """Identifies the copy of the CSV currently in use. Cached functions take
+    it as an argument so a refreshed file is picked up on the next rerun."""
+    return survey_source().version()
+
+
+@st.cache_resource
+def survey_ingest():
+    """Process-wide ingestion state (frame, aggregates and watermark)."""
+    return ingest_from_env()
+
+
+@st.cache_resource(show_spinner="Loading survey data...", max_entries=1)
+def _synced(version):
+    # A new version that only appends rows extends the frame, aggregates and
+    # bitmap index with them; the column projections are selections of the
+    # new frame. Cached results that depend on a filter or grouping are
+    # computed again for the new version.
+    ingest = survey_ingest()
+    ingest.sync(version[0])
+    return ingest.frame, ingest.aggregates, ingest.bitmaps
+
+
+def _parse_survey(version):
+    return _synced(version)[0]
+
+
+def load_survey(columns=None):
+    """Parse the survey CSV once and share the frame across all sessions.
+
+    Pages pass the columns they use (names without surrounding spaces) and
+    get only those: a column selection of the shared frame, which shares
+    its memory (and the snapshot's memory map) instead of copying it.
+
+    Treat the result as read-only: derive new frames from it (filtering,
+    rename, assign) instead of modifying it in place.
+    """
+    version = data_version()
+    if columns is None:
+        return _parse_survey(version)
+    return _projected(version, tuple(columns))
+
+
+@st.cache_resource(show_spinner="Loading survey data...", max_entries=8)
+def _projected(version, columns):
+    # Selected from the synced frame: no second parse or hash of the CSV,
+    # and a grown file is projected from the frame the new rows went into
+    frame = _synced(version)[0]
+    return frame[select_columns(frame.columns, columns)]
+
+
+def survey_aggregates():
+    """Maintained counts, code distributions and correlation statistics for
+    the whole dataset (see survey_aggregates.py). Column names are stripped."""
+    return _synced(data_version())[1]
+
+
+def _bitmaps(version):
+    """Bitmap index over the demographic answers (see survey_bitmap.py),
+    whose row selections line up with the frame and its projections."""
+    return _synced(version)[2]
+
+
+def survey_metadata():
+    """Row count, answer lists and per-column figures of the current data
+    (see survey_metadata.py). Read from the sidecar without loading the
+    dataset whenever the sidecar matches the CSV."""
+    return _metadata(data_version())
+
+
+@st.cache_resource(max_entries=1)
+def _metadata(version):
+    metadata = read_metadata(version[0])
+    if metadata is None:
+        # No (current) sidecar yet: loading the data writes one
+        _synced(version)
+        metadata = survey_ingest().metadata
+    return metadata
+
+
+def log_memory(page, *frames):
+    """Log how much memory the frames of one page run hold, split into the
+    part shared through the snapshot and the part private to the session
+    (run streamlit with --logger.level=debug to see it)."""
+    report = memory_report(*frames)
+    logger.debug(
+        "%s: %.1f KB per session, %.1f KB shared (memory-mapped)",
+        page, report["private_bytes"] / 1024, report["mapped_bytes"] / 1024
+    )
+
+
+def show_chart(fig, chart, **kwargs):
+    """st.plotly_chart(fig, **kwargs), logging the size of the figure JSON
+    sent to the browser for chart (a page: name label) at debug level, like
+    log_memory()."""
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("%s: %.1f KB figure payload", chart, payload_bytes(fig) / 1024)
+    return st.plotly_chart(fig, **kwargs)
+
+
+def page_section(name):
+    """Decorator for a section of a page that owns widgets: the function
+    becomes a st.fragment, so changing one of its widgets reruns (and
+    re-sends the charts of) that section only, not the whole page. Each
+    run is timed and logged like log_memory(), which is the latency of
+    the interaction."""
+    def decorate(section):
+        @functools.wraps(section)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return section(*args, **kwargs)
+            finally:
+                logger.debug("%s: ran in %.1f ms", name, (time.perf_counter() - start) * 1000)
+        return st.fragment(timed)
+    return decorate
+
+
+# ---------------------------------------------------------
+# Figures
+# ---------------------------------------------------------
+@st.cache_resource
+def figure_cache():
+    """The figure cache shared by every session (see survey_figures.py)."""
+    return FigureCache()
+
+
+def cached_figure(chart_id, where, build, *args):
+    """Figure chart_id of a page for the filter where (dimension ->
+    allowed answers), served from the shared figure cache when any session
+    has built it for the same data and filter, else made with
+    build(*args). The filter is normalised first (see CountCube.effective),
+    so answer order does not matter and a filter left at every answer
+    shares the unfiltered figure."""
+    return figure_cache().figure((chart_id, data_version(), _where_key(where)), build, *args)
+
+
+# ---------------------------------------------------------
+# Page Views
+# ---------------------------------------------------------
+def interest_tables(tables, where=None, observed=True):
+    """Section C counts, sliced from the count cube (survey_cube.py): for
+    each grouping in tables, respondents per combination of its Section C
+    columns (Budget, Influence, Awareness, Awareness_Str, Frequency) among
+    those whose answers are in where; observed=False keeps answers nobody
+    gave, like value_counts(). All groupings come from one slice of the
+    cube (see CountCube.crosstabs). Returns a frame per grouping with a
+    Count column, short influence labels and ordered Frequency /
+    Awareness_Str categories."""
+    dimensions = {short: dim for dim, short in INTEREST_DIMENSIONS.items()}
+    dimensions['Awareness_Str'] = dimensions['Awareness']
+    counts = survey_aggregates().cube.crosstabs(
+        [[dimensions[col] for col in by] for by in tables], where, observed
+    )
+    return [_interest_frame(by, table) for by, table in zip(tables, counts)]
+
+
+def _interest_frame(by, counts):
+    data = counts.reset_index()
+    data.columns = list(by) + ['Count']
+    if 'Influence' in data:
+        data['Influence'] = relabel(data['Influence'], influence_label)
+    if 'Frequency' in data:
+        data['Frequency'] = decode(data, 'Frequency', HOW_OFTEN_LABELS)
+    if 'Awareness_Str' in data:
+        awareness = data['Awareness_Str'].astype(str)
+        data['Awareness_Str'] = pd.Categorical(awareness, categories=sorted(awareness.unique()), ordered=True)
+    return data
+
+
+def grouped_summary(columns, by, where=None):
+    """n, mean, sd, se and 95% confidence interval of every coded column
+    in columns (an item bank, names stripped) for every answer to the
+    demographic question by (e.g. Gender, Age, Region), among the
+    respondents whose answers are in where. One grouped pass over the
+    items (see survey_likert.py); indexed by (answer, item)."""
+    return _grouped_summary(data_version(), tuple(columns), by, _where_key(where))
+
+
+@st.cache_resource(max_entries=16)
+def _grouped_summary(version, columns, by, where):
+    return likert_summary(_grouped_counts(version, columns, by, where))
+
+
+@st.cache_resource(max_entries=16)
+def _grouped_counts(version, columns, by, where):
+    rows = _bitmaps(version).selection(dict(where))
+    return likert_counts(_projected(version, columns + (by,)), columns, by=by, rows=rows)
+
+
+def correlation_matrix(columns, method="pearson", where=None):
+    """Pairwise-complete correlation matrix of coded columns (names
+    stripped) with method "pearson", "spearman" or "polychoric", among the
+    respondents whose demographic answers are in where. Without a filter
+    it comes from the maintained pair tables (see survey_corr.py); with one
+    the tables are rebuilt from the selected rows. Cached per item set,
+    method and filter."""
+    return _correlation(data_version(), tuple(columns), method, _where_key(where))
+
+
+@st.cache_resource(max_entries=32)
+def _correlation(version, columns, method, where):
+    r = correlation(_pair_tables(version, columns, where), item_codes(list(columns)), method)
+    return pd.DataFrame(r, index=list(columns), columns=list(columns))
+
+
+def correlation_table(x_columns, y_columns, method="pearson", flipped=(), where=None):
+    """Correlation, p-value and number of respondents answering both, for
+    every pair of an x and a y column (coded, names stripped), indexed by
+    (X, Y). Columns in flipped are scored in reverse (highest code first),
+    which only changes the sign of their correlations. Cached like
+    correlation_matrix()."""
+    return _correlation_table(
+        data_version(), tuple(x_columns), tuple(y_columns), method, tuple(flipped), _where_key(where)
+    )
+
+
+@st.cache_resource(max_entries=16)
+def _correlation_table(version, x_columns, y_columns, method, flipped, where):
+    columns = tuple(dict.fromkeys(x_columns + y_columns))
+    r, p, n = pair_statistics(_pair_tables(version, columns, where), item_codes(list(columns)), method)
+    sign = np.where(np.isin(columns, flipped), -1, 1)
+    r = r * np.outer(sign, sign)
+    grid = np.ix_([columns.index(col) for col in x_columns], [columns.index(col) for col in y_columns])
+    index = pd.MultiIndex.from_product([x_columns, y_columns], names=["X", "Y"])
+    return pd.DataFrame({
+        "r": r[grid].ravel(),
+        "p": p[grid].ravel(),
+        "n": n[grid].ravel(),
+    }, index=index)
+
+
+def trend_table(x_columns, y_columns, flipped=(), where=None):
+    """Least-squares line of every y column on every x column (coded,
+    names stripped), with what line_traces() needs for its confidence band,
+    indexed by (X, Y); see survey_trend.py. Columns in flipped are scored
+    in reverse (highest code first). Cached like correlation_matrix()."""
+    return _trend_table(data_version(), tuple(x_columns), tuple(y_columns), tuple(flipped), _where_key(where))
+
+
+@st.cache_resource(max_entries=16)
+def _trend_table(version, x_columns, y_columns, flipped, where):
+    columns = tuple(dict.fromkeys(x_columns + y_columns))
+    codes = item_codes(list(columns), flipped=flipped)
+    fits = linear_fits(_pair_tables(version, columns, where), codes)
+    return fit_frame(fits, columns, x_columns, y_columns)
+
+
+def joint_counts(x_column, y_column, flipped=(), where=None):
+    """Respondents per pair of answers to two coded columns (names
+    stripped), among those whose demographic answers are in where: a frame
+    with the x and y codes (scored in reverse for columns in flipped, like
+    trend_table()) and a Count, one row per pair somebody gave. Read from
+    the pair tables, so its size does not grow with the respondents."""
+    columns = tuple(dict.fromkeys((x_column, y_column)))
+    table = _pair_tables(data_version(), columns, _where_key(where))[0, -1]
+    codes = item_codes(list(columns), flipped=flipped)
+    x, y = np.nonzero(table)
+    return pd.DataFrame({x_column: codes[0, x], y_column: codes[-1, y], "Count": table[x, y]})
+
+
+def score_density(x_columns, y_columns, flipped=(), bins=None, where=None):
+    """Density of two derived scores, each respondent's mean code over the
+    coded columns of x_columns and of y_columns (names stripped; columns
+    in flipped scored in reverse, like trend_table()), among those whose
+    demographic answers are in where. Returns the respondents per cell of
+    a grid over the score ranges (see survey_plot.density_grid), with one
+    cell per attainable step of a complete mean unless bins says otherwise,
+    and the linear fit of the y score on the x score (a row in the layout
+    of trend_table())."""
+    return _score_density(data_version(), tuple(x_columns), tuple(y_columns), tuple(flipped), bins, _where_key(where))
+
+
+@st.cache_resource(max_entries=16)
+def _score_density(version, x_columns, y_columns, flipped, bins, where):
+    columns = tuple(dict.fromkeys(x_columns + y_columns))
+    values, _ = _item_values(version, columns, None, where)
+    scales = [np.asarray(list(labels_for(col)), dtype="float64") for col in columns]
+    for i, (col, scale) in enumerate(zip(columns, scales)):
+        if col in flipped:
+            values[:, i] = scale.min() + scale.max() - values[:, i]
+    scores = []
+    extent = []
+    steps = []
+    for bank in (x_columns, y_columns):
+        index = [columns.index(col) for col in bank]
+        bank_values = values[:, index]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            scores.append(np.nansum(bank_values, axis=1) / (~np.isnan(bank_values)).sum(axis=1))
+        low = np.mean([scales[i].min() for i in index])
+        high = np.mean([scales[i].max() for i in index])
+        # Cells centred on the means of complete answers, a step of 1/items
+        step = 1 / len(index)
+        extent.append((low - step / 2, high + step / 2))
+        steps.append(int(round((high - low) / step)) + 1)
+    grid = density_grid(*scores, bins=bins or tuple(steps), extent=extent)
+    return grid, linear_fit(*scores)
+
+
+def _pair_tables(version, columns, where):
+    """Pair tables of the columns: the maintained ones, or rebuilt from the
+    rows selected by where."""
+    rows = _bitmaps(version).selection(dict(where))
+    if isinstance(rows, slice):
+        return _synced(version)[1].pair_tables(list(columns))
+    return pair_counts(_projected(version, columns), list(columns), rows=rows)
+
+
+def _where_key(where):
+    """A filter (column -> allowed answers) as a hashable cache key. Like
+    the filter itself it does not depend on the order of the columns or
+    answers, and a filter that removes nobody is left out (see
+    CountCube.effective), so equal filters share their cached results."""
+    where = where or {}
+    cube = survey_aggregates().cube
+    normalised = cube.effective({col: allowed for col, allowed in where.items() if col in cube.labels})
+    normalised.update({col: set(allowed) for col, allowed in where.items() if col not in cube.labels})
+    return tuple(sorted((col, tuple(sorted(allowed, key=str))) for col, allowed in normalised.items()))
+
+
+def bootstrap_items(columns, statistic="mean", by=None, where=None):
+    """Bootstrap resamples (see survey_bootstrap.py) of the mean code of
+    every coded column in columns (names stripped), or with
+    statistic="top2" of the share of answers in the two highest codes:
+    an array [resample, item], or [resample, answer to by, item] when split
+    by a demographic question. Drawn once per item set, statistic, split
+    and filter. Calls on the same data and filter reuse the same
+    resamples, so figures combined from several calls stay paired."""
+    return _bootstrap_items(data_version(), tuple(columns), statistic, by, _where_key(where))
+
+
+@st.cache_resource(max_entries=16)
+def _bootstrap_items(version, columns, statistic, by, where):
+    values, groups = _item_values(version, columns, by, where)
+    if statistic == "top2":
+        second_highest = np.array([sorted(labels_for(col))[-2] for col in columns])
+        values = np.where(np.isnan(values), np.nan, values >= second_highest)
+    elif statistic != "mean":
+        raise ValueError(f"unknown statistic {statistic!r}, expected 'mean' or 'top2'")
+    if by is None:
+        return bootstrap_means(values)
+    return bootstrap_means(values, groups.cat.codes.to_numpy(), len(groups.cat.categories))
+
+
+def _item_values(version, columns, by, where):
+    """Codes of the coded columns as a float matrix (NaN where not
+    answered) for the rows selected by where, and the answers to by (None
+    without a split)."""
+    df = _projected(version, columns + ((by,) if by else ()))
+    rows = _bitmaps(version).selection(dict(where))
+    names = {col.strip(): col for col in df.columns}
+    # The selection indexes each column's values, the frame is not filtered
+    values = np.column_stack([
+        df[names[col]].to_numpy(dtype="float64", na_value=np.nan)[rows] for col in columns
+    ])
+    answers = pd.Series(df[names[by]].array[rows], name=names[by]) if by else None
+    return values, answers
+
+
+def segment_tests(columns, by, groups, test="mann_whitney", adjust="holm", where=None):
+    """Significance of the difference between two answers to a demographic
+    question (groups, e.g. ("Female", "Male") for by="Gender") on every
+    coded column in columns (an item bank, names stripped), among the
+    respondents whose answers are in where. test is "mann_whitney" (from
+    the grouped answer counts) or "permutation" (difference in means
+    against shuffled labels); p_adj is adjusted across the items with
+    adjust ("holm" or "fdr_bh"; see survey_significance.py). Indexed by
+    item, with the n and mean of each group, their difference, the
+    rank-biserial effect (Mann-Whitney only), p and p_adj."""
+    return _segment_tests(data_version(), tuple(columns), by, tuple(groups), test, adjust, _where_key(where))
+
+
+@st.cache_resource(max_entries=16)
+def _segment_tests(version, columns, by, groups, test, adjust, where):
+    first, second = groups
+    counts = _grouped_counts(version, columns, by, where)
+    summary = likert_summary(counts)
+    result = pd.DataFrame({
+        "n_a": summary.loc[first, "n"],
+        "n_b": summary.loc[second, "n"],
+        "mean_a": summary.loc[first, "mean"],
+        "mean_b": summary.loc[second, "mean"],
+    })
+    result["diff"] = result["mean_a"] - result["mean_b"]
+    if test == "mann_whitney":
+        tests = mann_whitney(counts.loc[first], counts.loc[second])
+        result["effect"] = tests["effect"]
+        result["p"] = tests["p"]
+    elif test == "permutation":
+        values, answers = _item_values(version, columns, by, where)
+        split = answers.isin(groups).to_numpy()
+        result["p"] = permutation_test(values[split], (answers[split] == first).to_numpy())[1]
+    else:
+        raise ValueError(f"unknown test {test!r}, expected 'mann_whitney' or 'permutation'")
+    result["p_adj"] = adjust_pvalues(result["p"], adjust)
+    return result
+
+
+def contingency_tests(tables, where=None, adjust="holm"):
+    """Chi-square test of independence and Cramér's V of each pair of
+    demographic questions in tables (e.g. [["Gender", "Influence on
+    Shopping"]]), among the respondents whose answers are in where, from
+    one slice of the count cube. Indexed by the pair; p_adj is adjusted
+    across the tables (see survey_significance.py)."""
+    counts = survey_aggregates().cube.crosstabs(tables, where)
+    tests = chi_square([table.unstack(fill_value=0) for table in counts])
+    result = pd.DataFrame(tests, index=pd.MultiIndex.from_tuples([tuple(by) for by in tables], names=["A", "B"]))
+    result["p_adj"] = adjust_pvalues(result["p"], adjust)
+    return result
+
+
+def answer_tests(by, column, where=None, adjust="holm"):
+    """For every answer to column, whether the share of respondents giving
+    it differs across the answers to by (e.g. does "Social Media" influence
+    Female and Male respondents alike): a chi-square test of that answer
+    against all others, with Cramér's V. Indexed by answer to column, with
+    the share among each answer to by; p_adj is adjusted across the
+    answers."""
+    table = survey_aggregates().cube.count([by, column], where).unstack(fill_value=0)
+    tests = pd.DataFrame(chi_square(one_vs_rest(table)), index=table.columns)
+    tests["p_adj"] = adjust_pvalues(tests["p"], adjust)
+    shares = (table / table.sum(axis=1).to_numpy()[:, None]).T
+    return pd.concat([shares, tests], axis=1)
+
+
+def bootstrap_answer_shares(column):
+    """Bootstrap resamples of the share of every answer to a categorical
+    question (names stripped), drawn from the answer counts: an array
+    [resample, answer] in the order of SurveyAggregates.category_counts."""
+    return _bootstrap_answer_shares(data_version(), column)
+
+
+@st.cache_resource(max_entries=16)
+def _bootstrap_answer_shares(version, column):
+    aggregates = _synced(version)[1]
+    counts = aggregates.category_counts[column]
+    # Respondents without an answer stay in the denominator
+    counts = np.append(counts.to_numpy(), aggregates.n - counts.sum())
+    return bootstrap_shares(counts)[:, :-1]
+
+
+def motivation_view(columns):
+    """Section D view of the given columns: stripped column names with the
+    motivation items under their short names. Returns the frame and the
+    motivation columns."""
+    return _motivation_view(data_version(), tuple(columns))
+
+
+@st.cache_resource(max_entries=1)
+def _motivation_view(version, columns):
+    df = _projected(version, columns)
+    df = df.rename(columns=dict(zip(df.columns, df.columns.str.strip())))
+    df = df.rename(columns=MOTIVATION_COLUMNS)
+    valid_cols = [v for v in MOTIVATION_COLUMNS.values() if v in df.columns]
+    return df, valid_cols
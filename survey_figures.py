@@ -0,0 +1,73 @@
+# =========================================================
+# SHARED FIGURE CACHE
+# =========================================================
+# The chart builders of the pages are pure functions of the tables they
+# are given, and those tables only depend on the data version and the
+# filter. A figure built for one session can therefore be served to every
+# other session that shows the same filter. FigureCache keeps the
+# serialised figure (plotly.io.to_json) under a key of (chart id, data
+# version, filter) and evicts the least recently used figures once the
+# stored JSON exceeds a byte budget. survey_data.cached_figure() builds
+# the keys and shares one cache across all sessions.
+
+import threading
+from collections import OrderedDict
+
+import plotly.io as pio
+
+# Serialised figures kept at most, in bytes of JSON
+FIGURE_CACHE_BYTES = 32 << 20
+
+
+class FigureCache:
+    """Least-recently-used store of serialised plotly figures, safe to
+    share between the threads of concurrent sessions."""
+
+    def __init__(self, max_bytes=FIGURE_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._specs = OrderedDict()   # key -> figure JSON, oldest use first
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._specs)
+
+    def figure(self, key, build, *args):
+        """The figure stored under key; on a miss build(*args) makes it and
+        it is stored for the next caller."""
+        return pio.from_json(self.spec(key, build, *args))
+
+    def spec(self, key, build, *args):
+        """Like figure(), but the serialised figure (JSON)."""
+        with self._lock:
+            spec = self._specs.get(key)
+            if spec is not None:
+                self._specs.move_to_end(key)
+                self.hits += 1
+                return spec
+            self.misses += 1
+        # Built outside the lock: sessions missing different figures do not
+        # wait for each other (two missing the same one both build it)
+        spec = pio.to_json(build(*args), validate=False)
+        self._store(key, spec)
+        return spec
+
+    def clear(self):
+        with self._lock:
+            self._specs.clear()
+            self.nbytes = 0
+
+    def _store(self, key, spec):
+        size = len(spec)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._specs:
+                return
+            self._specs[key] = spec
+            self.nbytes += size
+            while self.nbytes > self.max_bytes:
+                _, evicted = self._specs.popitem(last=False)
+                self.nbytes -= len(evicted)
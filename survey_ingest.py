@@ -0,0 +1,274 @@
+# =========================================================
+# INCREMENTAL INGESTION
+# =========================================================
+# The Google Form export only ever grows at the end. SurveyIngest keeps a
+# watermark on the source file (byte offset of the last ingested row plus
+# a hash of the last TAIL_BYTES before it) and, when the file changes,
+# checks whether the old content is still there:
+#   * yes -> only the new bytes are parsed, typed with the schema, added
+#            to the frame and folded into the maintained aggregates
+#   * no  -> (edited or replaced file) a full load through survey_store
+# The bitmap index over the demographic answers (survey_bitmap.py) is
+# extended with the new rows the same way.
+# The check re-reads only the tail block, so its cost does not grow with
+# the file. An edit that changes the length of the old content moves the
+# tail and is caught; one that keeps it and stays clear of the tail is
+# not, which an export that only grows at the end never does.
+# The content hash is carried forward with the new bytes, so the typed
+# snapshot for the grown file is named without re-reading the old rows.
+# Two steps of an append are still O(rows) by choice: the typed columns
+# are concatenated into a new frame (a few bytes per answer, no CSV is
+# parsed again), and the snapshot is rewritten whole on a background
+# thread, so the page waits for neither and the next start maps it.
+#
+# Exports above stream_bytes are never parsed in one go: the full load
+# reads them chunk_rows rows at a time, types each chunk with the schema,
+# folds it into the aggregates and appends it to a chunk file. The CSV
+# text is therefore only ever in memory one chunk at a time. The chunks
+# are then merged into a one-batch snapshot, which holds the typed frame
+# (a few bytes per answer) in memory once, and the frame memory-maps the
+# finished snapshot without copying it.
+
+import hashlib
+import io
+import logging
+import os
+import threading
+from pathlib import Path
+
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from survey_aggregates import CHUNK_ROWS, SurveyAggregates
+from survey_bitmap import BitmapIndex
+from survey_metadata import build_metadata, write_metadata
+from survey_schema import CATEGORICAL_COLUMNS, CODED_COLUMNS, apply_schema
+from survey_store import (
+    HASH_CHUNK, read_snapshot, read_survey, snapshot_path, write_snapshot,
+    write_snapshot_chunks,
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STREAM_BYTES = 64 << 20
+TAIL_BYTES = 64 << 10
+
+
+class SurveyIngest:
+    """Typed frame, aggregates and bitmap index for one source file, kept
+    current by sync()."""
+
+    def __init__(self, stream_bytes=DEFAULT_STREAM_BYTES, chunk_rows=CHUNK_ROWS):
+        self.stream_bytes = stream_bytes   # full loads above this size stream
+        self.chunk_rows = chunk_rows
+        self.path = None
+        self.frame = None
+        self.aggregates = None
+        self.bitmaps = None     # see survey_bitmap.py
+        self.metadata = None    # see survey_metadata.py
+        self._offset = 0        # bytes ingested (ends after a newline or at EOF)
+        self._header = b""      # CSV header line, prepended to each delta
+        self._open_row = False  # ingested bytes end in a row without newline
+        self._hasher = None     # BLAKE2b state over the first _offset bytes
+        self._prefix_digest = None
+        self._tail_digest = None   # hash of the TAIL_BYTES before _offset
+        self._stat = None       # (size, mtime_ns) of the file at the last sync
+        self._lock = threading.Lock()
+
+    # ---------------------------------------------------------
+    # Watermark
+    # ---------------------------------------------------------
+    def _is_append(self, path, stat):
+        """True when the file still holds what was ingested, followed by
+        anything new: it is untouched since the last sync, or has not
+        shrunk and still ends the ingested part with the same tail."""
+        if self.path != Path(path) or self._hasher is None:
+            return False
+        if (stat.st_size, stat.st_mtime_ns) == self._stat:
+            return True
+        if stat.st_size < self._offset:
+            return False
+        return _tail_digest(path, self._offset) == self._tail_digest
+
+    # ---------------------------------------------------------
+    # Loading
+    # ---------------------------------------------------------
+    def sync(self, path):
+        """Bring frame, aggregates and bitmaps up to date with the file at path.
+        Returns the number of new rows ingested incrementally, or None
+        after a full load."""
+        with self._lock:
+            # Taken first: if the file changes while it is read, the sidecar
+            # describes the older version and is not mistaken for current
+            stat = Path(path).stat()
+            added = self._ingest_delta(path) if self._is_append(path, stat) else None
+            if added is None:
+                self._full_load(path)
+            self._stat = (stat.st_size, stat.st_mtime_ns)
+            self._refresh_metadata(stat)
+            return added
+
+    def _full_load(self, path):
+        path = Path(path)
+        hasher = hashlib.blake2b(digest_size=8)
+        end = 0
+        with open(path, "rb") as f:
+            header = f.readline()
+            f.seek(0)
+            last = b""
+            for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+                hasher.update(chunk)
+                end += len(chunk)
+                last = chunk[-1:]
+        # The frame holds every row of the file, including a last one without
+        # a newline, so the watermark is the end of the file: new rows then
+        # follow it on a line of their own
+        digest = hasher.hexdigest()
+        snapshot = snapshot_path(path, digest)
+
+        if end > self.stream_bytes and not snapshot.is_file():
+            self._stream_load(path, snapshot)
+        else:
+            self.frame = read_survey(path, digest=digest)
+            self.aggregates = SurveyAggregates.from_frame(self.frame, self.chunk_rows)
+        self.bitmaps = BitmapIndex.from_frame(self.frame)
+        self.path = path
+        self._header = header
+        self._offset = end
+        self._open_row = last not in (b"", b"\n")
+        self._hasher = hasher
+        self._prefix_digest = digest
+        self._tail_digest = _tail_digest(path, end)
+
+    def _stream_load(self, path, snapshot):
+        """Full load in chunks: aggregates and snapshot are built chunk by
+        chunk, the frame is then read back from the memory-mapped snapshot."""
+        aggregates = SurveyAggregates()
+        categories = {}
+
+        def typed_chunks():
+            nonlocal aggregates
+            header = pd.read_csv(path, nrows=0).columns
+            # Free-text columns as strings in every chunk, even all-empty ones
+            text = {
+                col: str for col in header
+                if col.strip() not in CATEGORICAL_COLUMNS and col.strip() not in CODED_COLUMNS
+            }
+            for chunk in pd.read_csv(path, chunksize=self.chunk_rows, dtype=text):
+                chunk = _conform_chunk(apply_schema(chunk), categories)
+                aggregates = aggregates.updated(chunk)
+                yield chunk
+
+        try:
+            rows = write_snapshot_chunks(typed_chunks(), snapshot)
+        except (OSError, ValueError) as err:
+            logger.warning("Could not stream %s into %s (%s)", path, snapshot, err)
+            self.frame = read_survey(path)
+            self.aggregates = SurveyAggregates.from_frame(self.frame, self.chunk_rows)
+            return
+        self.frame = read_snapshot(snapshot)
+        self.aggregates = aggregates
+        logger.info("Streamed %d survey rows into %s", rows, snapshot.name)
+
+    def _ingest_delta(self, path):
+        """Rows added since the watermark; None if they need a full load."""
+        with open(path, "rb") as f:
+            f.seek(self._offset)
+            data = f.read()
+        if self._open_row and data and not data.startswith((b"\n", b"\r\n")):
+            logger.warning("New survey data continues the last row, reloading everything")
+            return None
+        end = data.rfind(b"\n") + 1
+        if not end:
+            return 0   # nothing new, or a row that is still being written
+
+        delta = pd.read_csv(io.BytesIO(self._header + data[:end]))
+        if list(delta.columns) != list(pd.read_csv(io.BytesIO(self._header), nrows=0).columns):
+            logger.warning("New survey rows do not match the header, reloading everything")
+            return None
+        delta = apply_schema(delta)
+        try:
+            aggregates = self.aggregates.updated(delta)
+        except ValueError as err:
+            logger.warning("Cannot add the new survey rows (%s), reloading everything", err)
+            return None
+
+        # Both O(rows), see the note at the top: the frame is rebuilt from
+        # the typed columns, and the snapshot is rewritten off this thread
+        self.frame = _append(self.frame, delta)
+        self.aggregates = aggregates
+        self.bitmaps = self.bitmaps.extended(delta)
+        self._offset += end
+        self._open_row = False
+        self._hasher.update(data[:end])
+        self._prefix_digest = self._hasher.copy().hexdigest()
+        self._tail_digest = _tail_digest(path, self._offset)
+
+        snapshot = snapshot_path(path, self._prefix_digest)
+        threading.Thread(target=_write_quietly, args=(self.frame, snapshot), daemon=True).start()
+        logger.info("Ingested %d new survey rows", len(delta))
+        return len(delta)
+
+    def _refresh_metadata(self, stat):
+        self.metadata = build_metadata(
+            self.frame, self.aggregates, self.path, stat, self._prefix_digest
+        )
+        try:
+            write_metadata(self.metadata, self.path)
+        except OSError as err:
+            logger.warning("Could not write metadata for %s (%s)", self.path, err)
+
+
+def _tail_digest(path, offset):
+    """Hash of the TAIL_BYTES of path that end at offset."""
+    start = max(offset - TAIL_BYTES, 0)
+    with open(path, "rb") as f:
+        f.seek(start)
+        return hashlib.blake2b(f.read(offset - start), digest_size=8).hexdigest()
+
+
+def _append(frame, delta):
+    """Concatenate typed frames, merging categories instead of falling back
+    to object columns when the new rows bring a category not seen before."""
+    columns = {}
+    for col in frame.columns:
+        old, new = frame[col], delta[col]
+        if isinstance(old.dtype, pd.CategoricalDtype):
+            merged = union_categoricals([old.array, new.array], ignore_order=True)
+            if old.cat.ordered:
+                merged = merged.as_ordered()
+            columns[col] = pd.Series(merged, name=col)
+        else:
+            columns[col] = pd.concat([old, new], ignore_index=True)
+    return pd.DataFrame(columns)
+
+
+def _conform_chunk(chunk, categories):
+    """Give a typed chunk the dtypes of the chunks before it: categories
+    extend the running list in categories (new ones at the end) and codes
+    are always nullable, since a later chunk may have a missing answer."""
+    changed = {}
+    for col in chunk.columns:
+        values = chunk[col]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            seen = categories.setdefault(col, [])
+            seen.extend(c for c in values.cat.categories if c not in seen)
+            changed[col] = values.cat.set_categories(seen)
+        elif col.strip() in CODED_COLUMNS:
+            changed[col] = values.astype("UInt8")
+    return chunk.assign(**changed)
+
+
+def _write_quietly(frame, snapshot):
+    try:
+        write_snapshot(frame, snapshot)
+    except (OSError, ValueError) as err:
+        logger.warning("Could not write snapshot %s (%s)", snapshot, err)
+
+
+def ingest_from_env():
+    """Build a SurveyIngest from the FASHION_SURVEY_* environment variables."""
+    return SurveyIngest(
+        stream_bytes=int(os.environ.get("FASHION_SURVEY_STREAM_BYTES", DEFAULT_STREAM_BYTES)),
+        chunk_rows=int(os.environ.get("FASHION_SURVEY_CHUNK_ROWS", CHUNK_ROWS)),
+    )
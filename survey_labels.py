@@ -0,0 +1,32 @@
+# =========================================================
+# DISPLAY LABEL TRANSFORMS
+# =========================================================
+# Charts often show an answer under a different label than the one stored
+# ("<b>Female</b>", "RM 500-1000", a wrapped influence factor, a platform
+# name without its "Active_" prefix). These helpers work on categoricals:
+# the transform runs once per distinct answer and the rows keep their
+# integer codes, so the cost depends on the number of answers, not on the
+# number of respondents.
+
+import numpy as np
+import pandas as pd
+
+
+def relabel(values, transform):
+    """values (a Series) as a categorical with every answer replaced by
+    transform(answer), or transform[answer] for a mapping (answers it does
+    not list become missing, like Series.map). Answers that end up with the
+    same label are merged; the category order follows the original one."""
+    if not isinstance(values.dtype, pd.CategoricalDtype):
+        values = values.astype("category")
+    categories = values.cat.categories
+    if callable(transform):
+        labels = [transform(answer) for answer in categories]
+    else:
+        labels = [transform.get(answer) for answer in categories]
+
+    positions, unique = pd.factorize(pd.Series(labels, dtype=object))
+    codes = values.cat.codes.to_numpy()
+    codes = np.where(codes >= 0, positions[np.maximum(codes, 0)], -1)
+    relabelled = pd.Categorical.from_codes(codes, categories=unique, ordered=values.cat.ordered)
+    return pd.Series(relabelled, index=values.index, name=values.name)
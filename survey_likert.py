@@ -0,0 +1,169 @@
+# =========================================================
+# LIKERT ITEM BANKS
+# =========================================================
+# The items of a bank (the motivation statements, the fashion-interest
+# statements, the Freq_* or Active_* items) share one answer scale, so
+# their responses form a single small-integer matrix. likert_counts()
+# reduces that matrix to the response distribution of every item, per
+# group of respondents if asked, with one bincount over combined
+# (group, item, answer) codes instead of a value_counts() per column and
+# group. likert_summary() then derives counts, means, spreads, confidence
+# intervals and top-2 / bottom-2 box shares from the distribution alone,
+# so a split by any demographic costs one pass whatever the number of
+# groups and items. box_summary() does the same for box plots: quartiles,
+# whiskers and outliers, so a box chart needs no raw answers.
+#
+# For the whole sample the distribution is already maintained by the
+# aggregates (SurveyAggregates.likert_counts), so no rows are read.
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from survey_aggregates import CHUNK_ROWS
+from survey_schema import labels_for
+
+
+def bank_scale(columns):
+    """The answer codes shared by the coded columns of a bank."""
+    scales = {tuple(labels_for(col) or ()) for col in columns}
+    if len(scales) != 1 or not next(iter(scales)):
+        raise ValueError(f"columns do not share one answer scale: {list(columns)}")
+    return list(scales.pop())
+
+
+def likert_counts(df, columns, by=None, scale=None, chunk_rows=CHUNK_ROWS, rows=slice(None)):
+    """Response counts of the items in columns (names without surrounding
+    spaces): a frame with a row per item, or per (group, item) when by is
+    given, and a column per code of the shared scale. by is a categorical
+    Series aligned with df or the name of one of its columns; respondents
+    without a group are left out. Pass scale (the answer codes) for
+    columns that have been renamed. Only the rows selected by rows (a
+    boolean mask or slice(None), see survey_bitmap.py) are counted; the
+    mask is applied to the codes, df is not filtered. Rows are read
+    chunk_rows at a time."""
+    names = {col.strip(): col for col in df.columns}
+    scale = list(scale) if scale is not None else bank_scale(columns)
+    width = len(scale) + 1   # the last slot of every item counts gaps
+    # Answer code -> position on the scale; -1 (missing) lands on the gap slot
+    lookup = np.full(257, len(scale), dtype="intp")
+    lookup[scale] = np.arange(len(scale))
+    offsets = np.arange(len(columns)) * width
+
+    if by is not None:
+        if isinstance(by, str):
+            by = df[names[by.strip()]]
+        if not isinstance(by.dtype, pd.CategoricalDtype):
+            by = by.astype("category")
+        groups = by.cat.categories
+        group_codes = by.cat.codes.to_numpy()
+        # Rows without a group go to an extra group, dropped at the end
+        group_codes = np.where(group_codes >= 0, group_codes, len(groups)) * (len(columns) * width)
+        n_groups = len(groups) + 1
+    else:
+        n_groups = 1
+
+    block = df[[names.get(col, col) for col in columns]]
+    totals = np.zeros(n_groups * len(columns) * width, dtype="int64")
+    for start in range(0, len(block), chunk_rows):
+        stop = start + chunk_rows
+        keep = rows if isinstance(rows, slice) else rows[start:stop]
+        codes = block.iloc[start:stop].to_numpy(dtype="int16", na_value=-1)[keep]
+        flat = lookup[codes] + offsets
+        if by is not None:
+            flat += group_codes[start:stop][keep, None]
+        totals += np.bincount(flat.ravel(), minlength=totals.size)
+
+    counts = totals.reshape(n_groups, len(columns), width)[:, :, :-1]
+    items = pd.Index(list(columns), name="Item")
+    if by is None:
+        return pd.DataFrame(counts[0], index=items, columns=scale)
+    group_name = by.name.strip() if isinstance(by.name, str) else by.name
+    index = pd.MultiIndex.from_product([groups, items], names=[group_name, "Item"])
+    return pd.DataFrame(counts[:-1].reshape(-1, len(scale)), index=index, columns=scale)
+
+
+def likert_summary(counts, confidence=0.95):
+    """Per row of a likert_counts() frame: number of answers (n), mean
+    code, sample standard deviation (sd), standard error of the mean (se)
+    with its t-based confidence interval (ci_low, ci_high), and the shares
+    of answers in the two highest (top2) and two lowest (bottom2) codes of
+    the scale."""
+    codes = counts.columns.to_numpy(dtype="float64")
+    values = counts.to_numpy(dtype="float64")
+    n = values.sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = values @ codes / n
+        var = (values @ codes ** 2 - n * mean ** 2) / (n - 1)
+        sd = np.sqrt(np.maximum(var, 0))
+        se = sd / np.sqrt(n)
+        top2 = values[:, -2:].sum(axis=1) / n
+        bottom2 = values[:, :2].sum(axis=1) / n
+    margin = stats.t.ppf((1 + confidence) / 2, np.maximum(n - 1, 1)) * se
+    return pd.DataFrame({
+        "n": n.astype("int64"),
+        "mean": mean,
+        "sd": sd,
+        "se": se,
+        "ci_low": mean - margin,
+        "ci_high": mean + margin,
+        "top2": top2,
+        "bottom2": bottom2,
+    }, index=counts.index)
+
+
+def box_summary(counts, whisker=1.5):
+    """Box plot statistics of every row of a likert_counts() frame, from the
+    distribution alone: number of answers (n), lowest and highest answer
+    (min, max), quartiles (q1, median, q3, interpolated like
+    numpy.percentile) and the whisker ends (lower, upper): the most extreme
+    answers within whisker x IQR of the box, or the box edge when there
+    are none, as matplotlib draws them.
+    Answers beyond the whiskers are the outliers (see box_outliers)."""
+    codes = counts.columns.to_numpy(dtype="float64")
+    values = counts.to_numpy(dtype="int64")
+    n = values.sum(axis=1)
+    cumulative = np.cumsum(values, axis=1)
+    given = values > 0
+
+    def answer(rank):
+        # The answer at (0-based) position rank of each row's sorted answers
+        return codes[np.minimum((cumulative <= rank[:, None]).sum(axis=1), len(codes) - 1)]
+
+    quartiles = []
+    for q in (0.25, 0.5, 0.75):
+        position = np.maximum(n - 1, 0) * q
+        below = np.floor(position)
+        low, high = answer(below), answer(np.ceil(position))
+        quartiles.append(low + (position - below) * (high - low))
+    q1, median, q3 = quartiles
+    reach = whisker * (q3 - q1)
+    inside = given & (codes >= (q1 - reach)[:, None]) & (codes <= (q3 + reach)[:, None])
+    summary = pd.DataFrame({
+        "min": np.where(given, codes, np.inf).min(axis=1),
+        "q1": q1,
+        "median": median,
+        "q3": q3,
+        "max": np.where(given, codes, -np.inf).max(axis=1),
+        # Whiskers never end inside the box
+        "lower": np.minimum(np.where(inside, codes, np.inf).min(axis=1), q1),
+        "upper": np.maximum(np.where(inside, codes, -np.inf).max(axis=1), q3),
+    }, index=counts.index)
+    # Rows without answers have no statistics
+    summary = summary.where(pd.Series(n > 0, index=counts.index), axis=0)
+    summary.insert(0, "n", n)
+    return summary
+
+
+def box_outliers(counts, summary):
+    """Answers beyond the whiskers of a box_summary(): a frame with the row
+    label (Item), the answer code and how many gave it (Count)."""
+    codes = counts.columns.to_numpy(dtype="float64")
+    values = counts.to_numpy(dtype="int64")
+    beyond = (codes < summary["lower"].to_numpy()[:, None]) | (codes > summary["upper"].to_numpy()[:, None])
+    rows, slots = np.nonzero(beyond & (values > 0))
+    return pd.DataFrame({
+        "Item": counts.index[rows],
+        "Code": counts.columns[slots],
+        "Count": values[rows, slots],
+    })
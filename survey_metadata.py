@@ -0,0 +1,100 @@
+# =========================================================
+# DATASET METADATA SIDECAR
+# =========================================================
+# A small JSON file next to the source CSV (e.g.
+# Cleaned_FashionHabitGF.meta.json) describing the dataset: row count,
+# and per column its cardinality, missing answers, the category values
+# with their counts, or summary statistics of the codes. It is written by
+# survey_ingest.py whenever the data is (re)loaded, and records the size
+# and modification time of the CSV it describes, so a page can tell from
+# one stat() call whether it is current.
+#
+# Pages that only need these figures (the Home page, the options of the
+# filter widgets) read the sidecar and never load the dataset itself.
+
+import json
+import os
+from pathlib import Path
+
+from survey_schema import SCHEMA_VERSION
+
+
+def metadata_path(path):
+    path = Path(path)
+    return path.with_name(f"{path.stem}.meta.json")
+
+
+def build_metadata(frame, aggregates, path, stat, digest):
+    """Describe a typed frame, taking counts from its maintained aggregates
+    (see survey_aggregates.py) so only the free-text columns are scanned.
+    stat is the os.stat() of the CSV taken before it was read."""
+    columns = {}
+    for col in frame.columns:
+        name = col.strip()
+        info = {"dtype": str(frame[col].dtype)}
+        if name in aggregates.category_counts:
+            counts = aggregates.category_counts[name]
+            counts = counts[counts > 0]
+            info["cardinality"] = len(counts)
+            info["missing"] = int(aggregates.n - counts.sum())
+            info["values"] = [str(value) for value in counts.index]
+            info["counts"] = [int(count) for count in counts]
+        elif name in aggregates.code_counts:
+            counts = aggregates.code_counts[name]
+            answered = counts[counts > 0]
+            codes = answered.index.to_numpy()
+            info["cardinality"] = len(answered)
+            info["missing"] = int(aggregates.n - answered.sum())
+            info["counts"] = {str(code): int(count) for code, count in counts.items()}
+            if len(answered):
+                info["min"] = int(codes.min())
+                info["max"] = int(codes.max())
+                info["mean"] = float((codes * answered.to_numpy()).sum() / answered.sum())
+        else:
+            info["cardinality"] = int(frame[col].nunique())
+            info["missing"] = int(frame[col].isna().sum())
+        columns[name] = info
+
+    return {
+        "schema_version": SCHEMA_VERSION,
+        "source": {
+            "name": Path(path).name,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "digest": digest,
+        },
+        "rows": int(aggregates.n),
+        "columns": columns,
+    }
+
+
+def write_metadata(metadata, path):
+    """Write the sidecar for the CSV at path (atomically)."""
+    target = metadata_path(path)
+    tmp_path = target.with_suffix(".tmp")
+    tmp_path.write_text(json.dumps(metadata, ensure_ascii=False, indent=1), encoding="utf-8")
+    os.replace(tmp_path, target)
+
+
+def read_metadata(path):
+    """The sidecar of the CSV at path, or None if it is missing, unreadable
+    or describes a different version of the file."""
+    try:
+        metadata = json.loads(metadata_path(path).read_text(encoding="utf-8"))
+        stat = Path(path).stat()
+    except (OSError, ValueError):
+        return None
+    source = metadata.get("source", {})
+    if (
+        metadata.get("schema_version") != SCHEMA_VERSION
+        or source.get("size") != stat.st_size
+        or source.get("mtime_ns") != stat.st_mtime_ns
+    ):
+        return None
+    return metadata
+
+
+def category_values(metadata, column):
+    """Answers present in a categorical column, in the schema's order."""
+    return metadata["columns"][column]["values"]
+
@@ -0,0 +1,97 @@
+# =========================================================
+# AGGREGATE-BEFORE-PLOT HELPERS
+# =========================================================
+# Figures are built from counts per cell, never from respondent rows: the
+# figure JSON (and the websocket message that carries it to the browser)
+# then has a size set by the number of answer combinations, whatever the
+# number of respondents.
+#   * count_scatter() - a relationship scatter of two coded items as one
+#                       bubble per answer pair, sized and coloured by its
+#                       respondents (from the pair tables, see
+#                       survey_data.joint_counts)
+#   * density_grid()  - respondents per cell of a grid over two continuous
+#                       scores (e.g. mean codes of an item bank), counted
+#                       with one bincount of the flattened cell indices
+#   * density_map()   - that grid as a raster with an empty cell left blank,
+#                       so any number of respondents draws as bins x bins
+#   * count_frame()   - answer counts of an item bank in long format, for
+#                       grouped or stacked bars of the counts themselves
+#   * payload_bytes() - size of the JSON sent to the browser for a figure
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.io as pio
+
+# Colours of the cell counts, shared by the binned and the density views
+COUNT_SCALE = "Blues"
+
+
+def count_scatter(counts, x, y, count="Count", size_max=30, **kwargs):
+    """Scatter of the (x, y) answer pairs in counts (a frame with one row
+    per pair and its number of respondents in count), with the bubble
+    area proportional to the respondents and the colour showing them too.
+    kwargs go to px.scatter."""
+    kwargs.setdefault("color", count)
+    kwargs.setdefault("color_continuous_scale", COUNT_SCALE)
+    fig = px.scatter(counts, x=x, y=y, size=count, size_max=size_max, hover_data={count: True}, **kwargs)
+    fig.update_traces(marker=dict(sizemode="area", line=dict(width=0)))
+    return fig
+
+
+def density_grid(x, y, bins=(20, 20), extent=None):
+    """Respondents per cell of a bins[0] x bins[1] grid over paired values
+    x and y (NaN where missing): a frame indexed by the y cell centres with
+    a column per x cell centre, like np.histogram2d. extent gives the
+    ((x low, x high), (y low, y high)) edges of the grid, by default the
+    range of the values."""
+    x = np.asarray(x, dtype="float64")
+    y = np.asarray(y, dtype="float64")
+    both = ~(np.isnan(x) | np.isnan(y))
+    x, y = x[both], y[both]
+    if extent is None:
+        extent = [(v.min(), v.max()) if len(v) else (0.0, 1.0) for v in (x, y)]
+    cells = []
+    centres = []
+    for values, n, (low, high) in zip((x, y), bins, extent):
+        width = (high - low) / n if high > low else 1.0
+        cells.append(np.clip(((values - low) / width).astype("intp"), 0, n - 1))
+        centres.append(low + width * (np.arange(n) + 0.5))
+    counts = np.bincount(cells[1] * bins[0] + cells[0], minlength=bins[0] * bins[1])
+    return pd.DataFrame(counts.reshape(bins[1], bins[0]), index=centres[1], columns=centres[0])
+
+
+def density_map(grid, labels=None, **kwargs):
+    """Raster of a density_grid() frame coloured by the respondents of each
+    cell, empty cells left blank. labels names the axes (x, y, color) as in
+    plotly express; kwargs go to px.imshow."""
+    kwargs.setdefault("color_continuous_scale", COUNT_SCALE)
+    fig = px.imshow(
+        grid.where(grid > 0),
+        x=grid.columns,
+        y=grid.index,
+        origin="lower",
+        aspect="auto",
+        labels=labels,
+        **kwargs,
+    )
+    fig.update_xaxes(showgrid=False)
+    fig.update_yaxes(showgrid=False)
+    return fig
+
+
+def count_frame(counts, var_name, value_name, labels=None):
+    """A likert_counts() frame (a row per item, a column per code) in long
+    format: var_name holds the item, value_name the answer (labels maps
+    codes to labels) and Count the respondents, one row per item and
+    answer."""
+    data = counts.rename_axis(index=var_name, columns=value_name).stack().rename("Count").reset_index()
+    if labels is not None:
+        data[value_name] = data[value_name].map(labels)
+    return data
+
+
+def payload_bytes(fig):
+    """Bytes of figure JSON sent to the browser for fig, as st.plotly_chart
+    serialises it."""
+    return len(pio.to_json(fig, validate=False).encode())
@@ -0,0 +1,227 @@
+# =========================================================
+# SURVEY SCHEMA
+# =========================================================
+# Declared types for every column of the survey export, applied once at
+# ingest (see survey_data.py):
+#   * demographic answers become ordered categoricals, so each distinct
+#     answer is stored once and rows only hold a small integer code
+#   * Likert and ordinal items become uint8 codes; their text labels are
+#     derived from the codes on demand instead of being stored per row
+#   * the text twins of the *_Ordinal columns (e.g. "Active_Facebook")
+#     are dropped, decode() rebuilds them from the ordinal codes
+# Bump SCHEMA_VERSION whenever the declarations below change.
+
+import pandas as pd
+
+SCHEMA_VERSION = 1
+
+# ---------------------------------------------------------
+# Category Orders (Google Form order)
+# ---------------------------------------------------------
+GENDER_ORDER = ["Female", "Male"]
+
+AGE_ORDER = [
+    "<25 years old",
+    "26-34 years old",
+    "35-45 years old",
+    "46-55 years old",
+    ">55 years old"
+]
+
+REGION_ORDER = ["East Malaysia", "West Malaysia"]
+
+EDUCATION_ORDER = [
+    "Lower secondary education",
+    "Secondary education",
+    "Post-secondary education",
+    "Bachelor’s degree",
+    "Master’s degree",
+    "Doctoral degree"
+]
+
+EMPLOYMENT_ORDER = ["No", "Yes, Part-Time", "Yes, Full-Time"]
+
+INFLUENCE_ORDER = [
+    "Online community (reviews, comments, etc.)",
+    "Celebrities or social media influencers",
+    "Brand advertisements",
+    "Family and relatives",
+    "Friends",
+    "I do not rely on recommendations"
+]
+
+EXPENSE_ORDER = ["<500", "500-1000", "1000-3000", ">3000"]
+
+CATEGORICAL_COLUMNS = {
+    "Gender": GENDER_ORDER,
+    "Age": AGE_ORDER,
+    "Region": REGION_ORDER,
+    "Education Level": EDUCATION_ORDER,
+    "Employment Status": EMPLOYMENT_ORDER,
+    "Influence on Shopping": INFLUENCE_ORDER,
+    "Average Monthly Expenses (RM)": EXPENSE_ORDER,
+    "Education_Grouped": [],
+}
+
+# ---------------------------------------------------------
+# Code -> Label Scales
+# ---------------------------------------------------------
+LIKERT_LABELS = {1: 'Strongly Disagree', 2: 'Disagree', 3: 'Neutral', 4: 'Agree', 5: 'Strongly Agree'}
+
+AWARENESS_LABELS = {
+    1: "1 - Not aware at all",
+    2: "2 - Slightly aware",
+    3: "3 - Moderately aware",
+    4: "4 - Very aware",
+    5: "5 - Extremely aware"
+}
+
+# *_Ordinal columns: 0 is the most active / least frequent answer
+ACTIVITY_LABELS = {0: 'Very active', 1: 'Active', 2: 'Sometimes active', 3: 'Inactive'}
+FREQUENCY_LABELS = {0: 'Never', 1: 'Rarely', 2: 'Sometimes', 3: 'Often', 4: 'Very often'}
+
+INTEREST_LABELS = {1: 'Not at all interested', 2: 'Slightly interested', 3: 'Neutral', 4: 'Interested', 5: 'Highly interested'}
+HOW_OFTEN_LABELS = {1: 'Never', 2: 'Rarely', 3: 'Sometimes', 4: 'Often', 5: 'Very often'}
+IMPORTANCE_LABELS = {1: 'Not important', 2: 'Slightly important', 3: 'Neutral', 4: 'Important', 5: 'Very Important'}
+
+# ---------------------------------------------------------
+# Item Banks (column names without the surrounding spaces)
+# ---------------------------------------------------------
+PLATFORMS = ["Facebook", "Threads", "Instagram", "Pinterest", "Tiktok"]
+ACTIVITIES = [
+    "Read_posts_or_articles",
+    "Watch_videos",
+    "Comment_on_posts",
+    "Share_posts_or_photos",
+    "Upload_pictures_or_videos"
+]
+
+ACTIVE_ITEMS = [f"Active_{p}_Ordinal" for p in PLATFORMS]
+FREQ_ITEMS = [f"Freq_{a}_Ordinal" for a in ACTIVITIES]
+
+INTEREST_QUESTIONS = {
+    "How interested are you in fashion?": INTEREST_LABELS,
+    "How often do you look for new fashion styles or trends?": HOW_OFTEN_LABELS,
+    "How often do you buy fashion products (clothes, shoes, accessories)?": HOW_OFTEN_LABELS,
+    "How important is fashion in your daily life?": IMPORTANCE_LABELS,
+}
+
+INTEREST_ITEMS = [
+    "I care more about my look and style since people can see my photos on social media.",
+    "I am more interested in fashion since the arrival of social media.",
+    "My interest in fashion is the same as before, I do not care how people see my profile.",
+    "My interest in fashion has increased because it is easier to get updates from brands and designers.",
+    "I enjoy following fashion bloggers or influencers online.",
+    "I like staying updated with the latest fashion trends.",
+    "I often purchase products I see on social media."
+]
+
+MOTIVATION_ITEMS = [
+    "I follow fashion brands on social media to get updates on new collections or promotions",
+    "I follow fashion brands on social media because  I like their products and style",
+    "I follow fashion brands on social media because it is entertaining.",
+    "I follow fashion brands on social media because I want to receive discounts or participate in contests.",
+    "I follow fashion brands on social media because it helps me express my personality",
+    "I follow fashion brands on social media because I want to feel part of an online community.",
+    "I follow fashion brands on social media because I want to support or show loyalty to the brand."
+]
+
+CODED_COLUMNS = {
+    "Awareness of Fashion Trends": AWARENESS_LABELS,
+    **{col: ACTIVITY_LABELS for col in ACTIVE_ITEMS},
+    **{col: FREQUENCY_LABELS for col in FREQ_ITEMS},
+    **INTEREST_QUESTIONS,
+    **{col: LIKERT_LABELS for col in INTEREST_ITEMS + MOTIVATION_ITEMS},
+}
+
+# Text columns that duplicate an *_Ordinal column; not kept after ingest
+TEXT_TWINS = {
+    **{f"Active_{p}": f"Active_{p}_Ordinal" for p in PLATFORMS},
+    **{f"Freq_{a}": f"Freq_{a}_Ordinal" for a in ACTIVITIES},
+}
+
+
+# ---------------------------------------------------------
+# Encoding
+# ---------------------------------------------------------
+def _categories(values, declared):
+    """Declared order first, then any answers the form did not list."""
+    present = pd.unique(values.dropna())
+    return list(declared) + sorted(x for x in present if x not in declared)
+
+
+def _encode_categorical(values, declared):
+    values = values.astype("string").str.strip().str.replace("'", "’", regex=False).astype(object)
+    return pd.Categorical(values, categories=_categories(values, declared), ordered=bool(declared))
+
+
+def _encode_codes(values, labels):
+    """Codes on the given scale as uint8 (UInt8 if any answer is missing).
+    Text answers are matched against the labels; anything off-scale is NA."""
+    if pd.api.types.is_numeric_dtype(values):
+        codes = pd.to_numeric(values, errors="coerce")
+    else:
+        lookup = {label.lower(): code for code, label in labels.items()}
+        codes = values.astype("string").str.strip().str.lower().map(lookup)
+    codes = codes.where(codes.isin(list(labels))).astype("Float64")
+    if codes.isna().any():
+        return codes.astype("UInt8")
+    return codes.astype("uint8")
+
+
+def apply_schema(df):
+    """Return a compact, typed copy of a raw survey frame."""
+    columns = {}
+    for col in df.columns:
+        name = col.strip()
+        if name in TEXT_TWINS:
+            continue
+        if name in CATEGORICAL_COLUMNS:
+            columns[col] = _encode_categorical(df[col], CATEGORICAL_COLUMNS[name])
+        elif name in CODED_COLUMNS:
+            columns[col] = _encode_codes(df[col], CODED_COLUMNS[name])
+        else:
+            columns[col] = df[col]
+    return pd.DataFrame(columns, index=df.index)
+
+
+def conform(df):
+    """Restore what storing a typed frame in chunks can change (see
+    survey_ingest.py): categories in declared-then-sorted order, and plain
+    uint8 codes for columns written as UInt8 that have no missing answer.
+    Columns that already conform are left untouched (not copied)."""
+    changed = {}
+    for col in df.columns:
+        values = df[col]
+        name = col.strip()
+        if name in CATEGORICAL_COLUMNS and isinstance(values.dtype, pd.CategoricalDtype):
+            declared = CATEGORICAL_COLUMNS[name]
+            current = list(values.cat.categories)
+            expected = list(declared) + sorted(x for x in current if x not in declared)
+            if current != expected:
+                changed[col] = values.cat.reorder_categories(expected)
+        elif name in CODED_COLUMNS and values.dtype == "UInt8" and not values.isna().any():
+            changed[col] = values.astype("uint8")
+    return df.assign(**changed) if changed else df
+
+
+def labels_for(column):
+    """The code -> label scale of a coded column, or None."""
+    name = column.strip()
+    name = TEXT_TWINS.get(name, name)
+    return CODED_COLUMNS.get(name)
+
+
+def decode(df, column, labels=None):
+    """Text labels of a coded column as an ordered categorical built from the
+    codes. Also accepts the dropped text twins, e.g. "Active_Facebook".
+    Pass labels explicitly for a column that has been renamed."""
+    name = column.strip()
+    source = TEXT_TWINS.get(name)
+    if source is not None:
+        column = next(c for c in df.columns if c.strip() == source)
+    labels = labels or labels_for(column)
+    first = min(labels)
+    codes = df[column].to_numpy(dtype="int16", na_value=first - 1) - first
+    values = pd.Categorical.from_codes(codes, categories=list(labels.values()), ordered=True)
+    return pd.Series(values, index=df.index, name=name)
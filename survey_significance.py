@@ -0,0 +1,155 @@
+# =========================================================
+# SIGNIFICANCE TESTS FOR SEGMENT COMPARISONS
+# =========================================================
+# Tests behind the "group A differs from group B" statements of the pages,
+# each run for a whole set of tables or items in one vectorised step:
+#   * chi_square()       - chi-square test of independence and Cramér's V
+#                          of every contingency table (e.g. from
+#                          CountCube.crosstabs), stacked into one array
+#   * mann_whitney()     - Mann-Whitney U test of every Likert item between
+#                          two groups, from their answer counts alone
+#                          (survey_likert.likert_counts): tied answers
+#                          share the midrank of their code
+#   * permutation_test() - difference in mean code of every item between
+#                          two groups against shuffled group labels; the
+#                          permutations are weight matrices like the
+#                          bootstrap resamples (survey_bootstrap.py), and
+#                          large jobs are split across a process pool
+#   * adjust_pvalues()   - Holm or Benjamini-Hochberg adjustment of the
+#                          p-values of a family of tests
+
+import numpy as np
+from scipy import stats
+
+from survey_bootstrap import BATCH_CELLS, draw_in_parts
+
+PERMUTATIONS = 10_000
+
+ADJUSTMENTS = ("holm", "fdr_bh")
+
+
+def chi_square(tables):
+    """Chi-square test of independence (without continuity correction) of
+    every 2-D table of counts: a dict of arrays with the statistic (chi2),
+    degrees of freedom (dof), p-value (p), Cramér's V (cramers_v) and
+    total count (n) of each table. Rows and columns without counts are
+    left out, so a table with a single answer on either side has dof 0 and
+    a NaN p-value."""
+    tables = [np.asarray(table, dtype="float64") for table in tables]
+    shape = np.max([table.shape for table in tables], axis=0)
+    # Zero padding adds empty rows and columns, which the tests ignore
+    stacked = np.zeros((len(tables), *shape))
+    for k, table in enumerate(tables):
+        stacked[k, :table.shape[0], :table.shape[1]] = table
+
+    n = stacked.sum(axis=(1, 2))
+    rows = stacked.sum(axis=2)
+    cols = stacked.sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        expected = rows[:, :, None] * cols[:, None, :] / n[:, None, None]
+        cells = np.where(expected > 0, (stacked - expected) ** 2 / expected, 0)
+    chi2 = cells.sum(axis=(1, 2))
+    r = (rows > 0).sum(axis=1)
+    c = (cols > 0).sum(axis=1)
+    dof = (r - 1) * (c - 1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        p = np.where(dof > 0, stats.chi2.sf(chi2, np.maximum(dof, 1)), np.nan)
+        cramers_v = np.sqrt(chi2 / (n * (np.minimum(r, c) - 1)))
+    return {"chi2": chi2, "dof": dof, "p": p, "cramers_v": cramers_v, "n": n}
+
+
+def one_vs_rest(table):
+    """Split a rows x answers table into one rows x 2 table per answer:
+    that answer against all the others. chi_square() of the result tests,
+    answer by answer, whether its share differs between the rows."""
+    table = np.asarray(table, dtype="float64")
+    rest = table.sum(axis=1, keepdims=True) - table
+    return list(np.stack([table, rest], axis=2).transpose(1, 0, 2))
+
+
+def mann_whitney(counts_a, counts_b):
+    """Two-sided Mann-Whitney U test of every item between two groups, from
+    their answer counts (arrays [item, code], codes in ascending order):
+    a dict of arrays with U of group a (u), the z score (z), the p-value
+    (p, normal approximation with tie and continuity correction, as
+    scipy.stats.mannwhitneyu gives for large samples) and the rank-biserial
+    correlation (effect, positive when group a answers higher)."""
+    a = np.asarray(counts_a, dtype="float64")
+    b = np.asarray(counts_b, dtype="float64")
+    total = a + b
+    n_a = a.sum(axis=1)
+    n_b = b.sum(axis=1)
+    n = n_a + n_b
+    ranks = np.cumsum(total, axis=1) - total + (total + 1) / 2
+    u = (a * ranks).sum(axis=1) - n_a * (n_a + 1) / 2
+    ties = (total ** 3 - total).sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sigma = np.sqrt(n_a * n_b / 12 * ((n + 1) - ties / (n * (n - 1))))
+        z = (np.abs(u - n_a * n_b / 2) - 0.5) / sigma
+        effect = 2 * u / (n_a * n_b) - 1
+    p = np.minimum(2 * stats.norm.sf(z), 1)
+    return {"u": u, "z": z, "p": p, "effect": effect}
+
+
+def permutation_test(values, in_a, permutations=PERMUTATIONS, seed=0, workers=None):
+    """Two-sided permutation test of the difference in mean (group a minus
+    group b) of every column of values (respondents x items, NaN where not
+    answered), where in_a marks the respondents of group a and the other
+    rows are group b. Returns the observed differences and their p-values,
+    the share of label shuffles (plus the observed labels) giving a
+    difference at least as large. The same seed and data always give the
+    same shuffles."""
+    values = np.asarray(values, dtype="float64")
+    in_a = np.asarray(in_a, dtype="bool")
+    observed = _mean_difference(values, in_a[None, :])[0]
+    null = draw_in_parts(_permutation_part, (values, in_a), permutations, len(values), seed, workers)
+    # Differences equal up to rounding count as at least as large
+    extreme = (np.abs(null) >= np.abs(observed) - 1e-12).sum(axis=0)
+    p = np.where(np.isnan(observed), np.nan, (extreme + 1) / (permutations + 1))
+    return observed, p
+
+
+def adjust_pvalues(p, method="holm"):
+    """p-values adjusted for testing them together: "holm" controls the
+    family-wise error rate, "fdr_bh" (Benjamini-Hochberg) the false
+    discovery rate. NaN p-values are left out of the family."""
+    p = np.asarray(p, dtype="float64")
+    result = np.full(p.shape, np.nan)
+    tested = np.flatnonzero(~np.isnan(p))
+    m = len(tested)
+    if not m:
+        return result
+    order = tested[np.argsort(p[tested], kind="stable")]
+    ranked = p[order]
+    if method == "holm":
+        adjusted = np.maximum.accumulate((m - np.arange(m)) * ranked)
+    elif method == "fdr_bh":
+        adjusted = np.minimum.accumulate((m / np.arange(1, m + 1) * ranked)[::-1])[::-1]
+    else:
+        raise ValueError(f"unknown adjustment {method!r}, expected one of {ADJUSTMENTS}")
+    result[order] = np.minimum(adjusted, 1)
+    return result
+
+
+def _mean_difference(values, in_a):
+    """Mean of group a minus mean of the other rows, for every row of
+    labels in_a (an array [labelling, respondent]) and every item."""
+    answered = (~np.isnan(values)).astype("float64")
+    filled = np.nan_to_num(values)
+    weights = in_a.astype("float64")
+    sum_a = weights @ filled
+    count_a = weights @ answered
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return sum_a / count_a - (filled.sum(axis=0) - sum_a) / (answered.sum(axis=0) - count_a)
+
+
+def _permutation_part(values, in_a, permutations, seed_sequence):
+    rng = np.random.default_rng(seed_sequence)
+    n = len(values)
+    result = np.empty((permutations, values.shape[1]))
+    batch = max(1, BATCH_CELLS // max(n, 1))
+    for start in range(0, permutations, batch):
+        size = min(batch, permutations - start)
+        shuffled = rng.permuted(np.broadcast_to(in_a, (size, n)), axis=1)
+        result[start:start + size] = _mean_difference(values, shuffled)
+    return result
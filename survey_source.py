@@ -0,0 +1,191 @@
+# =========================================================
+# SURVEY DATA SOURCE
+# =========================================================
+# Decides which copy of the survey CSV the dashboard reads. Pages never
+# wait on the network: the CSV shipped with the repo (or a mirror that
+# was downloaded earlier) is always used for rendering, and the remote
+# copy is only polled in the background with conditional requests
+# (ETag / Last-Modified). A failed refresh keeps the last good copy, and
+# a download identical to the copy in use is not written: the resolved
+# path and its version only change when the content does.
+#
+# Configuration (environment variables, all optional):
+#   FASHION_SURVEY_CSV      local CSV path (default: the bundled file)
+#   FASHION_SURVEY_MIRROR   folder for the downloaded copy (default: .survey_cache)
+#   FASHION_SURVEY_URL      remote CSV url, empty string disables refresh
+#   FASHION_SURVEY_REFRESH  seconds between refresh checks (default: 900)
+
+import http.client
+import io
+import json
+import logging
+import os
+import threading
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+BUNDLED_FILE = Path(__file__).with_name("Cleaned_FashionHabitGF.csv")
+DEFAULT_MIRROR_DIR = Path(__file__).with_name(".survey_cache")
+DEFAULT_REMOTE_URL = "https://raw.githubusercontent.com/izzatimahrup/SVProject_A-Survey-of-Fashion-Habits/main/Cleaned_FashionHabitGF.csv"
+DEFAULT_REFRESH_SECONDS = 900
+
+# A downloaded file must at least have these columns to replace a good copy
+REQUIRED_COLUMNS = ["Gender", "Age", "Region"]
+
+
+class SurveySource:
+    """Local-first resolver for the survey CSV with optional remote refresh."""
+
+    def __init__(self, local_path=BUNDLED_FILE, mirror_dir=DEFAULT_MIRROR_DIR,
+                 remote_url=DEFAULT_REMOTE_URL, refresh_seconds=DEFAULT_REFRESH_SECONDS,
+                 timeout=10):
+        self.local_path = Path(local_path)
+        self.mirror_dir = Path(mirror_dir)
+        self.remote_url = remote_url or None
+        self.refresh_seconds = refresh_seconds
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    @property
+    def mirror_path(self):
+        return self.mirror_dir / self.local_path.name
+
+    @property
+    def _validators_path(self):
+        return self.mirror_dir / (self.local_path.name + ".http.json")
+
+    # ---------------------------------------------------------
+    # Resolving
+    # ---------------------------------------------------------
+    def resolve(self):
+        """Path of the newest available local copy (mirror or bundled file)."""
+        candidates = [p for p in (self.mirror_path, self.local_path) if p.is_file()]
+        if not candidates:
+            raise FileNotFoundError(f"No survey data found at {self.local_path} or {self.mirror_path}")
+        return max(candidates, key=lambda p: p.stat().st_mtime_ns)
+
+    def version(self):
+        """Cache key that changes whenever the resolved copy changes."""
+        path = self.resolve()
+        stat = path.stat()
+        return str(path), stat.st_mtime_ns, stat.st_size
+
+    # ---------------------------------------------------------
+    # Remote Refresh
+    # ---------------------------------------------------------
+    def _load_validators(self, current):
+        """ETag / Last-Modified of the last download, if the copy they were
+        saved for is still the one in use."""
+        try:
+            validators = json.loads(self._validators_path.read_text())
+        except (OSError, ValueError):
+            return {}
+        if current is None or validators.get("version") != list(self.version()):
+            return {}
+        return validators
+
+    def _save_validators(self, headers):
+        self._validators_path.write_text(json.dumps({
+            "etag": headers.get("ETag"),
+            "last_modified": headers.get("Last-Modified"),
+            "version": list(self.version()),
+        }))
+
+    def refresh(self):
+        """Fetch the remote copy if it changed. Returns True when the mirror
+        was updated, False when unchanged, disabled or the fetch failed."""
+        if not self.remote_url:
+            return False
+
+        with self._lock:
+            try:
+                current = self.resolve()
+            except FileNotFoundError:
+                current = None
+            validators = self._load_validators(current)
+            request = urllib.request.Request(self.remote_url)
+            if validators.get("etag"):
+                request.add_header("If-None-Match", validators["etag"])
+            if validators.get("last_modified"):
+                request.add_header("If-Modified-Since", validators["last_modified"])
+
+            try:
+                with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                    body = response.read()
+                    headers = response.headers
+            except urllib.error.HTTPError as err:
+                if err.code == 304:
+                    return False
+                logger.warning("Survey refresh failed (HTTP %s), keeping last good copy", err.code)
+                return False
+            except (urllib.error.URLError, OSError, http.client.HTTPException) as err:
+                # HTTPException: e.g. IncompleteRead when the body is cut short
+                logger.warning("Survey refresh failed (%s), keeping last good copy", err)
+                return False
+
+            try:
+                header = pd.read_csv(io.BytesIO(body), nrows=5)
+            except (ValueError, pd.errors.ParserError) as err:
+                logger.warning("Downloaded survey data is not a valid CSV (%s), ignored", err)
+                return False
+            if not all(col in header.columns for col in REQUIRED_COLUMNS):
+                logger.warning("Downloaded survey data is missing required columns, ignored")
+                return False
+
+            # Write to a temp file first so readers never see a partial CSV.
+            # The same content is not written again, so the copy in use and
+            # its version stay as they are and nothing is reloaded
+            tmp_path = self.mirror_path.with_suffix(".tmp")
+            try:
+                self.mirror_dir.mkdir(parents=True, exist_ok=True)
+                if _same_content(current, body):
+                    self._save_validators(headers)
+                    return False
+                tmp_path.write_bytes(body)
+                os.replace(tmp_path, self.mirror_path)
+                self._save_validators(headers)
+            except OSError as err:
+                logger.warning("Could not write survey mirror %s (%s), keeping last good copy", self.mirror_path, err)
+                return False
+            logger.info("Survey mirror updated from %s", self.remote_url)
+            return True
+
+    def start_background_refresh(self):
+        """Poll the remote copy on a daemon thread (once per source)."""
+        if not self.remote_url or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._refresh_loop, name="survey-refresh", daemon=True)
+        self._thread.start()
+
+    def stop_background_refresh(self):
+        self._stop.set()
+
+    def _refresh_loop(self):
+        while not self._stop.is_set():
+            try:
+                self.refresh()
+            except Exception:
+                # Keep polling: one bad refresh must not stop the others
+                logger.exception("Survey refresh failed unexpectedly, retrying later")
+            self._stop.wait(self.refresh_seconds)
+
+
+def _same_content(path, body):
+    return path is not None and path.stat().st_size == len(body) and path.read_bytes() == body
+
+
+def source_from_env():
+    """Build a SurveySource from the FASHION_SURVEY_* environment variables."""
+    return SurveySource(
+        local_path=os.environ.get("FASHION_SURVEY_CSV", BUNDLED_FILE),
+        mirror_dir=os.environ.get("FASHION_SURVEY_MIRROR", DEFAULT_MIRROR_DIR),
+        remote_url=os.environ.get("FASHION_SURVEY_URL", DEFAULT_REMOTE_URL),
+        refresh_seconds=float(os.environ.get("FASHION_SURVEY_REFRESH", DEFAULT_REFRESH_SECONDS)),
+    )
@@ -0,0 +1,220 @@
+# =========================================================
+# TYPED SNAPSHOT STORE
+# =========================================================
+# The CSV is only parsed when it changes. After the first parse the typed
+# frame (see survey_schema.py) is written next to the source as an
+# uncompressed Arrow IPC (Feather v2) file named after the CSV's content
+# hash and the schema version. Later starts open that snapshot with a
+# memory map instead of parsing text, and a changed CSV or a schema bump
+# simply produces a new file name. Large exports are written chunk by
+# chunk (write_snapshot_chunks) instead of from one in-memory frame.
+#
+# The frame handed to the pages is built on top of that memory map: the
+# uint8 columns and categorical codes point straight into the mapped file
+# (read-only), so every session and every server process reading the same
+# snapshot shares one copy through the OS page cache. Pages that only
+# need a few columns get a column selection of that frame (see
+# survey_data.load_survey), a view over the same mapped buffers: columns
+# no page selects cost address space, but their pages of the file are
+# never read into memory.
+
+import hashlib
+import logging
+import os
+import re
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from survey_schema import SCHEMA_VERSION, apply_schema, conform
+
+logger = logging.getLogger(__name__)
+
+HASH_CHUNK = 1 << 20
+
+
+def file_digest(path):
+    """Content hash of the source file (first 16 hex digits of BLAKE2b)."""
+    digest = hashlib.blake2b(digest_size=8)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# <csv stem>.<16 hex digits of content hash>.s<schema version>.arrow
+_SNAPSHOT_NAME = re.compile(r"(?P<stem>.+)\.[0-9a-f]{16}\.s\d+\.arrow")
+
+
+def snapshot_path(path, digest):
+    path = Path(path)
+    return path.with_name(f"{path.stem}.{digest}.s{SCHEMA_VERSION}.arrow")
+
+
+# Address range of every snapshot mapped by this process, used by
+# memory_report() to tell shared bytes from private ones
+_mapped_ranges = {}
+
+
+def select_columns(names, columns):
+    """The names (in file order) that match the requested columns, which
+    are given without their surrounding spaces; None selects everything."""
+    if columns is None:
+        return list(names)
+    wanted = {col.strip() for col in columns}
+    return [name for name in names if name.strip() in wanted]
+
+
+def read_snapshot(snapshot):
+    """Zero-copy frame over the memory-mapped snapshot where the type allows."""
+    source = pa.memory_map(str(snapshot))
+    whole = source.read_buffer()
+    _mapped_ranges[str(snapshot)] = (whole.address, whole.address + whole.size)
+    source.seek(0)
+    table = pa.ipc.open_file(source).read_all()
+    return conform(table.to_pandas(split_blocks=True))
+
+
+def _buffers(series):
+    """(address, nbytes) of the memory holding one column's data, found
+    through public pandas and Arrow interfaces. Arrays that do not expose
+    their memory give (None, nbytes): counted as private, never shared."""
+    values = series.array
+    try:
+        if isinstance(values, pd.Categorical):
+            return [_numpy_buffer(values.codes)]
+        if isinstance(values, pd.arrays.ArrowExtensionArray):
+            chunks = values.__arrow_array__().chunks
+            return [(buf.address, buf.size) for chunk in chunks for buf in chunk.buffers() if buf is not None]
+        if isinstance(values, pd.arrays.NumpyExtensionArray):
+            return [_numpy_buffer(values.to_numpy())]
+        if hasattr(values, "__arrow_array__"):
+            # Nullable arrays: Arrow wraps the data without copying (its
+            # validity bitmap is new), so the data buffer stands for the
+            # whole array, mask included
+            data = values.__arrow_array__().buffers()[1]
+            return [(data.address, values.nbytes)]
+    except (AttributeError, TypeError, pa.ArrowException):
+        pass
+    return [(None, values.nbytes)]
+
+
+def _numpy_buffer(array):
+    return array.__array_interface__["data"][0], array.nbytes
+
+
+def memory_report(*frames):
+    """Bytes held by the given frames, split into memory-mapped (shared by
+    all sessions and processes) and private. Memory that several frames
+    share, e.g. a page view and the core frame, is counted once."""
+    seen = set()
+    report = {"mapped_bytes": 0, "private_bytes": 0}
+    for df in frames:
+        for col in df.columns:
+            for address, nbytes in _buffers(df[col]):
+                if address is None:
+                    report["private_bytes"] += nbytes
+                    continue
+                if address in seen:
+                    continue
+                seen.add(address)
+                mapped = any(lo <= address < hi for lo, hi in _mapped_ranges.values())
+                report["mapped_bytes" if mapped else "private_bytes"] += nbytes
+    return report
+
+
+def write_snapshot(df, snapshot):
+    """Write atomically and remove older snapshots of the same source."""
+    snapshot = Path(snapshot)
+    tmp_path = snapshot.with_suffix(".tmp")
+    # One record batch: a column split over several batches has to be
+    # copied into one array when read, losing the zero-copy frame. Columns
+    # backed by chunked Arrow arrays (strings read from a streamed snapshot
+    # or appended to) are combined first, or their chunks split the batch
+    table = pa.Table.from_pandas(df, preserve_index=False).combine_chunks()
+    feather.write_feather(table, tmp_path, compression="uncompressed", chunksize=max(len(df), 1))
+    _publish(tmp_path, snapshot)
+
+
+def write_snapshot_chunks(chunks, snapshot):
+    """Like write_snapshot() for a frame that arrives in typed chunks, e.g.
+    from a chunked read_csv: only one chunk is in memory while they are
+    written. The chunks are then merged into the snapshot, which holds
+    the typed frame (not the CSV text) in memory once.
+
+    Every chunk must have the columns and dtypes of the first one, and its
+    categories must extend those of the chunk before (new categories at
+    the end) so they can be stored as dictionary deltas. Returns the
+    number of rows written."""
+    snapshot = Path(snapshot)
+    tmp_path = snapshot.with_suffix(".chunks")
+    options = pa.ipc.IpcWriteOptions(emit_dictionary_deltas=True)
+    writer, schema, rows = None, None, 0
+    try:
+        for chunk in chunks:
+            if writer is None:
+                schema = _chunk_schema(chunk)
+                writer = pa.ipc.new_file(str(tmp_path), schema, options=options)
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+            rows += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is None:
+        raise ValueError("no rows to write")
+    # The chunks (nullable codes, wide dictionary indices, many batches)
+    # would be copied into private memory on every read: write them once
+    # more as the one-batch snapshot of a parsed frame, which maps zero-copy
+    with pa.memory_map(str(tmp_path)) as source:
+        df = conform(pa.ipc.open_file(source).read_all().to_pandas(split_blocks=True))
+    try:
+        write_snapshot(df, snapshot)
+    finally:
+        del df
+        tmp_path.unlink(missing_ok=True)
+    return rows
+
+
+def _chunk_schema(chunk):
+    # Wide dictionary indices, so later chunks may bring many new categories
+    schema = pa.Schema.from_pandas(chunk, preserve_index=False)
+    for i, field in enumerate(schema):
+        if pa.types.is_dictionary(field.type):
+            wide = pa.dictionary(pa.int32(), field.type.value_type, field.type.ordered)
+            schema = schema.set(i, field.with_type(wide))
+    return schema
+
+
+def _publish(tmp_path, snapshot):
+    os.replace(tmp_path, snapshot)
+
+    # Only snapshots of the same CSV: "survey.csv" must not remove those of
+    # "survey.v2.csv" in the same folder
+    stem = _SNAPSHOT_NAME.fullmatch(snapshot.name).group("stem")
+    for old in snapshot.parent.iterdir():
+        match = _SNAPSHOT_NAME.fullmatch(old.name)
+        if match and match.group("stem") == stem and old != snapshot:
+            old.unlink(missing_ok=True)
+
+
+def read_survey(path, digest=None):
+    """Typed survey frame for a CSV, from its snapshot when one exists.
+    Pass the content digest if it is already known to skip hashing."""
+    snapshot = snapshot_path(path, digest or file_digest(path))
+    if snapshot.is_file():
+        try:
+            return read_snapshot(snapshot)
+        except (OSError, ValueError) as err:
+            logger.warning("Ignoring unreadable snapshot %s (%s)", snapshot, err)
+
+    df = apply_schema(pd.read_csv(path))
+    try:
+        write_snapshot(df, snapshot)
+    except (OSError, ValueError) as err:
+        # A read-only checkout still works, it just parses the CSV each start
+        logger.warning("Could not write snapshot %s (%s)", snapshot, err)
+        return df
+    # Re-open the file just written so this process shares it too
+    return read_snapshot(snapshot)
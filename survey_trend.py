@@ -0,0 +1,105 @@
+# =========================================================
+# TRENDLINES FOR THE RELATIONSHIP SCATTERS
+# =========================================================
+# Least-squares lines of one coded item on another, in closed form from
+# the pair moments (survey_corr.py) of every candidate pair at once: a
+# selection change costs a lookup, not a model fit, and statsmodels is
+# not needed. linear_fit() fits paired values the same way (e.g. derived
+# scores of each respondent). line_traces() turns a fit into the traces to
+# add to a scatter figure: the fitted line and the confidence band of the
+# mean.
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from scipy import stats
+
+from survey_corr import pair_moments
+
+FIT_COLUMNS = ["slope", "intercept", "r2", "n", "x_mean", "x_ss", "x_min", "x_max", "se", "t"]
+
+
+def linear_fits(tables, codes, confidence=0.95):
+    """Fit of item j on item i for every pair of pair tables whose slots
+    hold the given codes (see survey_corr.item_codes): a dict of [i, j]
+    arrays with the slope, intercept, r2, number of rows (n), mean and
+    sum of squares of x (x_mean, x_ss), lowest and highest x answered
+    (x_min, x_max), residual standard error (se) and the t quantile of the
+    confidence band (t)."""
+    x = codes[:, None, :]
+    answered = tables.sum(axis=3) > 0
+    return _fits(
+        *pair_moments(tables, x, codes[None, :, :]),
+        np.where(answered, x, np.inf).min(axis=2),
+        np.where(answered, x, -np.inf).max(axis=2),
+        confidence,
+    )
+
+
+def linear_fit(x, y, confidence=0.95):
+    """Fit of y on x from paired values (NaN where missing, e.g. derived
+    scores of each respondent), as a row in the layout of fit_frame()."""
+    x = np.asarray(x, dtype="float64")
+    y = np.asarray(y, dtype="float64")
+    both = ~(np.isnan(x) | np.isnan(y))
+    x, y = x[both], y[both]
+    moments = (len(x), x.sum(), y.sum(), x @ x, y @ y, x @ y)
+    bounds = (x.min(), x.max()) if len(x) else (np.nan, np.nan)
+    fit = _fits(*(np.float64(m) for m in moments), *bounds, confidence)
+    return pd.Series({key: fit[key] for key in FIT_COLUMNS})
+
+
+def fit_frame(fits, columns, x_columns, y_columns):
+    """The fits of the (x, y) pairs as a frame indexed by (X, Y), from
+    linear_fits() over columns."""
+    grid = np.ix_([columns.index(col) for col in x_columns], [columns.index(col) for col in y_columns])
+    index = pd.MultiIndex.from_product([x_columns, y_columns], names=["X", "Y"])
+    return pd.DataFrame({key: fits[key][grid].ravel() for key in FIT_COLUMNS}, index=index)
+
+
+def _fits(n, sx, sy, sxx, syy, sxy, x_min, x_max, confidence):
+    """Least-squares fits from the moments of x and y (see pair_moments)."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        x_mean = sx / n
+        y_mean = sy / n
+        x_ss = sxx - n * x_mean ** 2
+        y_ss = syy - n * y_mean ** 2
+        xy = sxy - n * x_mean * y_mean
+        slope = xy / x_ss
+        rss = np.maximum(y_ss - slope * xy, 0)
+        r2 = 1 - rss / y_ss
+        se = np.sqrt(rss / (n - 2))
+    return {
+        "slope": slope,
+        "intercept": y_mean - slope * x_mean,
+        "r2": r2,
+        "n": n,
+        "x_mean": x_mean,
+        "x_ss": x_ss,
+        "x_min": x_min,
+        "x_max": x_max,
+        "se": se,
+        "t": stats.t.ppf((1 + confidence) / 2, np.maximum(n - 2, 1)),
+    }
+
+
+def line_traces(fit, color="red", points=50):
+    """Fitted line and confidence band of one fit (a row of fit_frame()),
+    as plotly traces spanning the answered x range. Empty when the pair
+    has no usable fit."""
+    if not np.isfinite(fit["slope"]) or not fit["x_max"] > fit["x_min"]:
+        return []
+    x = np.linspace(fit["x_min"], fit["x_max"], points)
+    y = fit["intercept"] + fit["slope"] * x
+    half = fit["t"] * fit["se"] * np.sqrt(1 / fit["n"] + (x - fit["x_mean"]) ** 2 / fit["x_ss"])
+    band = go.Scatter(
+        x=np.concatenate([x, x[::-1]]), y=np.concatenate([y + half, (y - half)[::-1]]),
+        fill="toself", fillcolor=color, opacity=0.15, line=dict(width=0),
+        hoverinfo="skip", showlegend=False, name="95% CI"
+    )
+    line = go.Scatter(
+        x=x[[0, -1]], y=y[[0, -1]], mode="lines", line=dict(color=color), showlegend=False,
+        name="OLS trend",
+        hovertemplate=f"y = {fit['intercept']:.2f} + {fit['slope']:.2f}x<br>R² = {fit['r2']:.2f}<extra></extra>"
+    )
+    return [band, line]
@@ -0,0 +1,62 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from survey_bitmap import BitmapIndex
+from survey_corr import pair_counts
+from survey_likert import likert_counts
+from survey_schema import MOTIVATION_ITEMS
+from survey_store import read_survey
+
+SURVEY_CSV = Path(__file__).resolve().parent.parent / "Cleaned_FashionHabitGF.csv"
+
+FILTERS = [
+    {"Gender": ["Female"]},
+    {"Gender": ["Male"], "Age": ["<25 years old"]},
+    {"Region": ["West Malaysia", "No such region"]},
+    {"Gender": []},
+]
+
+
+@pytest.fixture(scope="module")
+def survey(tmp_path_factory):
+    path = tmp_path_factory.mktemp("survey") / "survey.csv"
+    path.write_bytes(SURVEY_CSV.read_bytes())
+    return read_survey(path)
+
+
+def _mask(df, where):
+    names = {col.strip(): col for col in df.columns}
+    mask = np.ones(len(df), dtype=bool)
+    for col, allowed in where.items():
+        mask &= df[names[col]].isin(allowed).to_numpy()
+    return mask
+
+
+@pytest.mark.parametrize("where", FILTERS)
+def test_selection_matches_isin(survey, where):
+    rows = BitmapIndex.from_frame(survey).selection(where)
+    selected = np.zeros(len(survey), dtype=bool)
+    selected[rows] = True
+    assert np.array_equal(selected, _mask(survey, where))
+
+
+def test_whole_domain_selects_everything(survey):
+    answers = list(survey["Gender"].cat.categories)
+    assert BitmapIndex.from_frame(survey).selection({"Gender": answers}) == slice(None)
+
+
+@pytest.mark.parametrize("where", FILTERS)
+def test_counts_of_selection_match_filtered_frame(survey, where):
+    rows = BitmapIndex.from_frame(survey).selection(where)
+    filtered = survey[_mask(survey, where)]
+    pd.testing.assert_frame_equal(
+        likert_counts(survey, MOTIVATION_ITEMS, by="Gender", rows=rows, chunk_rows=16),
+        likert_counts(filtered, MOTIVATION_ITEMS, by="Gender"),
+    )
+    assert np.array_equal(
+        pair_counts(survey, MOTIVATION_ITEMS, rows=rows),
+        pair_counts(filtered, MOTIVATION_ITEMS),
+    )
@@ -0,0 +1,84 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from survey_bitmap import BitmapIndex
+from survey_ingest import SurveyIngest
+
+SURVEY_CSV = Path(__file__).resolve().parent.parent / "Cleaned_FashionHabitGF.csv"
+
+
+def _export(tmp_path, text):
+    path = tmp_path / "survey.csv"
+    path.write_bytes(text)
+    return path
+
+
+def _assert_matches_file(ingest, path):
+    rows = len(pd.read_csv(path))
+    assert len(ingest.frame) == rows
+    assert ingest.aggregates.n == rows
+
+
+def test_append_after_last_row_without_newline(tmp_path):
+    text = SURVEY_CSV.read_bytes().rstrip(b"\n")
+    last_row = text.rsplit(b"\n", 1)[1]
+    path = _export(tmp_path, text)
+
+    ingest = SurveyIngest()
+    assert ingest.sync(path) is None
+    _assert_matches_file(ingest, path)
+
+    with open(path, "ab") as f:
+        f.write(b"\n" + last_row + b"\n")
+    assert ingest.sync(path) == 1
+    _assert_matches_file(ingest, path)
+
+
+def test_append_continuing_last_row_reloads(tmp_path):
+    text = SURVEY_CSV.read_bytes().rstrip(b"\n")
+    head, last_row = text.rsplit(b"\n", 1)
+    cut = len(last_row) // 2
+    path = _export(tmp_path, head + b"\n" + last_row[:cut])
+
+    ingest = SurveyIngest()
+    ingest.sync(path)
+    with open(path, "ab") as f:
+        f.write(last_row[cut:] + b"\n")
+    assert ingest.sync(path) is None
+    _assert_matches_file(ingest, path)
+
+
+def test_append_extends_bitmaps(tmp_path):
+    path = _export(tmp_path, SURVEY_CSV.read_bytes())
+    ingest = SurveyIngest()
+    ingest.sync(path)
+
+    rows = pd.read_csv(SURVEY_CSV).tail(3)
+    region = next(col for col in rows.columns if col.strip() == "Region")
+    rows[region] = ["Overseas", None, rows[region].iloc[-1]]
+    rows.to_csv(path, mode="a", header=False, index=False)
+    assert ingest.sync(path) == 3
+
+    rebuilt = BitmapIndex.from_frame(ingest.frame)
+    assert ingest.bitmaps.n_rows == rebuilt.n_rows
+    assert ingest.bitmaps.missing == rebuilt.missing
+    for col, column in rebuilt.bitmaps.items():
+        assert list(ingest.bitmaps.bitmaps[col]) == list(column)
+        for answer, bits in column.items():
+            assert np.array_equal(ingest.bitmaps.bitmaps[col][answer], bits)
+
+
+def test_edit_before_watermark_reloads(tmp_path):
+    text = SURVEY_CSV.read_bytes()
+    head, last_row = text.rstrip(b"\n").rsplit(b"\n", 1)
+    path = _export(tmp_path, text)
+    ingest = SurveyIngest()
+    ingest.sync(path)
+
+    # Same length, so only the hash of the ingested tail tells them apart
+    edited = head[:-1] + (b"0" if head[-1:] != b"0" else b"1")
+    path.write_bytes(edited + b"\n" + last_row + b"\n" + last_row + b"\n")
+    assert ingest.sync(path) is None
+    _assert_matches_file(ingest, path)
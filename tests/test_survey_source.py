@@ -0,0 +1,115 @@
+import http.server
+import os
+import threading
+from pathlib import Path
+
+import pytest
+
+from survey_source import SurveySource
+
+SURVEY_CSV = Path(__file__).resolve().parent.parent / "Cleaned_FashionHabitGF.csv"
+
+
+class _Remote(http.server.BaseHTTPRequestHandler):
+    """Answers every GET with server.response (status, body, ETag) and keeps
+    the request headers it saw in server.requests."""
+
+    def do_GET(self):
+        self.server.requests.append(dict(self.headers))
+        status, body, etag = self.server.response
+        if etag is not None and self.headers.get("If-None-Match") == etag:
+            status, body = 304, b""
+        self.send_response(status)
+        if etag is not None:
+            self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def remote():
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _Remote)
+    server.requests = []
+    server.response = (200, b"", None)
+    server.url = f"http://127.0.0.1:{server.server_port}/survey.csv"
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def local(tmp_path):
+    path = tmp_path / "data" / "survey.csv"
+    path.parent.mkdir()
+    path.write_bytes(SURVEY_CSV.read_bytes())
+    # Older than anything downloaded during the test
+    os.utime(path, ns=(0, 0))
+    return path
+
+
+def _grown():
+    text = SURVEY_CSV.read_bytes()
+    return text + text.rstrip(b"\n").rsplit(b"\n", 1)[1] + b"\n"
+
+
+def _source(local, tmp_path, url):
+    return SurveySource(local_path=local, mirror_dir=tmp_path / "mirror", remote_url=url, timeout=5)
+
+
+def test_download_with_etag_then_not_modified(local, tmp_path, remote):
+    source = _source(local, tmp_path, remote.url)
+    remote.response = (200, _grown(), '"v1"')
+
+    assert source.refresh() is True
+    assert source.resolve() == source.mirror_path
+    assert source.mirror_path.read_bytes() == _grown()
+    version = source.version()
+
+    assert source.refresh() is False
+    assert remote.requests[-1].get("If-None-Match") == '"v1"'
+    assert source.version() == version
+
+
+def test_identical_download_keeps_current_copy(local, tmp_path, remote):
+    source = _source(local, tmp_path, remote.url)
+    version = source.version()
+    remote.response = (200, local.read_bytes(), '"v1"')
+
+    assert source.refresh() is False
+    assert not source.mirror_path.exists()
+    assert source.version() == version
+
+    # The validators describe the copy in use, so the next check is conditional
+    assert source.refresh() is False
+    assert remote.requests[-1].get("If-None-Match") == '"v1"'
+
+
+def test_server_error_keeps_last_good_copy(local, tmp_path, remote):
+    source = _source(local, tmp_path, remote.url)
+    remote.response = (200, _grown(), None)
+    source.refresh()
+    version = source.version()
+
+    remote.response = (503, b"unavailable", None)
+    assert source.refresh() is False
+    assert source.version() == version
+    assert source.resolve().read_bytes() == _grown()
+
+
+def test_connection_refused_keeps_last_good_copy(local, tmp_path, remote):
+    source = _source(local, tmp_path, remote.url)
+    remote.response = (200, _grown(), '"v1"')
+    source.refresh()
+    version = source.version()
+
+    remote.shutdown()
+    remote.server_close()
+    assert source.refresh() is False
+    assert source.version() == version
+    assert source.resolve().read_bytes() == _grown()